@@ -0,0 +1,282 @@
+"""
+Annotation Pipeline for Sales Coach
+Splits a transcript on speaker-turn boundaries and either annotates chunks concurrently
+on a bounded worker pool (inline mode) or merges compact line-indexed coaching notes
+back into the original turns (structured mode).
+"""
+
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+import json
+import re
+
+# "Brian Olson: ..." style speaker labels at the start of a line
+SPEAKER_LINE = re.compile(r'^[^:\n\[\]]{1,60}:\s')
+
+# Coaching lines in inline output, and [n] turn numbers the model may echo back
+COACH_LINE = re.compile(r'^\s*(\*\*)?\[?COACH', re.IGNORECASE)
+TURN_NUMBER = re.compile(r'^\[\d+\]\s*')
+
+# One complete {"turn_index": n, "note": "..."} object, matched even inside a partial stream
+NOTE_OBJECT = re.compile(r'\{\s*"turn_index"\s*:\s*(\d+)\s*,\s*"note"\s*:\s*("(?:[^"\\]|\\.)*")\s*\}')
+
+
+def split_turns(transcript):
+    """Group transcript lines into speaker turns; unlabeled lines belong to the previous turn"""
+    turns = []
+    for line in transcript.split('\n'):
+        if not line.strip():
+            continue
+        if SPEAKER_LINE.match(line) or not turns:
+            turns.append(line)
+        else:
+            turns[-1] += '\n' + line
+    return turns
+
+
+def number_turns(turns):
+    """Render turns with [n] prefixes so the model can refer to them by index"""
+    return '\n'.join(f"[{index}] {turn}" for index, turn in enumerate(turns))
+
+
+def parse_turn_notes(text):
+    """Extract {turn_index, note} entries from the model output.
+
+    Complete JSON is parsed directly; a truncated or wrapped array falls back to
+    collecting every complete note object found in the text.
+    """
+    start, end = text.find('['), text.rfind(']')
+    if start != -1 and end > start:
+        try:
+            entries = json.loads(text[start:end + 1])
+            return [
+                {'turn_index': int(entry['turn_index']), 'note': str(entry['note']).strip()}
+                for entry in entries
+                if isinstance(entry, dict) and 'turn_index' in entry and entry.get('note')
+            ]
+        except (ValueError, TypeError, KeyError):
+            pass
+    return [
+        {'turn_index': int(match.group(1)), 'note': json.loads(match.group(2)).strip()}
+        for match in NOTE_OBJECT.finditer(text)
+    ]
+
+
+def merge_turn_notes(turns, notes):
+    """Merge coaching notes into the original turns as dialogue/coaching items"""
+    by_turn = {}
+    for note in notes:
+        index = min(max(note['turn_index'], 0), len(turns) - 1) if turns else 0
+        by_turn.setdefault(index, []).append(note['note'])
+
+    items = []
+    for index, turn in enumerate(turns):
+        items.append({'type': 'dialogue', 'content': turn, 'turn_index': index})
+        for note in by_turn.get(index, []):
+            items.append({'type': 'coaching', 'content': note, 'turn_index': index})
+    return items
+
+
+def render_annotated(items):
+    """Render structured items in the [COACH: ...] text form used by older clients"""
+    return '\n'.join(
+        f"[COACH: {item['content']}]" if item['type'] == 'coaching' else item['content']
+        for item in items
+    )
+
+
+def _normalize_line(line):
+    return ' '.join(TURN_NUMBER.sub('', line.strip()).split()).casefold()
+
+
+def align_lines(transcript, annotated_text):
+    """Align the annotated output against the original transcript lines.
+
+    Each output line is matched to the next unmatched occurrence of the same
+    (normalized) original line, so the pass is O(n log n) even for long calls.
+    Returns (original_lines, output_lines, matches) where matches maps an original
+    line index to the output line index that reproduced it.
+    """
+    original_lines = [line for line in transcript.split('\n') if line.strip()]
+    output_lines = annotated_text.split('\n')
+
+    positions = {}
+    for index, line in enumerate(original_lines):
+        positions.setdefault(_normalize_line(line), []).append(index)
+
+    matches = {}
+    cursor = 0
+    for output_index, line in enumerate(output_lines):
+        if not line.strip() or COACH_LINE.match(line):
+            continue
+        candidates = positions.get(_normalize_line(line))
+        if not candidates:
+            continue
+        found = bisect_left(candidates, cursor)
+        if found < len(candidates):
+            matches[candidates[found]] = output_index
+            cursor = candidates[found] + 1
+    return original_lines, output_lines, matches
+
+
+def missing_ranges(total, matches):
+    """Contiguous [start, end] ranges of original line indexes that were never reproduced"""
+    ranges = []
+    start = None
+    for index in range(total):
+        if index in matches:
+            if start is not None:
+                ranges.append([start, index - 1])
+                start = None
+        elif start is None:
+            start = index
+    if start is not None:
+        ranges.append([start, total - 1])
+    return ranges
+
+
+def coverage_report(transcript, annotated_text):
+    """Summarize how much of the transcript the annotated output covers"""
+    original_lines, _, matches = align_lines(transcript, annotated_text)
+    total = len(original_lines)
+    return {
+        'covered_lines': len(matches),
+        'total_lines': total,
+        'ratio': round(len(matches) / total, 4) if total else 1.0,
+        'missing_ranges': missing_ranges(total, matches)
+    }
+
+
+def gap_chunks(original_lines, ranges, max_chars=12000, overlap_lines=2):
+    """Build annotation chunks for missing line ranges, with context on either side.
+
+    Ranges longer than max_chars are split so each chunk stays a comfortable size.
+    """
+    pieces = []
+    for start, end in ranges:
+        piece_start, size = start, 0
+        for index in range(start, end + 1):
+            length = len(original_lines[index]) + 1
+            if index > piece_start and size + length > max_chars:
+                pieces.append((piece_start, index - 1))
+                piece_start, size = index, 0
+            size += length
+        pieces.append((piece_start, end))
+
+    return [
+        {
+            'index': number,
+            'total': len(pieces),
+            'range': [start, end],
+            'text': '\n'.join(original_lines[start:end + 1]),
+            'before': '\n'.join(original_lines[max(0, start - overlap_lines):start]),
+            'after': '\n'.join(original_lines[end + 1:end + 1 + overlap_lines])
+        }
+        for number, (start, end) in enumerate(pieces)
+    ]
+
+
+def splice_gaps(output_lines, matches, filled):
+    """Insert annotated text for missing ranges after the output line of the preceding original line.
+
+    filled is a list of (chunk, annotated_text) for chunks built by gap_chunks.
+    """
+    lines = list(output_lines)
+    # Work backwards so earlier insert positions stay valid
+    for chunk, text in sorted(filled, key=lambda item: item[0]['range'][0], reverse=True):
+        start = chunk['range'][0]
+        anchor = max((matches[index] for index in matches if index < start), default=-1)
+        insert_at = anchor + 1
+        # Keep coaching notes attached to the anchor line in front of the inserted text
+        while insert_at < len(lines) and COACH_LINE.match(lines[insert_at]):
+            insert_at += 1
+        lines[insert_at:insert_at] = text.strip('\n').split('\n')
+    return '\n'.join(lines)
+
+
+def _split_long_turn(turn, max_chars):
+    """Break a single oversized turn at whitespace so no chunk exceeds max_chars"""
+    pieces = []
+    while len(turn) > max_chars:
+        cut = turn.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(turn[:cut])
+        turn = turn[cut:].lstrip()
+    if turn:
+        pieces.append(turn)
+    return pieces
+
+
+def chunk_turns(turns, max_chars=12000, overlap_turns=2):
+    """Pack consecutive turns into chunks of at most max_chars.
+
+    Each chunk carries the overlap_turns turns on either side as read-only context so
+    coaching notes near a boundary still see the surrounding exchange.
+    """
+    pieces = []
+    for turn in turns:
+        pieces.extend(_split_long_turn(turn, max_chars))
+
+    groups = []
+    current, size = [], 0
+    for index, piece in enumerate(pieces):
+        if current and size + len(piece) + 1 > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(index)
+        size += len(piece) + 1
+    if current:
+        groups.append(current)
+
+    chunks = []
+    for number, group in enumerate(groups):
+        first, last = group[0], group[-1]
+        chunks.append({
+            'index': number,
+            'total': len(groups),
+            'text': '\n'.join(pieces[first:last + 1]),
+            'before': '\n'.join(pieces[max(0, first - overlap_turns):first]),
+            'after': '\n'.join(pieces[last + 1:last + 1 + overlap_turns])
+        })
+    return chunks
+
+
+def merge_token_usage(usages):
+    """Sum the token counts of several calls into one token_usage dict"""
+    merged = {}
+    for usage in usages:
+        for key, value in usage.items():
+            if key == 'max_tokens_limit':
+                merged[key] = value
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+class ChunkedAnnotator:
+    def __init__(self, annotate_chunk, max_workers=4, max_chunk_chars=12000, overlap_turns=2):
+        """annotate_chunk(chunk) must return a dict with content, token_usage and stop_reason"""
+        self.annotate_chunk = annotate_chunk
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='salescoach-chunk')
+        self.max_chunk_chars = max_chunk_chars
+        self.overlap_turns = overlap_turns
+
+    def plan(self, transcript):
+        return chunk_turns(split_turns(transcript), self.max_chunk_chars, self.overlap_turns)
+
+    def run(self, chunks):
+        """Annotate all chunks concurrently, yielding (chunk, result) strictly in transcript order"""
+        futures = [self.executor.submit(self.annotate_chunk, chunk) for chunk in chunks]
+        try:
+            for chunk, future in zip(chunks, futures):
+                yield chunk, future.result()
+        finally:
+            # Don't leave queued work behind if the consumer stops early or a chunk fails
+            for future in futures:
+                future.cancel()
+
+    @staticmethod
+    def stitch(results):
+        """Join annotated chunks back into one transcript"""
+        return '\n'.join(result['content'].strip('\n') for result in results)
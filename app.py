@@ -1,13 +1,28 @@
-from flask import Flask, render_template, request, jsonify, session, make_response
-import anthropic
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context, send_file
 import os
 from dotenv import load_dotenv
 import json
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 import uuid
 import tempfile
 import pickle
-from pdf_generator import SalesCoachPDFGenerator
+import threading
+import time
+from datetime import datetime
+from report_renderer import ReportRenderer
+from exporters import EXPORT_FORMATS, BulkExporter, export_chunks, export_filename
+from jobs import JobManager
+from session_store import create_session_store
+from history_store import HistoryStore
+from scorecards import ScorecardTable, split_scorecard
+from transcript_parser import parse_vtt_turns, render_transcript
+from ingest import read_upload, ingest_transcript
+from chat_history import ChatHistory
+import markup
+from metrics import CueTimeline, compute_metrics, transcript_fingerprint
+from sales_analyzer import (SalescoachAnalyzer, create_result_cache, create_rate_limiter, create_scheduler,
+                            create_compactor, create_document_extractor)
 
 # Load environment variables
 load_dotenv()
@@ -18,18 +33,71 @@ app.secret_key = os.getenv('SECRET_KEY', 'salescoach-secret-key-' + str(uuid.uui
 # Configure Anthropic
 anthropic_api_key = os.getenv('ANTHROPIC_API_KEY')
 
-# Configure upload settings
-UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'txt', 'csv', 'md', 'vtt'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Configure upload settings. Uploads are parsed as they stream in, so memory does not
+# grow with file size; the limit only guards against runaway requests (0 = no limit)
+ALLOWED_EXTENSIONS = {'txt', 'csv', 'md', 'vtt', 'srt', 'json', 'docx', 'pdf'}
+MAX_UPLOAD_MB = int(os.getenv('MAX_UPLOAD_MB', '1024'))
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024 if MAX_UPLOAD_MB else None
 
-# Create uploads directory if it doesn't exist
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Earlier chat exchanges are replayed verbatim until they pass this many tokens; then all
+# but the last CHAT_KEEP_EXCHANGES are folded into a summary in the background
+CHAT_HISTORY_TOKENS = int(os.getenv('CHAT_HISTORY_TOKENS', '3000'))
+CHAT_KEEP_EXCHANGES = int(os.getenv('CHAT_KEEP_EXCHANGES', '2'))
+# A chat summary still running after this many seconds is taken as lost (e.g. its worker restarted)
+CHAT_SUMMARY_TIMEOUT = 300
 
-# Simple in-memory session storage to avoid large cookies
-SESSION_STORE = {}
+# Server-side session storage to avoid large cookies. 'memory' is bounded by memory and idle
+# time but private to one process; use 'sqlite' or 'redis' when running several workers
+session_store = create_session_store(
+    backend=os.getenv('SESSION_BACKEND', 'memory'),
+    max_bytes=int(os.getenv('SESSION_STORE_MB', '256')) * 1024 * 1024,
+    idle_ttl=int(os.getenv('SESSION_TTL_SECONDS', str(4 * 60 * 60))),
+    sqlite_path=os.getenv('SESSION_SQLITE_PATH', 'cache/sessions.sqlite3'),
+    redis_url=os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+)
+
+# Every analyzed call is kept in a searchable history (shared by all workers)
+history_store = HistoryStore(os.getenv('HISTORY_DB_PATH', 'cache/history.sqlite3'))
+
+# Per-rep scorecards, folded in from the history as calls are saved
+scorecards = ScorecardTable()
+
+def publish_job(job, snapshot):
+    """Save a job snapshot in the session so workers other than the one running it can report it"""
+    set_session_data_for(job.owner, f"job:{job.id}", snapshot)
+
+# Background jobs run analysis and annotation concurrently off the request thread; while text
+# streams, a snapshot is published at most this often for workers that do not run the job
+JOB_PROGRESS_SECONDS = float(os.getenv('JOB_PROGRESS_SECONDS', '1'))
+job_manager = JobManager(max_workers=int(os.getenv('JOB_WORKERS', '4')), on_change=publish_job,
+                         progress_interval=JOB_PROGRESS_SECONDS)
+
+# Shrinks transcripts (fillers, stutters, empty cues) before they are stored and prompted
+compactor = create_compactor()
+
+# DOCX and PDF text extraction runs in separate processes so it never blocks request threads
+document_extractor = create_document_extractor()
+
+# PDF reports are laid out in separate processes and kept on disk until their content changes.
+# The directory is resolved against the app so every worker and render process finds the same files
+report_renderer = ReportRenderer(
+    directory=os.path.join(app.root_path, os.getenv('REPORT_CACHE_DIR', 'cache/reports')),
+    max_workers=int(os.getenv('REPORT_WORKERS', '2')),
+    max_disk_bytes=int(os.getenv('REPORT_CACHE_MB', '256')) * 1024 * 1024
+)
+
+# Bulk exports of saved calls are built in parallel in separate processes and zipped in the
+# background; the zips are kept for download for BULK_EXPORT_TTL seconds
+bulk_exporter = BulkExporter(max_workers=int(os.getenv('EXPORT_WORKERS', '2')), renderer=report_renderer)
+BULK_EXPORT_MAX_CALLS = int(os.getenv('BULK_EXPORT_MAX_CALLS', '200'))
+BULK_EXPORT_DIR = os.path.join(app.root_path, os.getenv('BULK_EXPORT_DIR', 'cache/exports'))
+BULK_EXPORT_TTL = int(os.getenv('BULK_EXPORT_TTL', '3600'))
+
+# Claude requests are admitted by priority class before they queue for token budget
+scheduler = create_scheduler()
+
+# All analyzer calls queue against one token budget and back off together on 429/529
+rate_limiter = create_rate_limiter()
 
 def get_session_id():
     """Get or create a session ID"""
@@ -39,187 +107,120 @@ def get_session_id():
 
 def get_session_data(key, default=None):
     """Get data from session store"""
-    session_id = get_session_id()
-    return SESSION_STORE.get(session_id, {}).get(key, default)
+    return session_store.get(get_session_id(), key, default)
 
 def set_session_data(key, value):
     """Set data in session store"""
-    session_id = get_session_id()
-    if session_id not in SESSION_STORE:
-        SESSION_STORE[session_id] = {}
-    SESSION_STORE[session_id][key] = value
+    set_session_data_for(get_session_id(), key, value)
+
+def set_session_data_for(session_id, key, value):
+    """Set data in session store for an explicit session (usable outside a request)"""
+    session_store.set(session_id, key, value)
 
 def clear_session_data():
     """Clear session data"""
-    session_id = get_session_id()
-    if session_id in SESSION_STORE:
-        del SESSION_STORE[session_id]
+    session_store.delete(get_session_id())
     session.clear()
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def call_metadata(data):
+    """Rep, call date and source file sent along with a transcript"""
+    return {key: (data.get(key) or '').strip() for key in ('rep', 'call_date', 'source_file')}
 
-def parse_vtt_file(content):
-    """Parse VTT file content and extract clean transcript text"""
-    lines = content.split('\n')
-    transcript_lines = []
+def prepare_transcript(data):
+    """Measure and compact the submitted transcript; returns (raw transcript, prompt transcript,
+    compaction stats, metrics)
+
+    The raw transcript is what is stored and shown; only prompts use the compacted one.
+    Metrics use the timings of the last uploaded file when the transcript is still the one
+    it produced, otherwise they are estimated from the text.
+    """
+    raw = data.get('transcript', '').strip()
+    uploaded = get_session_data('upload_timeline')
+    if uploaded and uploaded['fingerprint'] == transcript_fingerprint(raw):
+        timeline = CueTimeline.from_dict(uploaded)
+    else:
+        timeline = CueTimeline.from_text(raw)
+    metrics = compute_metrics(timeline, rep=data.get('rep'))
     
-    for line in lines:
-        line = line.strip()
-        
-        # Skip empty lines, WEBVTT header, timestamps, and cue numbers
-        if (not line or 
-            line == 'WEBVTT' or 
-            line.isdigit() or 
-            '-->' in line or
-            line.startswith('NOTE')):
-            continue
-            
-        # This should be transcript text
-        if line:
-            transcript_lines.append(line)
-    
-    # Join all transcript lines with proper spacing
-    return '\n'.join(transcript_lines)
-
-class SalescoachAnalyzer:
-    def __init__(self):
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY environment variable is required")
-        # Using Claude Sonnet 4 - the latest model
-        self.client = anthropic.Anthropic(api_key=api_key)
-    
-    def analyze_transcript(self, transcript):
-        """Analyze the sales call transcript and provide coaching feedback"""
-        prompt = f"""
-        You are an expert sales coach analyzing a sales call transcript. Please provide a comprehensive analysis with the following sections:
-
-        1. **Overall Performance Summary**: Brief overview of how the call went
-        2. **What the Representative Did Well**: Specific positive behaviors and techniques
-        3. **Areas for Improvement**: Specific areas where the rep could improve
-        4. **Key Coaching Points**: 3-5 actionable recommendations
-        5. **Call Outcome Assessment**: Likely success/next steps
-
-        Here's the transcript to analyze:
-
-        {transcript}
-
-        Please provide detailed, actionable feedback that would help this sales representative improve their performance.
-        """
-        
-        try:
-            model_name = "claude-sonnet-4-20250514"
-            print(f"🤖 Using model: {model_name} with max_tokens: 20000")
-            
-            message = self.client.messages.create(
-                model=model_name,
-                max_tokens=20000,
-                temperature=0.7,
-                system="You are an expert sales coach with 20+ years of experience training top sales representatives.",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            # Log token usage
-            print(f"📊 Analysis tokens - Input: {message.usage.input_tokens:,}, Output: {message.usage.output_tokens:,}, Total: {message.usage.input_tokens + message.usage.output_tokens:,}")
-            print(f"📊 Output usage: {(message.usage.output_tokens / 20000 * 100):.1f}% of max tokens")
-            
-            # Create result with token usage
-            result = {
-                'content': message.content[0].text,
-                'token_usage': {
-                    'input_tokens': message.usage.input_tokens,
-                    'output_tokens': message.usage.output_tokens,
-                    'total_tokens': message.usage.input_tokens + message.usage.output_tokens,
-                    'max_tokens_limit': 20000
-                }
-            }
-            return result, prompt
-        except Exception as e:
-            return f"Error analyzing transcript: {str(e)}", prompt
+    transcript, stats = compactor.compact(raw)
+    if compactor.enabled:
+        print(f"🗜️ Compacted transcript: {stats['chars_before']} -> {stats['chars_after']} characters "
+              f"(~{stats['tokens_before']} -> ~{stats['tokens_after']} tokens, {stats['saved_percent']}% saved)")
+    return raw, transcript, stats, metrics
+
+def store_transcript(raw, transcript, data, metrics):
+    """Start a new call in the session: raw and prompt transcripts, call details and metrics"""
+    set_session_data('transcript', raw)
+    set_session_data('prompt_transcript', transcript)
+    set_session_data('call_metadata', call_metadata(data))
+    set_session_data('metrics', metrics)
+    set_session_data('chat_history', None)
+
+def record_history(session_id, transcript, **fields):
+    """Save results to the call history; a history failure never fails the request"""
+    try:
+        metadata = session_store.get(session_id, 'call_metadata') or {}
+        metrics = session_store.get(session_id, 'metrics')
+        history_store.save(transcript, **metadata, metrics=metrics, **fields)
+    except Exception as e:
+        print(f"⚠️ Could not save call to history: {str(e)}")
+
+def add_chat_exchange(session_id, question, answer):
+    """Append an answered question to the chat history as stored now (not as it was when the
+    question came in), so a summary applied meanwhile is kept; returns the updated history"""
+    history = ChatHistory.from_dict(session_store.get(session_id, 'chat_history'))
+    history.add(question, answer)
+    session_store.set(session_id, 'chat_history', history.to_dict())
+    return history
+
+def summarize_chat_history(session_id, history):
+    """Fold the oldest chat exchanges into the summary in the background once the history is over budget"""
+    exchanges = history.to_summarize(CHAT_HISTORY_TOKENS, keep=CHAT_KEEP_EXCHANGES)
+    if not exchanges:
+        return
+    # One summary per session at a time; a later turn picks up whatever is still over budget
+    if not session_store.claim(session_id, 'chat_summary', CHAT_SUMMARY_TIMEOUT):
+        return
     
-    def annotate_transcript(self, transcript):
-        """Add coaching annotations throughout the transcript"""
-        prompt = f"""
-        You are a sales coach reviewing a call transcript. Your task is to provide the COMPLETE original transcript with coaching annotations inserted throughout.
-        
-        CRITICAL INSTRUCTIONS:
-        1. You MUST include the ENTIRE transcript from beginning to end
-        2. Do NOT summarize, truncate, or skip any part of the conversation
-        3. Continue annotating until you reach the very end of the transcript
-        4. If you approach token limits, prioritize including the complete transcript over detailed annotations
-        
-        Format: Insert coaching feedback in [COACH: ...] format after key moments, but ensure you reproduce the complete original transcript word-for-word.
-        
-        Add coaching notes for:
-        - Opening techniques
-        - Rapport building
-        - Discovery questions
-        - Objection handling
-        - Closing attempts
-        - Missed opportunities
-        
-        Transcript to annotate:
-        {transcript}
-        
-        IMPORTANT: Output the full transcript with annotations. Continue until you have covered the entire conversation from start to finish. Do not stop early.
-        """
-        
+    def run_summary(emit):
         try:
-            print(f"🔄 Annotating transcript with model: claude-sonnet-4-20250514, max_tokens: 20000")
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=20000,
-                temperature=0.7,
-                system="You are a sales coach providing inline feedback on a sales call transcript.",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            print(f"📊 Annotation tokens - Input: {message.usage.input_tokens:,}, Output: {message.usage.output_tokens:,}, Total: {message.usage.input_tokens + message.usage.output_tokens:,}")
-            print(f"📊 Annotation output usage: {(message.usage.output_tokens / 20000 * 100):.1f}% of max tokens")
-            result = message.content[0].text
-            print(f"📝 Annotation result length: {len(result)} characters")
-            return result, prompt
-        except Exception as e:
-            return f"Error annotating transcript: {str(e)}", prompt
+            summary = analyzer.summarize_chat(history.summary, exchanges)
+            # Apply to the history as it is now; newer exchanges added meanwhile are kept
+            current = ChatHistory.from_dict(session_store.get(session_id, 'chat_history'))
+            if current.apply_summary(summary, exchanges):
+                session_store.set(session_id, 'chat_history', current.to_dict())
+                print(f"🧾 Summarized {len(exchanges)} chat exchanges ({current.summarized} in total)")
+            return {'summarized': len(exchanges)}
+        finally:
+            session_store.release(session_id, 'chat_summary')
     
-    def chat_about_analysis(self, question, transcript, previous_analysis):
-        """Handle conversational questions about the transcript or analysis"""
-        prompt = f"""
-        You are a sales coach discussing a sales call transcript analysis. The user has a question about either the transcript or the coaching analysis.
-        
-        Original Transcript:
-        {transcript}
-        
-        Previous Analysis:
-        {previous_analysis}
-        
-        User Question: {question}
-        
-        Please provide a helpful, detailed response based on the transcript and analysis.
-        """
-        
-        try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=20000,
-                temperature=0.7,
-                system="You are an expert sales coach answering questions about a sales call analysis.",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            print(f"📊 Chat tokens - Input: {message.usage.input_tokens:,}, Output: {message.usage.output_tokens:,}, Total: {message.usage.input_tokens + message.usage.output_tokens:,}")
-            return message.content[0].text, prompt
-        except Exception as e:
-            return f"Error processing question: {str(e)}", prompt
+    job_manager.submit({'chat_summary': run_summary}, owner=session_id)
+
+def sse_event(event, data):
+    """Format a server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Wrap an event generator in a streaming text/event-stream response"""
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def parse_vtt_file(content):
+    """Parse VTT file content into a compact transcript with one line per speaker turn"""
+    return render_transcript(parse_vtt_turns(content))
+
+
+# Cache analysis and annotation results by transcript content
+result_cache = create_result_cache()
 
 # Initialize the analyzer (with error handling)
 try:
-    analyzer = SalescoachAnalyzer()
+    analyzer = SalescoachAnalyzer(cache=result_cache, limiter=rate_limiter, scheduler=scheduler)
     print("✅ Salescoach initialized successfully with Claude API")
 except ValueError as e:
     print(f"❌ Configuration Error: {e}")
@@ -236,44 +237,47 @@ def analyze():
             return jsonify({'error': 'Claude API key not configured. Please set ANTHROPIC_API_KEY environment variable.'}), 500
             
         data = request.get_json()
-        transcript = data.get('transcript', '').strip()
+        raw, transcript, compaction, metrics = prepare_transcript(data)
         
         if not transcript:
             return jsonify({'error': 'No transcript provided'}), 400
         
-        # Check transcript length and truncate if too long
-        max_length = 50000  # Increased limit for Claude Sonnet 4 - roughly 12,500 tokens
-        if len(transcript) > max_length:
-            transcript = transcript[:max_length] + "\n\n[Note: Transcript truncated due to length]"
-        
         # Store transcript in session store (not browser cookies)
-        set_session_data('transcript', transcript)
+        store_transcript(raw, transcript, data, metrics)
         
         # Analyze the transcript first
         print("🔄 Analyzing transcript...")
-        analysis_result, analysis_prompt = analyzer.analyze_transcript(transcript)
+        analysis_result, analysis_prompt = analyzer.analyze_transcript(transcript, metrics)
+        
+        # Errors come back as strings; never store them as the analysis
+        if not isinstance(analysis_result, dict):
+            print(f"❌ {analysis_result}")
+            return jsonify({'error': str(analysis_result)}), 503
         
-        # Handle the new return format with token usage
-        if isinstance(analysis_result, dict) and 'content' in analysis_result:
-            analysis_content = analysis_result['content']
-            token_usage = analysis_result.get('token_usage', {})
-        else:
-            analysis_content = str(analysis_result)
-            token_usage = {}
+        analysis_content, scorecard = split_scorecard(analysis_result['content'])
+        token_usage = analysis_result.get('token_usage', {})
+        cached = analysis_result.get('cached', False)
         
         # Store analysis and prompts in session store
         set_session_data('analysis', analysis_content)
+        analyzer.index_for_chat(transcript)
         set_session_data('analysis_prompt', analysis_prompt)
+        record_history(get_session_id(), raw, analysis=analysis_content, scorecard=scorecard,
+                       token_usage={'analysis': token_usage})
         
         print("✅ Analysis completed successfully")
         
         # Return analysis immediately, annotation will be processed separately
         return jsonify({
             'analysis': analysis_content,
+            'analysis_html': markup.to_html(analysis_content),
             'token_usage': token_usage,
+            'cached': cached,
             'prompts': {
                 'analysis': analysis_prompt
             },
+            'compaction': compaction,
+            'metrics': metrics,
             'annotation_pending': True
         })
     
@@ -281,40 +285,244 @@ def analyze():
         print(f"❌ Error in analyze: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """Stream the analysis to the browser as server-sent events"""
+    if not analyzer:
+        return jsonify({'error': 'Claude API key not configured. Please set ANTHROPIC_API_KEY environment variable.'}), 500
+    
+    data = request.get_json()
+    raw, transcript, compaction, metrics = prepare_transcript(data)
+    
+    if not transcript:
+        return jsonify({'error': 'No transcript provided'}), 400
+    
+    # Resolve the session id before streaming starts so the cookie is sent with the headers
+    session_id = get_session_id()
+    store_transcript(raw, transcript, data, metrics)
+    
+    def generate():
+        # Local metrics are ready before Claude starts responding
+        yield sse_event('metrics', metrics)
+        print("🔄 Streaming analysis...")
+        events, analysis_prompt = analyzer.stream_analysis(transcript, metrics)
+        try:
+            for event in events:
+                if event['type'] == 'text':
+                    yield sse_event('token', {'text': event['text']})
+                else:
+                    analysis, scorecard = split_scorecard(event['content'])
+                    set_session_data('analysis', analysis)
+                    analyzer.index_for_chat(transcript)
+                    set_session_data('analysis_prompt', analysis_prompt)
+                    record_history(session_id, raw, analysis=analysis, scorecard=scorecard,
+                                   token_usage={'analysis': event['token_usage']})
+                    print("✅ Analysis stream completed successfully")
+                    yield sse_event('done', {
+                        'analysis': analysis,
+                        'analysis_html': markup.to_html(analysis),
+                        'token_usage': event['token_usage'],
+                        'cached': event.get('cached', False),
+                        'prompts': {
+                            'analysis': analysis_prompt
+                        },
+                        'compaction': compaction,
+                        'metrics': metrics,
+                        'annotation_pending': True
+                    })
+        except Exception as e:
+            print(f"❌ Error in analyze stream: {str(e)}")
+            yield sse_event('error', {'error': f"Error analyzing transcript: {str(e)}"})
+    
+    return sse_response(generate())
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Start analysis and annotation in parallel and return a job id immediately"""
+    if not analyzer:
+        return jsonify({'error': 'Claude API key not configured. Please set ANTHROPIC_API_KEY environment variable.'}), 500
+    
+    data = request.get_json()
+    raw, transcript, compaction, metrics = prepare_transcript(data)
+    
+    if not transcript:
+        return jsonify({'error': 'No transcript provided'}), 400
+    
+    session_id = get_session_id()
+    store_transcript(raw, transcript, data, metrics)
+    
+    # Both prompts share the cached transcript prefix. Prompt cache entries only become
+    # readable once the first request starts responding, so annotation waits for the
+    # analysis' first token (or a short timeout) instead of writing a duplicate entry.
+    prefix_cached = threading.Event()
+    
+    def run_analysis(emit):
+        events, analysis_prompt = analyzer.stream_analysis(transcript, metrics)
+        try:
+            for event in events:
+                if event['type'] == 'text':
+                    prefix_cached.set()
+                    emit(event['text'])
+                else:
+                    analysis, scorecard = split_scorecard(event['content'])
+                    set_session_data_for(session_id, 'analysis', analysis)
+                    analyzer.index_for_chat(transcript)
+                    set_session_data_for(session_id, 'analysis_prompt', analysis_prompt)
+                    record_history(session_id, raw, analysis=analysis, scorecard=scorecard,
+                                   token_usage={'analysis': event['token_usage']})
+                    return {
+                        'analysis': analysis,
+                        'analysis_html': markup.to_html(analysis),
+                        'token_usage': event['token_usage'],
+                        'cached': event.get('cached', False),
+                        'prompts': {
+                            'analysis': analysis_prompt
+                        }
+                    }
+        finally:
+            prefix_cached.set()
+    
+    def run_annotation(emit):
+        prefix_cached.wait(timeout=10)
+        events, annotation_prompt = analyzer.stream_annotation(transcript)
+        for event in events:
+            if event['type'] == 'text':
+                emit(event['text'])
+            else:
+                set_session_data_for(session_id, 'annotated_transcript', event['content'])
+                set_session_data_for(session_id, 'annotations', event.get('annotations'))
+                set_session_data_for(session_id, 'annotation_prompt', annotation_prompt)
+                record_history(session_id, raw, annotated_transcript=event['content'],
+                               annotations=event.get('annotations'), token_usage={'annotation': event['token_usage']})
+                return {
+                    'annotated_transcript': event['content'],
+                    'annotations': event.get('annotations'),
+                    'coverage': event.get('coverage'),
+                    'token_usage': event['token_usage'],
+                    'cached': event.get('cached', False),
+                    'prompts': {
+                        'annotation': annotation_prompt
+                    }
+                }
+    
+    job = job_manager.submit({
+        'analysis': run_analysis,
+        'annotation': run_annotation
+    }, owner=session_id)
+    
+    return jsonify({**job.to_dict(), 'compaction': compaction, 'metrics': metrics}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a job; pass <part>_offset to receive only text streamed since the last poll"""
+    job = job_manager.get(job_id, owner=get_session_id())
+    if not job:
+        # Running in another worker process: report its last published snapshot
+        snapshot = get_session_data(f"job:{job_id}")
+        if not snapshot:
+            return jsonify({'error': 'Job not found'}), 404
+        parts = {}
+        for name, part in snapshot['parts'].items():
+            offset = request.args.get(f'{name}_offset', 0, type=int)
+            parts[name] = dict(part, text=part['text'][offset:], offset=offset)
+        return jsonify(dict(snapshot, parts=parts))
+    
+    offsets = {name: request.args.get(f'{name}_offset', 0, type=int) for name in job.parts}
+    return jsonify(job.to_dict(offsets))
+
+def job_state_events(state, offsets, reported):
+    """Events for what a job state (live or a published snapshot) adds past offsets; updates offsets and reported"""
+    for name, part in state['parts'].items():
+        text = part['text'][offsets.get(name, 0) - part['offset']:]
+        if text:
+            yield sse_event('token', {'part': name, 'text': text})
+            offsets[name] = part['length']
+        if part['status'] in ('completed', 'failed') and name not in reported:
+            reported.add(name)
+            if part['status'] == 'completed':
+                yield sse_event('part_done', {'part': name, 'result': part['result']})
+            else:
+                yield sse_event('part_error', {'part': name, 'error': part['error']})
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Subscribe to a job as server-sent events"""
+    session_id = get_session_id()
+    job = job_manager.get(job_id, owner=session_id)
+    if not job:
+        if not get_session_data(f"job:{job_id}"):
+            return jsonify({'error': 'Job not found'}), 404
+        return sse_response(snapshot_events(session_id, job_id))
+    
+    def generate():
+        offsets = {}
+        reported = set()
+        version = None
+        while True:
+            yield from job_state_events(job.to_dict(offsets), offsets, reported)
+            if job.finished:
+                yield sse_event('done', {'job_id': job.id, 'status': job.status})
+                return
+            new_version = job.wait_for_change(version, timeout=15)
+            if new_version == version:
+                # Keep idle connections open through proxies
+                yield ": keepalive\n\n"
+            version = new_version
+    
+    return sse_response(generate())
+
+def snapshot_events(session_id, job_id):
+    """Events for a job running in another worker, followed through its published snapshots"""
+    offsets = {}
+    reported = set()
+    interval = max(JOB_PROGRESS_SECONDS, 0.5)
+    idle = 0.0
+    while True:
+        snapshot = session_store.get(session_id, f"job:{job_id}")
+        if not snapshot:
+            yield sse_event('error', {'error': 'Job is no longer available'})
+            return
+        events = list(job_state_events(snapshot, offsets, reported))
+        yield from events
+        if snapshot['status'] in ('completed', 'failed', 'partial'):
+            yield sse_event('done', {'job_id': job_id, 'status': snapshot['status']})
+            return
+        idle = 0.0 if events else idle + interval
+        if idle >= 15:
+            # Keep idle connections open through proxies
+            yield ": keepalive\n\n"
+            idle = 0.0
+        time.sleep(interval)
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
+    """Parse an uploaded transcript straight from the request stream (multipart or raw body)"""
     try:
-        if 'file' not in request.files:
+        filename, chunks = read_upload(request)
+        if filename is None:
             return jsonify({'error': 'No file provided'}), 400
         
-        file = request.files['file']
-        if file.filename == '':
+        filename = secure_filename(filename)
+        if filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Add unique identifier to filename
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(filepath)
-            
-            # Read the file content
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
+        if allowed_file(filename):
+            timeline = CueTimeline()
+            transcript, stats = ingest_transcript(filename, chunks, document_extractor, timeline)
+            if timeline.timed:
+                # Cue timings for conversation metrics when this transcript is analyzed
+                set_session_data('upload_timeline', {'fingerprint': transcript_fingerprint(transcript), **timeline.to_dict()})
+            print(f"📝 Parsed {filename} as {stats['format']}: {stats['bytes']} bytes -> {stats['turns']} turns, {stats['chars']} characters")
             
-            # Process based on file type
-            if filename.lower().endswith('.vtt'):
-                transcript = parse_vtt_file(content)
-            else:
-                transcript = content
-            
-            # Clean up the uploaded file
-            os.remove(filepath)
-            
-            return jsonify({'transcript': transcript})
+            return jsonify({'transcript': transcript, 'format': stats['format'], 'encoding': stats['encoding']})
         
-        return jsonify({'error': 'Invalid file type. Please upload .txt, .csv, .md, or .vtt files'}), 400
+        return jsonify({'error': 'Invalid file type. Please upload .txt, .csv, .md, .vtt, .srt, .json, .docx or .pdf files'}), 400
     
+    except ValueError as e:
+        # Unreadable content or a missing optional parser library
+        return jsonify({'error': str(e)}), 400
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'File is larger than the {MAX_UPLOAD_MB} MB upload limit'}), 413
     except Exception as e:
         print(f"❌ Error in upload: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -324,24 +532,31 @@ def get_annotation():
     """Process annotation separately after analysis is complete"""
     try:
         # Get the transcript from session
-        transcript = get_session_data('transcript')
+        transcript = get_session_data('prompt_transcript')
         if not transcript:
             return jsonify({'error': 'No transcript found in session'}), 400
         
         # Process annotation
         print("🔄 Processing annotation...")
-        annotated_transcript, annotation_prompt = analyzer.annotate_transcript(transcript)
+        events, annotation_prompt = analyzer.stream_annotation(transcript)
+        result = next(event for event in events if event['type'] == 'done')
+        annotated_transcript = result['content']
         
         # Store annotation and prompt in session
         set_session_data('annotated_transcript', annotated_transcript)
+        set_session_data('annotations', result.get('annotations'))
         set_session_data('annotation_prompt', annotation_prompt)
+        record_history(get_session_id(), get_session_data('transcript'), annotated_transcript=annotated_transcript,
+                       annotations=result.get('annotations'), token_usage={'annotation': result['token_usage']})
         
         print("✅ Annotation completed successfully")
         print(f"📤 Sending annotated transcript length: {len(annotated_transcript)} characters")
-        print(f"📄 Last 100 chars of annotated transcript: {annotated_transcript[-100:]}")
         
         return jsonify({
             'annotated_transcript': annotated_transcript,
+            'annotations': result.get('annotations'),
+            'coverage': result.get('coverage'),
+            'token_usage': result['token_usage'],
             'prompts': {
                 'annotation': annotation_prompt
             }
@@ -351,6 +566,49 @@ def get_annotation():
         print(f"❌ Error in get_annotation: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/get_annotation/stream', methods=['POST'])
+def get_annotation_stream():
+    """Stream the annotated transcript to the browser as server-sent events"""
+    if not analyzer:
+        return jsonify({'error': 'Claude API key not configured. Please set ANTHROPIC_API_KEY environment variable.'}), 500
+    
+    transcript = get_session_data('prompt_transcript')
+    if not transcript:
+        return jsonify({'error': 'No transcript found in session'}), 400
+    raw = get_session_data('transcript')
+    session_id = get_session_id()
+    
+    def generate():
+        print("🔄 Streaming annotation...")
+        events, annotation_prompt = analyzer.stream_annotation(transcript)
+        try:
+            for event in events:
+                if event['type'] == 'text':
+                    yield sse_event('token', {'text': event['text']})
+                else:
+                    annotated_transcript = event['content']
+                    set_session_data('annotated_transcript', annotated_transcript)
+                    set_session_data('annotations', event.get('annotations'))
+                    set_session_data('annotation_prompt', annotation_prompt)
+                    record_history(session_id, raw, annotated_transcript=annotated_transcript,
+                                   annotations=event.get('annotations'), token_usage={'annotation': event['token_usage']})
+                    print(f"✅ Annotation stream completed ({len(annotated_transcript)} characters, stop reason: {event['stop_reason']})")
+                    yield sse_event('done', {
+                        'annotated_transcript': annotated_transcript,
+                        'annotations': event.get('annotations'),
+                        'coverage': event.get('coverage'),
+                        'token_usage': event['token_usage'],
+                        'cached': event.get('cached', False),
+                        'prompts': {
+                            'annotation': annotation_prompt
+                        }
+                    })
+        except Exception as e:
+            print(f"❌ Error in annotation stream: {str(e)}")
+            yield sse_event('error', {'error': f"Error annotating transcript: {str(e)}"})
+    
+    return sse_response(generate())
+
 @app.route('/chat', methods=['POST'])
 def chat():
     try:
@@ -363,20 +621,25 @@ def chat():
         if not question:
             return jsonify({'error': 'No question provided'}), 400
         
-        transcript = get_session_data('transcript', '')
+        transcript = get_session_data('prompt_transcript', '')
         analysis = get_session_data('analysis', '')
         
         if not transcript or not analysis:
             return jsonify({'error': 'No previous analysis found. Please analyze a transcript first.'}), 400
         
         print(f"🔄 Processing chat question: {question[:50]}...")
-        response, chat_prompt = analyzer.chat_about_analysis(question, transcript, analysis)
+        history = ChatHistory.from_dict(get_session_data('chat_history'))
+        response, chat_prompt, answered = analyzer.chat_about_analysis(question, transcript, analysis, history)
         
         # Store the chat prompt in session for the Prompts tab
         set_session_data('last_chat_prompt', chat_prompt)
+        if answered:
+            history = add_chat_exchange(get_session_id(), question, response)
+            summarize_chat_history(get_session_id(), history)
         
         return jsonify({
             'response': response,
+            'response_html': markup.to_html(response),
             'chat_prompt': chat_prompt
         })
     
@@ -384,61 +647,316 @@ def chat():
         print(f"❌ Error in chat: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream a chat answer to the browser as server-sent events"""
+    if not analyzer:
+        return jsonify({'error': 'Claude API key not configured. Please set ANTHROPIC_API_KEY environment variable.'}), 500
+    
+    data = request.get_json()
+    question = data.get('question', '').strip()
+    
+    if not question:
+        return jsonify({'error': 'No question provided'}), 400
+    
+    transcript = get_session_data('prompt_transcript', '')
+    analysis = get_session_data('analysis', '')
+    
+    if not transcript or not analysis:
+        return jsonify({'error': 'No previous analysis found. Please analyze a transcript first.'}), 400
+    
+    session_id = get_session_id()
+    history = ChatHistory.from_dict(get_session_data('chat_history'))
+    
+    def generate():
+        print(f"🔄 Streaming chat question: {question[:50]}...")
+        events, chat_prompt = analyzer.stream_chat(question, transcript, analysis, history)
+        try:
+            for event in events:
+                if event['type'] == 'text':
+                    yield sse_event('token', {'text': event['text']})
+                else:
+                    set_session_data_for(session_id, 'last_chat_prompt', chat_prompt)
+                    summarize_chat_history(session_id, add_chat_exchange(session_id, question, event['content']))
+                    yield sse_event('done', {
+                        'response': event['content'],
+                        'response_html': markup.to_html(event['content']),
+                        'token_usage': event['token_usage'],
+                        'chat_prompt': chat_prompt
+                    })
+        except Exception as e:
+            print(f"❌ Error in chat stream: {str(e)}")
+            yield sse_event('error', {'error': f"Error processing question: {str(e)}"})
+    
+    return sse_response(generate())
+
 @app.route('/update-analysis', methods=['POST'])
 def update_analysis():
     """Update the analysis results in session"""
     try:
         data = request.get_json()
-        updated_analysis = data.get('analysis', '').strip()
+        # A scorecard line typed into the edit replaces the stored scorecard
+        updated_analysis, scorecard = split_scorecard(data.get('analysis', '').strip())
         
         if not updated_analysis:
             return jsonify({'error': 'No analysis content provided'}), 400
         
         # Update analysis in session store
         set_session_data('analysis', updated_analysis)
+        transcript = get_session_data('transcript')
+        if transcript:
+            record_history(get_session_id(), transcript, analysis=updated_analysis, scorecard=scorecard)
         
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'analysis_html': markup.to_html(updated_analysis)})
         
     except Exception as e:
         print(f"❌ Error updating analysis: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/history')
+def history_page():
+    """Browse and search previously analyzed calls"""
+    return render_template('history.html')
+
+@app.route('/history/search')
+def history_search():
+    """Full-text search over past calls; without q, the most recent calls are listed"""
+    try:
+        return jsonify(history_store.search(
+            query=request.args.get('q', ''),
+            rep=request.args.get('rep') or None,
+            date_from=request.args.get('from') or None,
+            date_to=request.args.get('to') or None,
+            limit=min(request.args.get('limit', 25, type=int), 100),
+            offset=max(request.args.get('offset', 0, type=int), 0)
+        ))
+    except Exception as e:
+        print(f"❌ Error searching history: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/history/<int:call_id>', methods=['GET'])
+def history_get(call_id):
+    record = history_store.get(call_id)
+    if not record:
+        return jsonify({'error': 'Call not found'}), 404
+    return jsonify(record)
+
+@app.route('/history/<int:call_id>', methods=['DELETE'])
+def history_delete(call_id):
+    if not history_store.delete(call_id):
+        return jsonify({'error': 'Call not found'}), 404
+    scorecards.invalidate()
+    return jsonify({'success': True})
+
+@app.route('/history/<int:call_id>/open', methods=['POST'])
+def history_open(call_id):
+    """Load a past call into the session so chat and PDF export work without another LLM call"""
+    record = history_store.get(call_id)
+    if not record:
+        return jsonify({'error': 'Call not found'}), 404
+    
+    set_session_data('transcript', record['transcript'])
+    set_session_data('prompt_transcript', compactor.compact(record['transcript'])[0])
+    set_session_data('call_metadata', {key: record[key] for key in ('rep', 'call_date', 'source_file')})
+    set_session_data('analysis', record['analysis'])
+    set_session_data('annotated_transcript', record['annotated_transcript'])
+    set_session_data('annotations', record['annotations'])
+    set_session_data('metrics', record['metrics'])
+    set_session_data('chat_history', None)
+    for key in ('analysis_prompt', 'annotation_prompt', 'last_chat_prompt'):
+        set_session_data(key, None)
+    
+    print(f"📂 Reopened call {call_id} from history")
+    return jsonify({
+        'id': record['id'],
+        'transcript': record['transcript'],
+        'analysis': record['analysis'],
+        'analysis_html': markup.to_html(record['analysis']),
+        'annotated_transcript': record['annotated_transcript'],
+        'annotations': record['annotations'],
+        'token_usage': record['token_usage'].get('analysis', {}),
+        'rep': record['rep'],
+        'call_date': record['call_date'],
+        'source_file': record['source_file'],
+        'metrics': record['metrics']
+    })
+
+@app.route('/scorecards')
+def scorecards_page():
+    """Per-rep and team scorecards across analyzed calls"""
+    return render_template('scorecards.html')
+
+@app.route('/scorecards/data')
+def scorecards_data():
+    """Percentiles, distributions and outcome mix per rep and for the team over the last `days` days (0 for all)"""
+    try:
+        folded = scorecards.sync(history_store)
+        if folded:
+            print(f"📈 Folded {folded} calls into scorecards ({len(scorecards)} total)")
+        return jsonify(scorecards.summary(
+            days=max(request.args.get('days', 90, type=int), 0),
+            rep=request.args.get('rep') or None
+        ))
+    except Exception as e:
+        print(f"❌ Error building scorecards: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/clear', methods=['POST'])
 def clear_session():
     clear_session_data()
     return jsonify({'success': True})
 
+@app.route('/export/<fmt>', methods=['GET'])
+def export_report(fmt):
+    """Stream the session's report as HTML, Markdown or Word (PDF goes through /export-pdf)"""
+    if fmt not in EXPORT_FORMATS or fmt == 'pdf':
+        return jsonify({'error': 'Unknown export format. Use html, md or docx.'}), 404
+    
+    analysis = get_session_data('analysis')
+    annotated_transcript = get_session_data('annotations') or get_session_data('annotated_transcript') or ''
+    if not analysis:
+        return jsonify({'error': 'No analysis data found. Please analyze a transcript first.'}), 400
+    
+    try:
+        chunks = export_chunks(fmt, analysis, annotated_transcript, get_session_data('call_metadata'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 500
+    
+    print(f"📤 Exporting report as {fmt}")
+    return Response(chunks, content_type=EXPORT_FORMATS[fmt][0],
+                    headers={'Content-Disposition': f'attachment; filename="{export_filename(fmt)}"'})
+
+def prune_bulk_exports():
+    """Remove bulk export zips older than BULK_EXPORT_TTL"""
+    cutoff = time.time() - BULK_EXPORT_TTL
+    for name in os.listdir(BULK_EXPORT_DIR):
+        path = os.path.join(BULK_EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def job_download_state(job_id, part_name):
+    """State of a job with the given part for a download route, or None.
+
+    A job run by another worker process is read from its last published snapshot.
+    """
+    job = job_manager.get(job_id, owner=get_session_id())
+    state = job.to_dict() if job else get_session_data(f"job:{job_id}")
+    if not state or part_name not in state['parts']:
+        return None
+    return state
+
+@app.route('/export/bulk', methods=['POST'])
+def export_bulk():
+    """Start zipping exports of saved calls in the background; body is {"ids": [...], "format": "md"}.
+
+    Returns a job id and the URL to download the zip from once it is ready.
+    """
+    data = request.get_json() or {}
+    fmt = data.get('format', 'md')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown export format. Use one of: {', '.join(EXPORT_FORMATS)}."}), 400
+    try:
+        ids = [int(call_id) for call_id in data.get('ids') or []]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Call ids must be numbers'}), 400
+    if not ids:
+        return jsonify({'error': 'No calls selected'}), 400
+    if len(ids) > BULK_EXPORT_MAX_CALLS:
+        return jsonify({'error': f'At most {BULK_EXPORT_MAX_CALLS} calls can be exported at once'}), 400
+    
+    calls = [call for call in map(history_store.get, dict.fromkeys(ids)) if call and call['analysis']]
+    if not calls:
+        return jsonify({'error': 'None of the selected calls have an analysis'}), 404
+    
+    def run_zip(emit):
+        os.makedirs(BULK_EXPORT_DIR, exist_ok=True)
+        prune_bulk_exports()
+        name = f"{uuid.uuid4().hex}.zip"
+        path = os.path.join(BULK_EXPORT_DIR, name)
+        # Written under a temporary name and renamed so a download never sees a partial zip
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'wb') as output:
+                names = bulk_exporter.write_zip(output, calls, fmt)
+            os.replace(temp_path, path)
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            print(f"❌ Error in bulk export: {str(e)}")
+            raise
+        print(f"📦 Bulk export of {len(names)} calls as {fmt}")
+        return {'file': name, 'calls': len(names), 'bytes': os.path.getsize(path)}
+    
+    job = job_manager.submit({'zip': run_zip}, owner=get_session_id())
+    return jsonify({**job.to_dict(), 'download_url': f"/export/bulk/{job.id}"}), 202
+
+@app.route('/export/bulk/<job_id>', methods=['GET'])
+def download_bulk(job_id):
+    """Download a bulk export zip; 202 with the job status while it is still being built"""
+    state = job_download_state(job_id, 'zip')
+    if not state:
+        return jsonify({'error': 'Export not found'}), 404
+    
+    part = state['parts']['zip']
+    if part['status'] == 'failed':
+        return jsonify({'error': f"Failed to export calls: {part['error']}"}), 500
+    if part['status'] != 'completed':
+        return jsonify(state), 202
+    
+    path = os.path.join(BULK_EXPORT_DIR, part['result']['file'])
+    if not os.path.exists(path):
+        return jsonify({'error': 'This export has expired. Please export the calls again.'}), 410
+    created_at = datetime.fromisoformat(state['created_at'])
+    return send_file(path, mimetype='application/zip', as_attachment=True,
+                     download_name=f"sales_analysis_reports_{created_at.strftime('%Y%m%d_%H%M%S')}.zip")
+
 @app.route('/export-pdf', methods=['POST'])
 def export_pdf():
-    """Export analysis results and annotated transcript as PDF"""
-    try:
-        # Get analysis data from session
-        analysis = get_session_data('analysis')
-        annotated_transcript = get_session_data('annotated_transcript')
-        original_transcript = get_session_data('transcript')
-        
-        if not analysis or not annotated_transcript:
-            return jsonify({'error': 'No analysis data found. Please analyze a transcript first.'}), 400
-        
-        # Generate PDF
-        pdf_generator = SalesCoachPDFGenerator()
-        pdf_data = pdf_generator.generate_pdf_report(
-            analysis_content=analysis,
-            annotated_transcript=annotated_transcript,
-            transcript_original=original_transcript or ""
-        )
-        
-        # Create response with PDF data
-        response = make_response(pdf_data)
-        response.headers['Content-Type'] = 'application/pdf'
-        from datetime import datetime
-        response.headers['Content-Disposition'] = f'attachment; filename="sales_analysis_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-        
-        return response
-        
-    except Exception as e:
-        print(f"❌ Error generating PDF: {str(e)}")
-        return jsonify({'error': f'Failed to generate PDF: {str(e)}'}), 500
+    """Start rendering the PDF report in the background; returns a job id to download it with"""
+    # Get analysis data from session
+    analysis = get_session_data('analysis')
+    # Prefer the structured annotation items over re-parsing [COACH: ...] text
+    annotated_transcript = get_session_data('annotations') or get_session_data('annotated_transcript')
+    original_transcript = get_session_data('transcript') or ""
+    
+    if not analysis or not annotated_transcript:
+        return jsonify({'error': 'No analysis data found. Please analyze a transcript first.'}), 400
+    
+    def run_pdf(emit):
+        key, path, cached = report_renderer.render(analysis, annotated_transcript, original_transcript)
+        print(f"📄 PDF report {key[:12]} {'served from cache' if cached else 'rendered'}")
+        return {'report_key': key, 'cached': cached, 'bytes': os.path.getsize(path)}
+    
+    job = job_manager.submit({'pdf': run_pdf}, owner=get_session_id())
+    return jsonify({**job.to_dict(), 'download_url': f"/export-pdf/{job.id}"}), 202
+
+@app.route('/export-pdf/<job_id>', methods=['GET'])
+def download_pdf(job_id):
+    """Download a rendered PDF report; 202 with the job status while it is still rendering"""
+    state = job_download_state(job_id, 'pdf')
+    if not state:
+        return jsonify({'error': 'Export not found'}), 404
+    
+    part = state['parts']['pdf']
+    if part['status'] == 'failed':
+        return jsonify({'error': f"Failed to generate PDF: {part['error']}"}), 500
+    if part['status'] != 'completed':
+        return jsonify(state), 202
+    
+    path = report_renderer.cached(part['result']['report_key'])
+    if path is None:
+        return jsonify({'error': 'This report is no longer cached. Please export it again.'}), 410
+    created_at = datetime.fromisoformat(state['created_at'])
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f"sales_analysis_report_{created_at.strftime('%Y%m%d_%H%M%S')}.pdf")
+
+@app.route('/reports/stats')
+def report_stats():
+    """PDF renders, cache hits, shared renders and cached report sizes"""
+    return jsonify(report_renderer.stats())
 
 @app.route('/health')
 def health_check():
@@ -446,9 +964,35 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'analyzer_ready': analyzer is not None,
-        'api_configured': bool(os.getenv('ANTHROPIC_API_KEY'))
+        'api_configured': bool(os.getenv('ANTHROPIC_API_KEY')),
+        'result_cache': result_cache.stats(),
+        'rate_limiter': rate_limiter.stats(),
+        'scheduler': scheduler.stats(),
+        'session_store': session_store.stats(),
+        'reports': report_renderer.stats(),
+        'history': history_store.stats()
     })
 
+@app.route('/session/stats')
+def session_stats():
+    """Session count, bytes held, blob deduplication and eviction counters"""
+    return jsonify(session_store.stats())
+
+@app.route('/scheduler/stats')
+def scheduler_stats():
+    """Per-priority-class concurrency and queue wait times for Claude requests"""
+    return jsonify(scheduler.stats())
+
+@app.route('/rate-limit/stats')
+def rate_limit_stats():
+    """Queue depth, available token budget and retry counters for Claude calls"""
+    return jsonify(rate_limiter.stats())
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Result cache hit/miss counters and tier sizes"""
+    return jsonify(result_cache.stats())
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') == 'development'
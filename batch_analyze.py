@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Salescoach Batch Analyzer
+Analyzes and annotates every transcript in a directory from the command line (VTT by
+default; SRT, JSON, DOCX, PDF and text files with --pattern), writing an analysis, an
+annotated transcript and a PDF report per call.
+
+Work is sent through the Message Batches API (half price, results within 24 hours) or a
+bounded pool of regular requests. Progress is checkpointed in the output directory, so
+an interrupted run picks up where it stopped, including batches already submitted.
+
+    python batch_analyze.py recordings/ --output reports/
+    python batch_analyze.py recordings/ --mode pool --workers 4
+    python batch_analyze.py exports/ --pattern '*.docx'
+    python batch_analyze.py recordings/ --base-url http://localhost:8080   # tests/fake_anthropic.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from ingest import ingest_transcript, iter_raw
+from metrics import CueTimeline, compute_metrics, metrics_facts
+from sales_analyzer import (SalescoachAnalyzer, ANNOTATION_MODE, create_result_cache, create_rate_limiter,
+                            create_scheduler, create_compactor, create_document_extractor)
+from scorecards import split_scorecard
+
+CHECKPOINT_FILE = 'checkpoint.json'
+PARTS = ('analysis', 'annotation')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-analyze a directory of VTT sales call transcripts")
+    parser.add_argument('directory', help="Directory containing the transcripts")
+    parser.add_argument('--output', default='batch_output', help="Where reports and the checkpoint are written (default: batch_output)")
+    parser.add_argument('--pattern', default='*.vtt', help="File name pattern to pick up (default: *.vtt)")
+    parser.add_argument('--mode', choices=('batch', 'pool'), default='batch',
+                        help="batch: Message Batches API; pool: concurrent regular requests (default: batch)")
+    parser.add_argument('--workers', type=int, default=4, help="Calls processed concurrently in pool mode (default: 4)")
+    parser.add_argument('--batch-size', type=int, default=100, help="Calls per submitted batch (default: 100)")
+    parser.add_argument('--poll-interval', type=float, default=60, help="Seconds between batch status checks (default: 60)")
+    parser.add_argument('--base-url', help="Send requests to this Anthropic-compatible endpoint instead")
+    parser.add_argument('--no-pdf', action='store_true', help="Skip PDF report generation")
+    return parser.parse_args(argv)
+
+
+def iter_transcripts(directory, pattern):
+    """Yield (name, path) for matching files in name order without loading them"""
+    names = sorted(entry.name for entry in os.scandir(directory)
+                   if entry.is_file() and fnmatch.fnmatch(entry.name, pattern))
+    for name in names:
+        yield name, os.path.join(directory, name)
+
+
+def content_id(content):
+    """Fingerprint of a transcript, so an edited file is processed again"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:24]
+
+
+def custom_id(name, part):
+    """Batch request id (letters, digits, - and _ only) for one part of one file"""
+    return f"{hashlib.sha256(name.encode('utf-8')).hexdigest()[:24]}-{part}"
+
+
+def write_atomic(path, data):
+    """Write bytes or text via a temp file so an interrupted run never leaves partial output
+
+    data may also be a function that writes to the open binary file.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        if callable(data):
+            data(f)
+        else:
+            f.write(data.encode('utf-8') if isinstance(data, str) else data)
+    os.replace(tmp_path, path)
+
+
+class Checkpoint:
+    """Per-file progress plus the ids of batches submitted but not yet collected"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {'files': {}, 'batches': {}}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+            print(f"📌 Resuming from {path}")
+
+    def file(self, name, fingerprint):
+        """Progress entry for a file; reset when the file content has changed"""
+        with self.lock:
+            entry = self.data['files'].get(name)
+            if entry is None or entry['id'] != fingerprint:
+                entry = {'id': fingerprint, 'parts': {}, 'pdf': False, 'error': None}
+                self.data['files'][name] = entry
+            return entry
+
+    def update(self, name, **changes):
+        with self.lock:
+            self.data['files'][name].update(changes)
+            self._save()
+
+    def complete_part(self, name, part):
+        with self.lock:
+            self.data['files'][name]['parts'][part] = 'completed'
+            self._save()
+
+    def add_batch(self, batch_id, requests):
+        with self.lock:
+            self.data['batches'][batch_id] = requests
+            self._save()
+
+    def remove_batch(self, batch_id):
+        with self.lock:
+            self.data['batches'].pop(batch_id, None)
+            self._save()
+
+    def _save(self):
+        write_atomic(self.path, json.dumps(self.data, indent=2))
+
+
+class BatchRunner:
+    def __init__(self, args, analyzer, pdf_generator=None):
+        self.args = args
+        self.analyzer = analyzer
+        self.pdf_generator = pdf_generator
+        self.compactor = create_compactor()
+        self.document_extractor = create_document_extractor()
+        os.makedirs(args.output, exist_ok=True)
+        self.checkpoint = Checkpoint(os.path.join(args.output, CHECKPOINT_FILE))
+        self.counts = {'completed': 0, 'skipped': 0, 'failed': 0}
+        self.usages = []
+        self.finished = set()
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    # Loading and writing results
+
+    def load(self, name, path):
+        """Read one transcript into speaker turns, measure and compact it, the same way as the web UI"""
+        timeline = CueTimeline()
+        with open(path, 'rb') as f:
+            content, _ = ingest_transcript(name, iter_raw(f), self.document_extractor, timeline)
+        self.metrics[name] = compute_metrics(timeline)
+        content, _ = self.compactor.compact(content.strip())
+        return content
+
+    def call_dir(self, name):
+        directory = os.path.join(self.args.output, os.path.splitext(name)[0])
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def save_part(self, name, part, result):
+        """Write one finished part to disk and record it in the checkpoint"""
+        directory = self.call_dir(name)
+        if part == 'analysis':
+            analysis, scorecard = split_scorecard(result['content'])
+            write_atomic(os.path.join(directory, 'analysis.md'), analysis)
+            if scorecard:
+                write_atomic(os.path.join(directory, 'scorecard.json'), json.dumps(scorecard, indent=2))
+            if name in self.metrics:
+                write_atomic(os.path.join(directory, 'metrics.json'), json.dumps(self.metrics[name], indent=2))
+        else:
+            write_atomic(os.path.join(directory, 'annotated_transcript.txt'), result['content'])
+            write_atomic(os.path.join(directory, 'annotation.json'), json.dumps({
+                'annotations': result.get('annotations'),
+                'coverage': result.get('coverage')
+            }, indent=2))
+        if result.get('token_usage') and not result.get('cached'):
+            with self.lock:
+                self.usages.append(result['token_usage'])
+        self.checkpoint.complete_part(name, part)
+
+    def finish_file(self, name, transcript):
+        """Render the PDF once both parts are on disk"""
+        entry = self.checkpoint.data['files'][name]
+        if any(entry['parts'].get(part) != 'completed' for part in PARTS):
+            return
+        if self.pdf_generator and not entry['pdf']:
+            directory = self.call_dir(name)
+            with open(os.path.join(directory, 'analysis.md'), 'r', encoding='utf-8') as f:
+                analysis = f.read()
+            with open(os.path.join(directory, 'annotation.json'), 'r', encoding='utf-8') as f:
+                annotated = json.load(f)['annotations']
+            if not annotated:
+                with open(os.path.join(directory, 'annotated_transcript.txt'), 'r', encoding='utf-8') as f:
+                    annotated = f.read()
+            write_atomic(os.path.join(directory, 'report.pdf'), lambda f: self.pdf_generator.write_pdf_report(
+                f,
+                analysis_content=analysis,
+                annotated_transcript=annotated,
+                transcript_original=transcript
+            ))
+        self.checkpoint.update(name, pdf=bool(self.pdf_generator), error=None)
+        with self.lock:
+            self.counts['completed'] += 1
+            self.finished.add(name)
+        print(f"✅ {name} completed")
+
+    def fail_file(self, name, error):
+        print(f"❌ {name} failed: {error}")
+        self.checkpoint.update(name, error=str(error))
+        with self.lock:
+            self.counts['failed'] += 1
+
+    # Regular (pool) requests
+
+    def run_part(self, name, part, transcript):
+        """Run one part with regular requests; results come from the shared result cache when possible"""
+        if part == 'analysis':
+            result, _ = self.analyzer.analyze_transcript(transcript, self.metrics.get(name))
+            if not isinstance(result, dict):
+                raise RuntimeError(result)
+            return result
+        events, _ = self.analyzer.stream_annotation(transcript)
+        for event in events:
+            if event['type'] == 'done':
+                return event
+        raise RuntimeError("Annotation ended without a result")
+
+    def process_file(self, name, transcript, parts):
+        try:
+            for part in parts:
+                self.save_part(name, part, self.run_part(name, part, transcript))
+            self.finish_file(name, transcript)
+        except Exception as e:
+            self.fail_file(name, e)
+
+    def run_pool(self, pending):
+        """Process files on a bounded pool, never reading more files than it can work on"""
+        with ThreadPoolExecutor(max_workers=self.args.workers, thread_name_prefix='salescoach-batch') as executor:
+            in_flight = set()
+            for name, transcript, parts in pending:
+                if len(in_flight) >= self.args.workers * 2:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                in_flight.add(executor.submit(self.process_file, name, transcript, parts))
+            wait(in_flight)
+
+    # Message Batches API
+
+    def batch_requests(self, name, transcript, parts):
+        """Batch request entries for the parts of one file that can run as single requests"""
+        requests = []
+        for part in parts:
+            if part == 'analysis':
+                prompt = self.analyzer.build_analysis_prompt(transcript, self.metrics.get(name))
+            elif ANNOTATION_MODE == 'structured':
+                prompt = self.analyzer.build_structured_annotation_prompt(transcript)
+            else:
+                # Inline annotation may need chunking and gap filling, which only regular requests can do
+                continue
+            requests.append({
+                'custom_id': custom_id(name, part),
+                'params': self.analyzer.request_params([{"role": "user", "content": prompt}])
+            })
+        return requests
+
+    def run_batches(self, pending):
+        """Submit pending work in batches of --batch-size files, collecting each before the next"""
+        group = []
+        for item in pending:
+            group.append(item)
+            if len(group) >= self.args.batch_size:
+                self.submit_batch(group)
+                group = []
+        if group:
+            self.submit_batch(group)
+
+    def submit_batch(self, group):
+        requests, by_id, leftovers = [], {}, []
+        for name, transcript, parts in group:
+            file_requests = self.batch_requests(name, transcript, parts)
+            requests.extend(file_requests)
+            for request in file_requests:
+                by_id[request['custom_id']] = name
+            batched = {request['custom_id'].rsplit('-', 1)[1] for request in file_requests}
+            if len(batched) < len(parts):
+                leftovers.append((name, transcript, [part for part in parts if part not in batched]))
+
+        if requests:
+            batch = self.analyzer.client.messages.batches.create(requests=requests)
+            print(f"📦 Submitted batch {batch.id} with {len(requests)} requests for {len(group)} calls")
+            self.checkpoint.add_batch(batch.id, by_id)
+            self.collect_batch(batch.id, {name: transcript for name, transcript, _ in group})
+        if leftovers:
+            self.run_pool(leftovers)
+
+    def collect_batch(self, batch_id, transcripts=None):
+        """Wait for a batch to end, then save its results; failed or truncated parts are redone in the pool
+
+        transcripts maps file names to their loaded transcripts; files missing from it (a batch
+        left by an earlier run) are read once each.
+        """
+        client = self.analyzer.client.messages.batches
+        while True:
+            batch = client.retrieve(batch_id)
+            if batch.processing_status == 'ended':
+                break
+            counts = batch.request_counts
+            print(f"⏳ Batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded, {counts.errored} errored")
+            time.sleep(self.args.poll_interval)
+
+        by_id = self.checkpoint.data['batches'].get(batch_id, {})
+        transcripts = dict(transcripts or {})
+        retry = {}
+        for entry in client.results(batch_id):
+            name = by_id.get(entry.custom_id)
+            if name is None:
+                continue
+            part = entry.custom_id.rsplit('-', 1)[1]
+            if self.checkpoint.data['files'][name]['parts'].get(part) == 'completed':
+                continue
+            if name not in transcripts:
+                transcripts[name] = self.load(name, os.path.join(self.args.directory, name))
+            transcript = transcripts[name]
+            message = entry.result.message if entry.result.type == 'succeeded' else None
+            if message is None or message.stop_reason == 'max_tokens':
+                reason = entry.result.type if message is None else 'hit max_tokens'
+                print(f"↪️ {name} {part} {reason} in batch; retrying with a regular request")
+                retry.setdefault(name, (transcript, []))[1].append(part)
+                continue
+            self.save_part(name, part, self.batch_result(name, part, transcript, message))
+            if name not in retry:
+                self.finish_file(name, transcript)
+
+        self.checkpoint.remove_batch(batch_id)
+        if retry:
+            self.run_pool([(name, transcript, parts) for name, (transcript, parts) in retry.items()])
+
+    def batch_result(self, name, part, transcript, message):
+        """Turn a batch message into the same result shape as a regular call, and cache it"""
+        content = ''.join(block.text for block in message.content if block.type == 'text')
+        token_usage = self.analyzer._token_usage(message.usage)
+        if part == 'analysis':
+            cache_key = self.analyzer._cache_key('analysis', transcript, metrics_facts(self.metrics.get(name)))
+            self.analyzer._store_result(cache_key, content, token_usage, message.stop_reason)
+            return {'content': content, 'token_usage': token_usage}
+        content, items, coverage = self.analyzer.merge_structured_notes(transcript, content)
+        cache_key = self.analyzer._cache_key('annotation-structured', transcript)
+        self.analyzer._store_result(cache_key, content, token_usage, message.stop_reason,
+                                    annotations=items, coverage=coverage)
+        return {'content': content, 'annotations': items, 'coverage': coverage, 'token_usage': token_usage}
+
+    # Driver
+
+    def pending(self):
+        """Yield (name, transcript, remaining parts) for files that still need work"""
+        submitted = {name for ids in self.checkpoint.data['batches'].values() for name in ids.values()}
+        for name, path in iter_transcripts(self.args.directory, self.args.pattern):
+            transcript = self.load(name, path)
+            if not transcript:
+                print(f"⚠️ {name} has no transcript text; skipping")
+                continue
+            entry = self.checkpoint.file(name, content_id(transcript))
+            parts = [part for part in PARTS if entry['parts'].get(part) != 'completed']
+            if not parts and (entry['pdf'] or not self.pdf_generator):
+                if name not in self.finished:
+                    self.counts['skipped'] += 1
+                continue
+            if name in submitted:
+                continue
+            if not parts:
+                self.finish_file(name, transcript)
+                continue
+            yield name, transcript, parts
+
+    def run(self):
+        started = time.time()
+        # Batches submitted by an interrupted run are collected rather than resubmitted
+        for batch_id in list(self.checkpoint.data['batches']):
+            print(f"📦 Collecting batch {batch_id} from the previous run")
+            self.collect_batch(batch_id)
+
+        if self.args.mode == 'batch':
+            self.run_batches(self.pending())
+        else:
+            self.run_pool(self.pending())
+
+        from annotation_pipeline import merge_token_usage
+        usage = merge_token_usage(self.usages)
+        print(f"🏁 Done in {time.time() - started:.0f}s: {self.counts['completed']} completed, "
+              f"{self.counts['skipped']} already done, {self.counts['failed']} failed")
+        if usage:
+            print(f"📊 Tokens - Input: {usage['input_tokens']:,}, Cache read: {usage['cache_read_input_tokens']:,}, "
+                  f"Output: {usage['output_tokens']:,}")
+        return 1 if self.counts['failed'] else 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.base_url:
+        # The Anthropic client reads this when the analyzer is created
+        os.environ['ANTHROPIC_BASE_URL'] = args.base_url
+    if not os.path.isdir(args.directory):
+        print(f"❌ {args.directory} is not a directory")
+        return 2
+
+    from pdf_generator import SalesCoachPDFGenerator
+    try:
+        # Every request runs in the scheduler's lowest class, behind interactive work
+        analyzer = SalescoachAnalyzer(cache=create_result_cache(), limiter=create_rate_limiter(),
+                                      scheduler=create_scheduler(), priority='batch')
+    except ValueError:
+        print("❌ Claude API key not configured. Please set ANTHROPIC_API_KEY environment variable.")
+        return 2
+
+    runner = BatchRunner(args, analyzer, None if args.no_pdf else SalesCoachPDFGenerator())
+    return runner.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
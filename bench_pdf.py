@@ -0,0 +1,121 @@
+"""
+PDF Report Benchmark for Sales Coach
+Compares the in-memory report build (whole story in a list, rendered into a BytesIO)
+with the streaming build (flowables generated as they are laid out, written to a file)
+on synthetic annotated transcripts of growing length. Each run happens in a fresh
+process so peak RSS belongs to that run alone.
+
+    python bench_pdf.py --turns 1000 4000 16000
+"""
+
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ('in-memory', 'streaming')
+
+ANALYSIS = """## Overall Performance
+The rep opened well and kept the **agenda** clear, but spent too long on *features*.
+
+## Strengths
+- Confirmed the buyer's timeline early
+- Summarized next steps before hanging up
+
+## Areas for Improvement
+- Ask about budget before the demo
+- Let the buyer finish before answering objections
+
+Scorecard: outcome=advancing, objections=2"""
+
+
+def synthetic_annotation(turns, coach_every=8):
+    """Annotated transcript text with a [COACH: ...] note every few turns"""
+    lines = []
+    for number in range(turns):
+        speaker = 'Rep' if number % 2 else 'Buyer'
+        lines.append(f"{speaker}: Turn {number} talks about onboarding, pricing tiers and how the "
+                     f"rollout would work for the regional teams over the next quarter.")
+        if number % coach_every == coach_every - 1:
+            lines.append(f"[COACH: Good follow-up on turn {number}; tie it back to the buyer's **goal**.]")
+    return '\n'.join(lines)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run(mode, turns):
+    """One build in this process; returns its timings and memory"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+    from pdf_generator import SalesCoachPDFGenerator
+
+    generator = SalesCoachPDFGenerator()
+    annotated = synthetic_annotation(turns)
+    before = peak_rss_mb()
+    start = time.perf_counter()
+
+    if mode == 'in-memory':
+        # The previous path: every flowable built up front, the PDF held in memory and copied out
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
+                                topMargin=72, bottomMargin=18)
+        doc.build(list(generator.report_flowables(ANALYSIS, generator.parse_annotated_transcript(annotated))))
+        size = len(buffer.getvalue())
+    else:
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            generator.write_pdf_report(path, ANALYSIS, annotated)
+            size = os.path.getsize(path)
+        finally:
+            os.remove(path)
+
+    return {
+        'mode': mode,
+        'turns': turns,
+        'seconds': round(time.perf_counter() - start, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'build_rss_mb': round(peak_rss_mb() - before, 1),
+        'pdf_kb': size // 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark in-memory and streaming PDF report builds')
+    parser.add_argument('--turns', type=int, nargs='+', default=[1000, 4000, 16000],
+                        help='Transcript lengths (speaker turns) to build reports for')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--run', nargs=2, metavar=('MODE', 'TURNS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        # Child process: report one measurement as the last line of output
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            result = run(args.run[0], int(args.run[1]))
+            sys.stdout = stdout
+        print(json.dumps(result))
+        return
+
+    print(f"{'mode':<10} {'turns':>7} {'seconds':>8} {'peak RSS MB':>12} {'build RSS MB':>13} {'PDF KB':>8}")
+    for turns in args.turns:
+        for mode in args.modes:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode, str(turns)],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{result['mode']:<10} {result['turns']:>7} {result['seconds']:>8} "
+                  f"{result['peak_rss_mb']:>12} {result['build_rss_mb']:>13} {result['pdf_kb']:>8}")
+
+
+if __name__ == '__main__':
+    main()
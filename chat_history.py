@@ -0,0 +1,65 @@
+"""
+Chat History for Sales Coach
+The questions and answers of one coaching chat, replayed to Claude as real multi-turn
+messages. Once the history grows past a token budget, the oldest exchanges are folded
+into a running summary so every turn costs about the same however long the chat runs.
+"""
+
+from compaction import estimate_tokens
+
+
+class ChatHistory:
+    """A running summary of earlier exchanges plus the recent ones verbatim"""
+
+    def __init__(self, summary='', exchanges=None, summarized=0):
+        self.summary = summary
+        self.exchanges = exchanges or []
+        self.summarized = summarized
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(data.get('summary', ''), [tuple(exchange) for exchange in data.get('exchanges', [])],
+                   data.get('summarized', 0))
+
+    def to_dict(self):
+        return {'summary': self.summary, 'exchanges': [list(exchange) for exchange in self.exchanges],
+                'summarized': self.summarized}
+
+    def __len__(self):
+        return self.summarized + len(self.exchanges)
+
+    def add(self, question, answer):
+        self.exchanges.append((question, answer))
+
+    def tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(question) + estimate_tokens(answer)
+                                                   for question, answer in self.exchanges)
+
+    def to_summarize(self, budget, keep=2):
+        """Oldest exchanges to fold into the summary once the history is over budget (empty when within it)"""
+        if self.tokens() <= budget or len(self.exchanges) <= keep:
+            return []
+        return self.exchanges[:len(self.exchanges) - keep]
+
+    def apply_summary(self, summary, exchanges):
+        """Replace the given leading exchanges with an updated summary.
+
+        Returns False (and changes nothing) if the history no longer starts with them,
+        e.g. after the chat was reset while the summary was being written.
+        """
+        if self.exchanges[:len(exchanges)] != list(exchanges):
+            return False
+        self.summary = summary
+        self.exchanges = self.exchanges[len(exchanges):]
+        self.summarized += len(exchanges)
+        return True
+
+    def messages(self):
+        """Alternating user/assistant messages for the exchanges kept verbatim"""
+        messages = []
+        for question, answer in self.exchanges:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        return messages
@@ -0,0 +1,189 @@
+"""
+Transcript Compaction for Sales Coach
+Optional preprocessing between parsing and prompting that shrinks a transcript before
+it reaches Claude: speaker labels are normalized, leading timestamps, inline tags,
+hesitation fillers and cut-off word starts can be removed, and lines left with no content
+are dropped, re-merging the turns around them. The transcript is worked on line by line,
+so a line no step changes reaches the prompt exactly as written. Each step can be switched
+on or off, and every run reports what it saved. Only the prompt sees the compacted text;
+the raw transcript is what gets stored and shown.
+"""
+
+from collections import Counter
+import re
+
+from rate_limiter import CHARS_PER_TOKEN
+from transcript_parser import SPEAKER_PREFIX, TEXT_TIMESTAMP, INLINE_TAG
+
+# Steps in the order they run
+STEPS = ('speakers', 'timestamps', 'tags', 'fillers', 'stutters', 'empty')
+
+# Steps that only tidy labels and blank lines, never words people said ("a < b", "10:30 works")
+DEFAULT_STEPS = ('speakers', 'empty')
+
+# Hesitation sounds with no meaning of their own ("yeah", "okay", "you know" carry intent and stay;
+# "er" is left alone because it is also the abbreviation ER)
+FILLER = re.compile(r'(?<![\w\'-])(?:u+h+m*|u+m+|e+r+m+|a+h+|h+m+|mm+)(?![\w\'-])[,.…]*\s*', re.IGNORECASE)
+
+# A cut-off word followed by the word it started: "th- the", "we-- we're". Only a prefix of
+# the next word counts, so "pre- and post-sale", "that-- and" or "15-- 20" are kept; repeated
+# words ("no no no", "that that") are never collapsed since they can be meant
+FALSE_START = re.compile(r'\b(\w{1,4})-{1,2}\s+(?=\1)', re.IGNORECASE)
+
+# Platform suffixes on display names: "Brian Olson (Guest)", "Ann Lee [External]"
+SPEAKER_SUFFIX = re.compile(r'\s*[(\[](?:guest|external|unverified|host|co-host)[)\]]\s*$', re.IGNORECASE)
+
+# Cleanup after removals
+SPACE_BEFORE_PUNCTUATION = re.compile(r'\s+([,.!?;:])')
+REPEATED_COMMAS = re.compile(r',(?:\s*,)+')
+LEADING_PUNCTUATION = re.compile(r'^[\s,.;:…-]+')
+SENTENCE_START = re.compile(r'([.!?]\s+)([a-z])')
+HAS_CONTENT = re.compile(r'\w')
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
+def parse_steps(value):
+    """'fillers,stutters' -> ('fillers', 'stutters'); 'all' for every step, 'off' for none, empty for the defaults"""
+    value = (value or '').strip().lower()
+    if not value:
+        return DEFAULT_STEPS
+    if value in ('off', 'none', '0', 'false'):
+        return ()
+    if value == 'all':
+        return STEPS
+    steps = tuple(step.strip() for step in value.split(',') if step.strip())
+    unknown = [step for step in steps if step not in STEPS]
+    if unknown:
+        raise ValueError(f"Unknown compaction steps: {', '.join(unknown)} (choose from {', '.join(STEPS)})")
+    return tuple(step for step in STEPS if step in steps)
+
+
+def canonical_speaker(label):
+    label = SPEAKER_SUFFIX.sub('', ' '.join(label.split())).strip('"\'*')
+    return label or None
+
+
+def tidy(text):
+    text = REPEATED_COMMAS.sub(',', text)
+    text = SPACE_BEFORE_PUNCTUATION.sub(r'\1', text)
+    text = LEADING_PUNCTUATION.sub('', text)
+    text = ' '.join(text.split())
+    text = SENTENCE_START.sub(lambda match: match.group(1) + match.group(2).upper(), text)
+    return text[:1].upper() + text[1:] if text else text
+
+
+class Line:
+    """One transcript line: optional leading timestamp, optional speaker label and what was said"""
+    __slots__ = ('original', 'stamp', 'speaker', 'text')
+
+    def __init__(self, original):
+        self.original = original
+        rest = original.lstrip()
+        stamp = TEXT_TIMESTAMP.match(rest)
+        self.stamp = stamp.group(0) if stamp else ''
+        rest = rest[len(self.stamp):]
+        label = SPEAKER_PREFIX.match(rest)
+        self.speaker = label.group(1).strip() if label else None
+        self.text = (rest[label.end():] if label else rest).rstrip()
+
+    def render(self):
+        return f"{self.stamp}{self.speaker}: {self.text}" if self.speaker else f"{self.stamp}{self.text}"
+
+
+class TranscriptCompactor:
+    def __init__(self, steps=DEFAULT_STEPS):
+        self.steps = tuple(steps)
+
+    @property
+    def enabled(self):
+        return bool(self.steps)
+
+    def compact(self, transcript):
+        """Return (compacted transcript, stats); the transcript is unchanged when no steps are enabled"""
+        stats = {
+            'steps': list(self.steps),
+            'chars_before': len(transcript),
+            'tokens_before': estimate_tokens(transcript),
+            'lines_before': transcript.count('\n') + 1 if transcript else 0,
+            'timestamps_removed': 0,
+            'tags_removed': 0,
+            'fillers_removed': 0,
+            'stutters_removed': 0,
+            'cues_dropped': 0,
+            'speakers_merged': 0
+        }
+        if self.steps:
+            lines = [Line(line) for line in transcript.split('\n')]
+            if 'speakers' in self.steps:
+                self._normalize_speakers(lines, stats)
+            transcript = '\n'.join(self._compact_lines(lines, stats))
+
+        stats['chars_after'] = len(transcript)
+        stats['tokens_after'] = estimate_tokens(transcript)
+        stats['lines_after'] = transcript.count('\n') + 1 if transcript else 0
+        stats['saved_percent'] = round(100 * (1 - stats['chars_after'] / stats['chars_before']), 1) if stats['chars_before'] else 0.0
+        return transcript, stats
+
+    def _compact_lines(self, lines, stats):
+        """Rendered lines; a line left empty is dropped and the same speaker's lines around it joined"""
+        kept = []
+        changed = []
+        dropped = False
+        for line in lines:
+            if not line.original.strip():
+                if 'empty' not in self.steps:
+                    kept.append(line)
+                    changed.append(False)
+                continue
+            is_changed = self._clean(line, stats)
+            if 'empty' in self.steps and not HAS_CONTENT.search(line.text):
+                stats['cues_dropped'] += 1
+                dropped = True
+                continue
+            previous = kept[-1] if kept else None
+            if dropped and previous is not None and previous.speaker and previous.speaker == line.speaker:
+                previous.text = f"{previous.text} {line.text}"
+                changed[-1] = True
+            else:
+                kept.append(line)
+                changed.append(is_changed)
+            dropped = False
+        return [line.render() if is_changed else line.original for line, is_changed in zip(kept, changed)]
+
+    def _normalize_speakers(self, lines, stats):
+        """Fold spelling variants of a label ("BRIAN OLSON", "Brian Olson (Guest)") into its most common form"""
+        forms = {}
+        for line in lines:
+            if line.speaker:
+                name = canonical_speaker(line.speaker)
+                forms.setdefault(name.casefold() if name else None, Counter())[name] += 1
+        preferred = {key: counter.most_common(1)[0][0] for key, counter in forms.items()}
+        labels = set()
+        for line in lines:
+            if line.speaker:
+                labels.add(line.speaker)
+                name = canonical_speaker(line.speaker)
+                line.speaker = preferred[name.casefold() if name else None]
+        stats['speakers_merged'] = len(labels) - len(preferred)
+
+    def _clean(self, line, stats):
+        """Apply the text steps to a line; returns whether it no longer matches the original"""
+        text = line.text
+        if 'timestamps' in self.steps and line.stamp:
+            line.stamp = ''
+            stats['timestamps_removed'] += 1
+        if 'tags' in self.steps:
+            text, count = INLINE_TAG.subn('', text)
+            stats['tags_removed'] += count
+        if 'fillers' in self.steps:
+            text, count = FILLER.subn('', text)
+            stats['fillers_removed'] += count
+        if 'stutters' in self.steps:
+            text, starts = FALSE_START.subn('', text)
+            stats['stutters_removed'] += starts
+        if text != line.text:
+            line.text = tidy(text)
+        return line.render() != line.original
@@ -0,0 +1,301 @@
+"""
+Report Exporters for Sales Coach
+HTML, Markdown and Word versions of the analysis report, for pasting into CRM notes
+without waiting on ReportLab. They are built from the same sections and annotation
+items as the PDF (SalesCoachPDFGenerator.parse_analysis_content and
+iter_annotated_transcript) and produced in chunks so responses can stream them. Bulk
+exports of saved calls are built in a process pool and zipped, with their PDFs taken from
+the report renderer's cache.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, as_completed
+from datetime import datetime
+import html
+import multiprocessing
+import re
+import tempfile
+import threading
+import zipfile
+
+import markup
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'html': ('text/html; charset=utf-8', 'html'),
+    'md': ('text/markdown; charset=utf-8', 'md'),
+    'docx': ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'docx'),
+    'pdf': ('application/pdf', 'pdf')
+}
+
+# Text exports are sent in pieces of about this size rather than one per transcript line
+CHUNK_BYTES = 64 * 1024
+
+REPORT_TITLE = "Sales Call Analysis Report"
+TRANSCRIPT_TITLE = "Annotated Transcript with Coaching Feedback"
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>{title}</title>
+<style>
+body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; max-width: 860px; margin: 2rem auto; color: #1f2937; line-height: 1.5; }}
+h1 {{ color: #2563eb; }}
+h2 {{ color: #1e40af; border-bottom: 1px solid #e5e7eb; padding-bottom: 0.3rem; }}
+.details {{ color: #64748b; }}
+.line {{ margin: 0.2rem 0; }}
+.coach {{ margin: 0.4rem 0 0.8rem 1.25rem; padding: 0.5rem 0.75rem; color: #059669; background: #f0fdf4; border: 1px solid #bbf7d0; border-radius: 6px; }}
+</style>
+</head>
+<body>
+"""
+
+SLUG = re.compile(r'[^A-Za-z0-9-]+')
+
+# One parser per process (its stylesheet is only built once)
+_parser = None
+
+
+def report_parser():
+    global _parser
+    if _parser is None:
+        from pdf_generator import SalesCoachPDFGenerator
+        _parser = SalesCoachPDFGenerator()
+    return _parser
+
+
+def report_details(details=None):
+    """(label, value) lines for the top of a report: generation time plus known call details"""
+    details = details or {}
+    lines = [('Report Generated', datetime.now().strftime("%B %d, %Y at %I:%M %p"))]
+    for key, label in (('rep', 'Rep'), ('call_date', 'Call Date'), ('source_file', 'Source File')):
+        if details.get(key):
+            lines.append((label, str(details[key])))
+    return lines
+
+
+def buffered(pieces, size=CHUNK_BYTES):
+    """UTF-8 chunks of about `size` bytes from an iterator of strings"""
+    parts, length = [], 0
+    for piece in pieces:
+        parts.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(parts).encode('utf-8')
+            parts, length = [], 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def iter_markdown(analysis, annotated_transcript, details=None):
+    """The report as Markdown, piece by piece"""
+    parser = report_parser()
+    yield f"# {REPORT_TITLE}\n\n"
+    for label, value in report_details(details):
+        yield f"- **{label}:** {value}\n"
+    yield "\n## Detailed Analysis Results\n\n"
+    for section in parser.parse_analysis_content(analysis):
+        if section['title'] != 'Analysis Results':
+            yield f"### {section['title']}\n\n"
+        yield f"{section['content']}\n\n"
+    yield f"## {TRANSCRIPT_TITLE}\n\n"
+    for item in parser.iter_annotated_transcript(annotated_transcript):
+        if item['type'] == 'coaching':
+            yield f"> **Coach:** {item['content']}\n\n"
+        else:
+            yield f"{item['content']}\n\n"
+
+
+def iter_html(analysis, annotated_transcript, details=None):
+    """The report as a standalone HTML page, piece by piece"""
+    parser = report_parser()
+    yield HTML_HEAD.format(title=REPORT_TITLE)
+    yield f"<h1>{REPORT_TITLE}</h1>\n<div class=\"details\">"
+    yield '<br>'.join(f"<strong>{label}:</strong> {html.escape(value)}" for label, value in report_details(details))
+    yield "</div>\n<h2>Detailed Analysis Results</h2>\n"
+    for section in parser.parse_analysis_content(analysis):
+        if section['title'] != 'Analysis Results':
+            yield f"<h3>{markup.render_inline(markup.parse_inline(section['title']))}</h3>\n"
+        yield markup.to_html(section['content']) + "\n"
+    yield f"<h2>{TRANSCRIPT_TITLE}</h2>\n"
+    for item in parser.iter_annotated_transcript(annotated_transcript):
+        content = markup.render_inline(markup.parse_inline(item['content']))
+        if item['type'] == 'coaching':
+            yield f"<div class=\"coach\"><strong>Coach:</strong> {content}</div>\n"
+        else:
+            yield f"<p class=\"line\">{content}</p>\n"
+    yield "</body>\n</html>\n"
+
+
+def add_runs(paragraph, spans):
+    for kind, text in spans:
+        run = paragraph.add_run(text)
+        run.bold = kind == 'bold' or None
+        run.italic = kind == 'italic' or None
+
+
+def write_docx(output, analysis, annotated_transcript, details=None):
+    """Write the report as a Word document to a path or binary file object"""
+    try:
+        import docx
+        from docx.shared import RGBColor
+    except ImportError:
+        raise ValueError("DOCX export requires python-docx (pip install python-docx)")
+    parser = report_parser()
+    document = docx.Document()
+    document.add_heading(REPORT_TITLE, 0)
+    for label, value in report_details(details):
+        paragraph = document.add_paragraph()
+        paragraph.add_run(f"{label}: ").bold = True
+        paragraph.add_run(value)
+
+    document.add_heading('Detailed Analysis Results', 1)
+    for section in parser.parse_analysis_content(analysis):
+        if section['title'] != 'Analysis Results':
+            document.add_heading(section['title'], 2)
+        for block in markup.parse(section['content']):
+            if block['type'] == 'heading':
+                document.add_heading(''.join(text for _, text in block['spans']), min(block['level'] + 1, 9))
+            elif block['type'] == 'list':
+                for item in block['items']:
+                    add_runs(document.add_paragraph(style='List Number' if block['ordered'] else 'List Bullet'), item)
+            else:
+                paragraph = document.add_paragraph()
+                for number, line in enumerate(block['lines']):
+                    if number:
+                        paragraph.add_run().add_break()
+                    add_runs(paragraph, line)
+
+    document.add_page_break()
+    document.add_heading(TRANSCRIPT_TITLE, 1)
+    for item in parser.iter_annotated_transcript(annotated_transcript):
+        paragraph = document.add_paragraph()
+        if item['type'] == 'coaching':
+            label = paragraph.add_run('Coach: ')
+            label.bold = True
+            add_runs(paragraph, markup.parse_inline(item['content']))
+            for run in paragraph.runs:
+                run.font.color.rgb = RGBColor(0x05, 0x96, 0x69)
+        else:
+            paragraph.add_run(item['content'])
+    document.save(output)
+
+
+def iter_file(f, size=CHUNK_BYTES):
+    """Chunks of a file from its current position; closes it at the end"""
+    with f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def export_chunks(fmt, analysis, annotated_transcript, details=None):
+    """The report in the given format as an iterator of byte chunks"""
+    if fmt == 'md':
+        return buffered(iter_markdown(analysis, annotated_transcript, details))
+    if fmt == 'html':
+        return buffered(iter_html(analysis, annotated_transcript, details))
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    # Word and PDF files are zip/xref structured, so they are built in a temp file and sent from there
+    f = tempfile.TemporaryFile()
+    try:
+        if fmt == 'docx':
+            write_docx(f, analysis, annotated_transcript, details)
+        else:
+            report_parser().write_pdf_report(f, analysis, annotated_transcript)
+        f.seek(0)
+    except Exception:
+        f.close()
+        raise
+    return iter_file(f)
+
+
+def export_bytes(fmt, analysis, annotated_transcript, details=None):
+    """The whole export as bytes (runs in a pool process for bulk exports)"""
+    return b''.join(export_chunks(fmt, analysis, annotated_transcript, details))
+
+
+def export_filename(fmt, call=None):
+    """Download name for an export, e.g. call_12_jane_doe_2025-05-01.md"""
+    extension = EXPORT_FORMATS[fmt][1]
+    if not call:
+        return f"sales_analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    parts = [f"call_{call['id']}", call.get('rep') or '', (call.get('call_date') or '')[:10]]
+    name = '_'.join(SLUG.sub('_', part).strip('_').lower() for part in parts if part)
+    return f"{name}.{extension}"
+
+
+class BulkExporter:
+    """Process pool that builds exports of many saved calls at once, started on first use.
+
+    With a renderer (a ReportRenderer), PDFs are taken from its cache, and rendered and
+    cached by it when missing, instead of being built again here.
+    """
+
+    def __init__(self, max_workers=2, timeout=600, renderer=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.renderer = renderer
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def write_zip(self, output, calls, fmt):
+        """Zip one export per call (history records) into a binary file; returns the entry names
+
+        Entries are written in the order their exports finish.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        # renderer.render blocks until its pool finishes a report, so each waits in a thread
+        renders = ThreadPoolExecutor(max(self.renderer.max_workers, 1)) if fmt == 'pdf' and self.renderer else None
+        jobs = {}
+        try:
+            for call in calls:
+                annotated = call.get('annotations') or call.get('annotated_transcript') or ''
+                if renders:
+                    future = renders.submit(self.renderer.render, call['analysis'], annotated, call.get('transcript') or '')
+                else:
+                    future = self._submit(fmt, call['analysis'], annotated,
+                                          {key: call.get(key) for key in ('rep', 'call_date', 'source_file')})
+                jobs[future] = export_filename(fmt, call)
+
+            # Word and PDF files are already compressed
+            compression = zipfile.ZIP_DEFLATED if fmt in ('md', 'html') else zipfile.ZIP_STORED
+            names = []
+            with zipfile.ZipFile(output, 'w', compression) as archive:
+                for future in as_completed(jobs, timeout=self.timeout):
+                    if renders:
+                        # (key, path, cached) of the report on disk
+                        archive.write(future.result()[1], jobs[future])
+                    else:
+                        archive.writestr(jobs[future], future.result())
+                    names.append(jobs[future])
+            return names
+        finally:
+            if renders:
+                renders.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+
+    def _submit(self, *args):
+        if self.max_workers <= 0:
+            # Build in the calling thread (useful for debugging and tiny deployments)
+            future = Future()
+            try:
+                future.set_result(export_bytes(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        with self.lock:
+            if self.pool is None:
+                # Spawned rather than forked so workers never inherit the server's threads
+                self.pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.pool.submit(export_bytes, *args)
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for Salescoach
+Runs several worker processes so analysis, streaming and PDF work spread across cores:
+
+    SESSION_BACKEND=sqlite gunicorn app:app
+
+Sessions must live in a shared backend (sqlite or redis) when more than one worker runs,
+otherwise a request that lands on a different worker cannot see the transcript.
+The Claude tokens-per-minute budget (ANTHROPIC_INPUT_TPM / ANTHROPIC_OUTPUT_TPM) is
+enforced per process, so divide the organization limit by the number of workers.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+
+# Threaded workers keep long-lived SSE streams from tying up a whole process
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# Claude calls on long transcripts can take minutes
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '600'))
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    if workers > 1 and os.getenv('SESSION_BACKEND', 'memory') == 'memory':
+        server.log.warning("Running %d workers with SESSION_BACKEND=memory: sessions will not be "
+                           "shared between workers. Set SESSION_BACKEND=sqlite or redis.", workers)
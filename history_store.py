@@ -0,0 +1,272 @@
+"""
+Call History for Sales Coach
+Persistent record of every analyzed call (transcript, analysis, annotations, token usage
+conversation metrics and metadata) in SQLite, with an FTS5 full-text index so past calls
+can be searched by phrase or prospect name and reopened without another LLM call.
+"""
+
+from datetime import datetime, date
+import hashlib
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from result_cache import normalize_transcript
+from scorecards import split_scorecard
+
+# Columns of the full-text index, and their bm25 weights (metadata and analysis rank higher)
+FTS_COLUMNS = ('rep', 'source_file', 'transcript', 'analysis', 'notes')
+FTS_WEIGHTS = (3.0, 2.0, 1.0, 1.5, 1.5)
+
+# Quoted phrases or single words in a search box query
+QUERY_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+# Marks snippet matches before HTML escaping
+MATCH_START, MATCH_END = '\x02', '\x03'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    transcript_hash TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    rep TEXT NOT NULL DEFAULT '',
+    call_date TEXT NOT NULL DEFAULT '',
+    source_file TEXT NOT NULL DEFAULT '',
+    transcript TEXT NOT NULL,
+    analysis TEXT NOT NULL DEFAULT '',
+    annotated_transcript TEXT NOT NULL DEFAULT '',
+    annotations TEXT,
+    notes TEXT NOT NULL DEFAULT '',
+    token_usage TEXT NOT NULL DEFAULT '{}',
+    metrics TEXT,
+    scorecard TEXT
+);
+CREATE INDEX IF NOT EXISTS calls_updated ON calls (updated_at);
+CREATE INDEX IF NOT EXISTS calls_rep ON calls (rep COLLATE NOCASE);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS calls_fts USING fts5(
+    rep, source_file, transcript, analysis, notes,
+    content='calls', content_rowid='id', tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS calls_ai AFTER INSERT ON calls BEGIN
+    INSERT INTO calls_fts (rowid, rep, source_file, transcript, analysis, notes)
+    VALUES (new.id, new.rep, new.source_file, new.transcript, new.analysis, new.notes);
+END;
+CREATE TRIGGER IF NOT EXISTS calls_ad AFTER DELETE ON calls BEGIN
+    INSERT INTO calls_fts (calls_fts, rowid, rep, source_file, transcript, analysis, notes)
+    VALUES ('delete', old.id, old.rep, old.source_file, old.transcript, old.analysis, old.notes);
+END;
+CREATE TRIGGER IF NOT EXISTS calls_au AFTER UPDATE ON calls BEGIN
+    INSERT INTO calls_fts (calls_fts, rowid, rep, source_file, transcript, analysis, notes)
+    VALUES ('delete', old.id, old.rep, old.source_file, old.transcript, old.analysis, old.notes);
+    INSERT INTO calls_fts (rowid, rep, source_file, transcript, analysis, notes)
+    VALUES (new.id, new.rep, new.source_file, new.transcript, new.analysis, new.notes);
+END;
+"""
+
+# Columns added after the first release, created on databases that predate them
+ADDED_COLUMNS = {'metrics': 'TEXT', 'scorecard': 'TEXT'}
+
+# Columns returned in search listings (everything except the large text fields)
+SUMMARY_COLUMNS = "c.id, c.created_at, c.updated_at, c.rep, c.call_date, c.source_file, c.token_usage, LENGTH(c.transcript)"
+
+
+def fts_query(text):
+    """Turn search box input into an FTS5 query: every word or "quoted phrase" must match"""
+    terms = []
+    for phrase, word in QUERY_TERM.findall(text or ''):
+        term = (phrase or word).replace('"', ' ').strip()
+        if term:
+            terms.append(f'"{term}"')
+    return ' AND '.join(terms)
+
+
+def coaching_notes(annotations, annotated_transcript):
+    """Coaching note text to index, from structured items or [COACH: ...] lines"""
+    if annotations:
+        return '\n'.join(item['content'] for item in annotations if item.get('type') == 'coaching')
+    return '\n'.join(line.strip() for line in (annotated_transcript or '').split('\n')
+                     if line.strip().upper().startswith(('[COACH', '**[COACH')))
+
+
+def render_snippet(snippet):
+    """HTML-escape a snippet and turn its match markers into <mark> tags"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+class HistoryStore:
+    def __init__(self, path='cache/history.sqlite3'):
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        existing = {row['name'] for row in connection.execute("PRAGMA table_info(calls)")}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in existing:
+                connection.execute(f"ALTER TABLE calls ADD COLUMN {column} {definition}")
+
+    def _connection(self):
+        """One connection per thread; autocommit so each statement is its own transaction"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def transcript_hash(transcript):
+        return hashlib.sha256(normalize_transcript(transcript).encode('utf-8')).hexdigest()
+
+    def save(self, transcript, rep=None, call_date=None, source_file=None, analysis=None,
+             annotated_transcript=None, annotations=None, token_usage=None, metrics=None, scorecard=None):
+        """Create or update the record for a transcript; returns its id.
+
+        Parts arrive separately (analysis, then annotation), so only the fields given are
+        written. token_usage is a dict of usage per part and is merged into the stored one.
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        key = self.transcript_hash(transcript)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT id, token_usage FROM calls WHERE transcript_hash = ?", (key,)).fetchone()
+            if row is None:
+                call_id = connection.execute(
+                    "INSERT INTO calls (transcript_hash, created_at, updated_at, call_date, transcript) VALUES (?, ?, ?, ?, ?)",
+                    (key, now, now, call_date or date.today().isoformat(), transcript)
+                ).lastrowid
+                usage = {}
+            else:
+                call_id = row['id']
+                usage = json.loads(row['token_usage'])
+
+            changes = {'updated_at': now}
+            for column, value in (('rep', rep), ('call_date', call_date), ('source_file', source_file),
+                                  ('analysis', analysis), ('annotated_transcript', annotated_transcript)):
+                if value:
+                    changes[column] = value
+            if annotations is not None or annotated_transcript is not None:
+                changes['annotations'] = json.dumps(annotations) if annotations else None
+                changes['notes'] = coaching_notes(annotations, annotated_transcript)
+            if metrics:
+                changes['metrics'] = json.dumps(metrics)
+            if scorecard:
+                changes['scorecard'] = json.dumps(scorecard)
+            if token_usage:
+                usage.update(token_usage)
+                changes['token_usage'] = json.dumps(usage)
+
+            assignments = ', '.join(f"{column} = ?" for column in changes)
+            connection.execute(f"UPDATE calls SET {assignments} WHERE id = ?", (*changes.values(), call_id))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return call_id
+
+    def search(self, query='', rep=None, date_from=None, date_to=None, limit=25, offset=0):
+        """Search calls by full text and filters, best matches first (newest first without a query)"""
+        match = fts_query(query)
+        filters, params = [], []
+        if rep:
+            filters.append("c.rep = ? COLLATE NOCASE")
+            params.append(rep)
+        if date_from:
+            filters.append("c.call_date >= ?")
+            params.append(date_from)
+        if date_to:
+            filters.append("c.call_date <= ?")
+            params.append(date_to)
+
+        if match:
+            weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+            sql = (f"SELECT {SUMMARY_COLUMNS}, "
+                   f"snippet(calls_fts, -1, '{MATCH_START}', '{MATCH_END}', '…', 16) AS snippet, "
+                   f"bm25(calls_fts, {weights}) AS rank "
+                   "FROM calls_fts JOIN calls c ON c.id = calls_fts.rowid WHERE calls_fts MATCH ?")
+            params.insert(0, match)
+            order = "rank"
+        else:
+            sql = f"SELECT {SUMMARY_COLUMNS}, substr(c.analysis, 1, 200) AS snippet FROM calls c WHERE 1"
+            order = "c.updated_at DESC"
+        sql += ''.join(f" AND {condition}" for condition in filters)
+
+        connection = self._connection()
+        total = connection.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+        rows = connection.execute(f"{sql} ORDER BY {order} LIMIT ? OFFSET ?", (*params, limit, offset)).fetchall()
+        return {
+            'query': query,
+            'total': total,
+            'results': [self._summary(row, highlighted=bool(match)) for row in rows]
+        }
+
+    def get(self, call_id):
+        row = self._connection().execute("SELECT * FROM calls WHERE id = ?", (call_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record['annotations'] = json.loads(record['annotations']) if record['annotations'] else None
+        record['token_usage'] = json.loads(record['token_usage'])
+        record['metrics'] = json.loads(record['metrics']) if record['metrics'] else None
+        record['scorecard'] = json.loads(record['scorecard']) if record['scorecard'] else None
+        if record['scorecard'] is None:
+            # Calls saved before the scorecard was stored apart still have it in the analysis
+            record['analysis'], record['scorecard'] = split_scorecard(record['analysis'])
+        del record['transcript_hash'], record['notes']
+        return record
+
+    def delete(self, call_id):
+        return self._connection().execute("DELETE FROM calls WHERE id = ?", (call_id,)).rowcount > 0
+
+    def scored_calls(self, since=None):
+        """Analyzed calls with their metrics and scorecard (None when missing), optionally only
+        those updated since a timestamp"""
+        sql = "SELECT id, rep, call_date, updated_at, metrics, analysis, scorecard FROM calls WHERE analysis != ''"
+        params = ()
+        if since:
+            # Timestamps have one-second resolution, so rows from the last second come back again
+            sql += " AND updated_at >= ?"
+            params = (since,)
+        for row in self._connection().execute(sql + " ORDER BY updated_at", params):
+            yield {**dict(row), 'metrics': json.loads(row['metrics']) if row['metrics'] else None,
+                   'scorecard': json.loads(row['scorecard']) if row['scorecard'] else None}
+
+    def scored_count(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM calls WHERE analysis != ''").fetchone()[0]
+
+    def stats(self):
+        connection = self._connection()
+        calls, = connection.execute("SELECT COUNT(*) FROM calls").fetchone()
+        reps, = connection.execute("SELECT COUNT(DISTINCT rep) FROM calls WHERE rep != ''").fetchone()
+        return {
+            'calls': calls,
+            'reps': reps,
+            'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    def _summary(self, row, highlighted):
+        usage = json.loads(row['token_usage'])
+        return {
+            'id': row['id'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'rep': row['rep'],
+            'call_date': row['call_date'],
+            'source_file': row['source_file'],
+            'transcript_chars': row[7],
+            'total_tokens': sum(part.get('total_tokens', 0) for part in usage.values()),
+            'snippet': render_snippet(row['snippet']) if highlighted else html.escape(row['snippet'] or '')
+        }
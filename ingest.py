@@ -0,0 +1,285 @@
+"""
+Upload Ingestion for Sales Coach
+Turns an uploaded transcript into speaker turns straight from the request stream: the
+body is read in fixed-size chunks (raw or multipart/form-data), the format is sniffed
+from the first bytes, and text formats (VTT, SRT, plain text) are decoded and parsed
+incrementally as they arrive. JSON exports are parsed whole; DOCX and PDF text is
+extracted in a process pool so it does not hold up request threads. Every format ends
+up as the same "Speaker: text" turns.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import codecs
+import io
+import multiprocessing
+import re
+import threading
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, NeedData, Epilogue, File, Data
+
+from transcript_parser import VttParser, TextParser, iter_turns, render_turn, parse_json_transcript
+
+# Bytes read from the request per step
+CHUNK_SIZE = 64 * 1024
+
+# Bytes looked at to recognise the format
+SNIFF_BYTES = 2048
+
+# Extension used when the content does not give the format away
+EXTENSION_FORMATS = {
+    'vtt': 'vtt', 'srt': 'srt', 'json': 'json', 'docx': 'docx', 'pdf': 'pdf',
+    'txt': 'text', 'md': 'text', 'csv': 'text'
+}
+
+# Formats whose text needs the whole file and a third-party library
+DOCUMENT_FORMATS = ('docx', 'pdf')
+
+# A caption timing line anywhere in the sniffed bytes (SRT, or VTT without its header)
+CAPTION_TIMING = re.compile(rb'^[ \t]*(?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3}[ \t]*-->', re.MULTILINE)
+
+# A JSON object, or an array of objects (not a "[00:01] Speaker:" text line)
+JSON_START = re.compile(rb'^(?:\{|\[\s*[{\]])')
+
+# Used for the rest of the file once the bytes stop being valid UTF-8 (Windows exports)
+FALLBACK_ENCODING = 'cp1252'
+
+
+class StreamDecoder:
+    """Incremental bytes -> text decoder.
+
+    UTF-8 by default (a UTF-8 BOM is dropped, a UTF-16 BOM switches to UTF-16). At the
+    first invalid byte everything from there on is decoded as cp1252 instead of raising;
+    the earlier chunks were valid UTF-8 and keep their decoding.
+    """
+
+    def __init__(self, fallback=FALLBACK_ENCODING):
+        self.fallback = fallback
+        self.encoding = None
+        self.decoder = None
+        self.head = b''
+
+    def decode(self, data, final=False):
+        if self.decoder is None:
+            # Wait for enough bytes to recognise a byte order mark
+            self.head += data
+            if len(self.head) < 3 and not final:
+                return ''
+            data, self.head = self.head, b''
+            if data[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+                self._use('utf-16', errors='replace')
+            else:
+                if data.startswith(codecs.BOM_UTF8):
+                    data = data[len(codecs.BOM_UTF8):]
+                self._use('utf-8')
+
+        try:
+            return self.decoder.decode(data, final)
+        except UnicodeDecodeError as e:
+            # Positions are relative to the decoder's buffered bytes plus this chunk
+            buffered = self.decoder.getstate()[0] + data
+            valid = buffered[:e.start].decode('utf-8')
+            print(f"⚠️ Upload is not valid UTF-8, decoding the rest as {self.fallback}")
+            self._use(self.fallback, errors='replace')
+            return valid + self.decoder.decode(buffered[e.start:], final)
+
+    def iter_decode(self, chunks):
+        for chunk in chunks:
+            text = self.decode(chunk)
+            if text:
+                yield text
+        text = self.decode(b'', final=True)
+        if text:
+            yield text
+
+    def _use(self, encoding, errors='strict'):
+        self.encoding = encoding
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+
+
+def iter_raw(stream, chunk_size=CHUNK_SIZE):
+    """Fixed-size chunks of a request body"""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_multipart_file(stream, boundary, field='file', chunk_size=CHUNK_SIZE):
+    """Stream one file field out of a multipart/form-data body.
+
+    Yields the file name first, then the file's bytes chunk by chunk; other fields are
+    skipped. Yields nothing if the field is missing.
+    """
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    in_file = False
+    for chunk in iter_raw(stream, chunk_size):
+        decoder.receive_data(chunk)
+        event = decoder.next_event()
+        while not isinstance(event, (NeedData, Epilogue)):
+            if isinstance(event, File) and event.name == field:
+                in_file = True
+                yield event.filename or ''
+            elif isinstance(event, Data) and in_file:
+                if event.data:
+                    yield event.data
+                if not event.more_data:
+                    return
+            event = decoder.next_event()
+        if isinstance(event, Epilogue):
+            return
+
+
+def read_upload(request, field='file'):
+    """File name and body chunks of an upload, without buffering the body.
+
+    Accepts multipart/form-data (the file in `field`) or a raw body with the file name
+    in the `filename` query parameter or an X-Filename header.
+    """
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    if mimetype == 'multipart/form-data' and options.get('boundary'):
+        parts = iter_multipart_file(request.stream, options['boundary'], field)
+        return next(parts, None), parts
+    filename = request.args.get('filename') or request.headers.get('X-Filename')
+    return filename, iter_raw(request.stream)
+
+
+def sniff_format(head, filename=''):
+    """Recognise a transcript format from its first bytes, falling back to the file extension"""
+    if head.startswith(b'%PDF-'):
+        return 'pdf'
+    if head.startswith(b'PK\x03\x04'):
+        return 'docx'
+    text = head.lstrip(codecs.BOM_UTF8).lstrip()
+    if text.startswith(b'WEBVTT'):
+        return 'vtt'
+    if JSON_START.match(text):
+        return 'json'
+    timing = CAPTION_TIMING.search(text)
+    if timing:
+        return 'srt' if text[:timing.start()].strip().isdigit() else 'vtt'
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return EXTENSION_FORMATS.get(extension, 'text')
+
+
+def extract_docx_text(data):
+    """Paragraph text of a Word document"""
+    try:
+        import docx
+    except ImportError:
+        raise ValueError("DOCX support requires python-docx (pip install python-docx)")
+    document = docx.Document(io.BytesIO(data))
+    return '\n'.join(paragraph.text for paragraph in document.paragraphs)
+
+
+def extract_pdf_text(data):
+    """Text of every page of a PDF"""
+    try:
+        import PyPDF2
+    except ImportError:
+        raise ValueError("PDF support requires PyPDF2 (pip install PyPDF2)")
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+EXTRACTORS = {'docx': extract_docx_text, 'pdf': extract_pdf_text}
+
+
+class DocumentExtractor:
+    """Process pool for DOCX and PDF text extraction, started on first use.
+
+    Workers are spawned rather than forked so they never inherit the web server's
+    threads or open connections.
+    """
+
+    def __init__(self, max_workers=2, timeout=120):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def extract(self, kind, data):
+        if self.max_workers <= 0:
+            return EXTRACTORS[kind](data)
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.pool.submit(EXTRACTORS[kind], data).result(timeout=self.timeout)
+
+    def shutdown(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+
+
+def peek(chunks, size=SNIFF_BYTES):
+    """Read at least `size` bytes (or everything) from a chunk iterator; returns (head, chunks)"""
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= size:
+            break
+
+    def rest():
+        if head:
+            yield head
+        yield from chunks
+
+    return head, rest()
+
+
+def iter_cues(kind, texts):
+    """Cues from decoded text chunks of a text-based format"""
+    if kind in ('vtt', 'srt'):
+        return VttParser().parse(texts)
+    if kind == 'json':
+        return parse_json_transcript(''.join(texts))
+    return TextParser().parse(texts)
+
+
+def document_cues(text):
+    """Cues from text extracted from a document; Teams DOCX exports keep caption timing lines"""
+    kind = 'vtt' if CAPTION_TIMING.search(text[:SNIFF_BYTES].encode('utf-8')) else 'text'
+    return iter_cues(kind, [text])
+
+
+def ingest_transcript(filename, chunks, extractor=None, timeline=None):
+    """Detect, decode and parse an uploaded file chunk by chunk; returns (transcript, stats).
+
+    Pass a CueTimeline to also record each cue's timing for conversation metrics.
+    """
+    stats = {'bytes': 0}
+
+    def counted(chunks):
+        for chunk in chunks:
+            stats['bytes'] += len(chunk)
+            yield chunk
+
+    head, chunks = peek(counted(chunks))
+    kind = sniff_format(head, filename or '')
+    stats['format'] = kind
+
+    if kind in DOCUMENT_FORMATS:
+        data = b''.join(chunks)
+        text = extractor.extract(kind, data) if extractor else EXTRACTORS[kind](data)
+        stats['encoding'] = None
+        cues = document_cues(text)
+    else:
+        decoder = StreamDecoder()
+        cues = iter_cues(kind, decoder.iter_decode(chunks))
+
+    if timeline is not None:
+        cues = timeline.track(cues)
+    lines = []
+    for turn in iter_turns(cues):
+        lines.append(render_turn(turn))
+    transcript = '\n'.join(lines)
+
+    if kind not in DOCUMENT_FORMATS:
+        stats['encoding'] = decoder.encoding or 'utf-8'
+    stats['turns'] = len(lines)
+    stats['chars'] = len(transcript)
+    return transcript, stats
@@ -0,0 +1,194 @@
+"""
+Background Job Engine for Sales Coach
+Runs the independent parts of a transcript review (analysis, annotation) concurrently
+on a bounded worker pool so Flask request threads never wait on an LLM call.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import time
+import uuid
+
+
+class JobPart:
+    """One unit of work inside a job, e.g. the analysis or the annotation"""
+
+    def __init__(self, name):
+        self.name = name
+        self.status = 'pending'
+        self.chunks = []
+        self.length = 0
+        self.result = None
+        self.error = None
+
+    def text(self, offset=0):
+        """Streamed text produced so far, starting at offset"""
+        # Chunks joined so far are kept as one string, so each read only joins what is new
+        if len(self.chunks) > 1:
+            self.chunks = [''.join(self.chunks)]
+        return self.chunks[0][offset:] if self.chunks else ''
+
+    def to_dict(self, offset=0):
+        return {
+            'status': self.status,
+            'offset': offset,
+            'length': self.length,
+            'text': self.text(offset),
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class Job:
+    """A set of parts submitted together for one transcript"""
+
+    def __init__(self, owner=None):
+        self.id = str(uuid.uuid4())
+        self.owner = owner
+        self.created_at = datetime.now()
+        self.parts = OrderedDict()
+        self.version = 0
+        self.notified = 0.0
+        self.published = -1
+        self.condition = threading.Condition()
+        # Orders change hooks so an older snapshot is never handed over after a newer one
+        self.publish_lock = threading.Lock()
+
+    @property
+    def status(self):
+        statuses = {part.status for part in self.parts.values()}
+        if statuses <= {'completed'}:
+            return 'completed'
+        if statuses <= {'completed', 'failed'}:
+            return 'failed' if statuses == {'failed'} else 'partial'
+        if statuses == {'pending'}:
+            return 'pending'
+        return 'running'
+
+    @property
+    def finished(self):
+        return all(part.status in ('completed', 'failed') for part in self.parts.values())
+
+    def update(self, part, **changes):
+        """Apply changes to a part and wake any subscribers"""
+        with self.condition:
+            for key, value in changes.items():
+                setattr(part, key, value)
+            self.version += 1
+            self.condition.notify_all()
+
+    def append_text(self, part, text):
+        with self.condition:
+            part.chunks.append(text)
+            part.length += len(text)
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the job changes past version (or timeout); returns the current version"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def snapshot(self):
+        """(version, to_dict()) taken together"""
+        with self.condition:
+            return self.version, self.to_dict()
+
+    def to_dict(self, offsets=None):
+        offsets = offsets or {}
+        with self.condition:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'created_at': self.created_at.isoformat(),
+                'parts': {
+                    name: part.to_dict(offsets.get(name, 0))
+                    for name, part in self.parts.items()
+                }
+            }
+
+
+class JobManager:
+    """Submit jobs to a bounded thread pool and keep recent jobs for polling"""
+
+    def __init__(self, max_workers=4, max_jobs=200, on_change=None, progress_interval=None):
+        """on_change(job, snapshot) is called whenever a part starts, completes or fails, and while
+        text streams at most once every progress_interval seconds (never if None). It runs
+        outside the job's lock, with the job state as of the change."""
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='salescoach-job')
+        self.max_jobs = max_jobs
+        self.on_change = on_change
+        self.progress_interval = progress_interval
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, tasks, owner=None):
+        """Start a job; tasks maps part name to a callable(emit) returning the part result"""
+        job = Job(owner=owner)
+        for name in tasks:
+            job.parts[name] = JobPart(name)
+
+        with self.lock:
+            self.jobs[job.id] = job
+            self._evict()
+
+        for name, task in tasks.items():
+            self.executor.submit(self._run_part, job, job.parts[name], task)
+
+        print(f"🧵 Job {job.id} submitted with parts: {', '.join(tasks)}")
+        return job
+
+    def get(self, job_id, owner=None):
+        """Look up a job; jobs owned by another session are treated as missing"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def _run_part(self, job, part, task):
+        job.update(part, status='running')
+        self._notify(job)
+        try:
+            result = task(lambda text: self._emit(job, part, text))
+            job.update(part, status='completed', result=result)
+            print(f"✅ Job {job.id} part '{part.name}' completed")
+        except Exception as e:
+            print(f"❌ Job {job.id} part '{part.name}' failed: {str(e)}")
+            job.update(part, status='failed', error=str(e))
+        self._notify(job)
+
+    def _emit(self, job, part, text):
+        job.append_text(part, text)
+        if self.progress_interval is None:
+            return
+        now = time.monotonic()
+        with job.condition:
+            if now - job.notified < self.progress_interval:
+                return
+            job.notified = now
+        self._notify(job)
+
+    def _notify(self, job):
+        if self.on_change is None:
+            return
+        version, snapshot = job.snapshot()
+        try:
+            with job.publish_lock:
+                if version <= job.published:
+                    return
+                job.published = version
+                self.on_change(job, snapshot)
+        except Exception as e:
+            print(f"⚠️ Job {job.id} change hook failed: {str(e)}")
+
+    def _evict(self):
+        """Drop the oldest finished jobs once more than max_jobs are retained"""
+        excess = len(self.jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished][:excess]:
+            del self.jobs[job_id]
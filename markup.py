@@ -0,0 +1,112 @@
+"""
+Markdown Rendering for Sales Coach
+Analyses and chat answers are written in a small markdown subset (headers, bold,
+italics, bullet and numbered lists, paragraphs). They are parsed once into a list of
+blocks with a single pass of precompiled patterns. The same blocks then render to HTML
+for the web interface and to ReportLab paragraph markup for PDF reports, so both show
+the same thing.
+"""
+
+import html
+import re
+
+# One pattern classifies each line: header, bullet item, numbered item or blank
+BLOCK_LINE = re.compile(r'^[ \t]*(?:(#{1,6})[ \t]+(.*?)[ \t#]*|[-*+][ \t]+(.*)|(\d+)[.)][ \t]+(.*)|)$')
+
+# One pattern finds every inline token: **bold** and *italic*. Anything else, angle brackets
+# included, is kept as text and escaped when rendered, so "<Jane>" or "a < b > c" survive
+INLINE = re.compile(r'\*\*(.+?)\*\*|\*([^*\s](?:[^*]*?[^*\s])?)\*')
+
+INLINE_TAGS = {
+    'html': {'bold': ('<strong>', '</strong>'), 'italic': ('<em>', '</em>')},
+    'reportlab': {'bold': ('<b>', '</b>'), 'italic': ('<i>', '</i>')}
+}
+
+
+def parse_inline(text):
+    """Spans of one line as [(kind, text)] with kind 'text', 'bold' or 'italic'"""
+    if '*' not in text:
+        # Most transcript lines have no markup at all
+        return [('text', text)] if text else []
+    spans = []
+    position = 0
+    for match in INLINE.finditer(text):
+        if match.start() > position:
+            spans.append(('text', text[position:match.start()]))
+        if match.group(1) is not None:
+            spans.append(('bold', match.group(1)))
+        else:
+            spans.append(('italic', match.group(2)))
+        position = match.end()
+    if position < len(text):
+        spans.append(('text', text[position:]))
+    return spans
+
+
+def parse(text):
+    """Blocks of a markdown document, in order.
+
+    Each block is a dict: {'type': 'heading', 'level', 'spans'}, {'type': 'paragraph',
+    'lines': [spans]} or {'type': 'list', 'ordered', 'start', 'items': [spans]}.
+    """
+    blocks = []
+    current = None
+    for line in (text or '').split('\n'):
+        match = BLOCK_LINE.match(line)
+        if match is None:
+            # Plain text continues the open paragraph (or starts one)
+            if current is None or current['type'] != 'paragraph':
+                current = {'type': 'paragraph', 'lines': []}
+                blocks.append(current)
+            current['lines'].append(parse_inline(line.strip()))
+        elif match.group(1):
+            current = None
+            blocks.append({'type': 'heading', 'level': len(match.group(1)), 'spans': parse_inline(match.group(2))})
+        elif match.group(3) is not None or match.group(5) is not None:
+            ordered = match.group(5) is not None
+            if current is None or current['type'] != 'list' or current['ordered'] != ordered:
+                current = {'type': 'list', 'ordered': ordered, 'start': int(match.group(4)) if ordered else 1,
+                           'items': []}
+                blocks.append(current)
+            current['items'].append(parse_inline((match.group(5) if ordered else match.group(3)).strip()))
+        else:
+            # A blank line closes the open paragraph or list
+            current = None
+    return blocks
+
+
+def render_inline(spans, target='html'):
+    """Escaped markup for spans; target is 'html' or 'reportlab'"""
+    tags = INLINE_TAGS[target]
+    parts = []
+    for kind, text in spans:
+        text = html.escape(text, quote=False)
+        if kind == 'text':
+            parts.append(text)
+        else:
+            opening, closing = tags[kind]
+            parts.append(opening + text + closing)
+    return ''.join(parts)
+
+
+def to_html(blocks):
+    """HTML for parsed blocks (or markdown text)"""
+    if isinstance(blocks, str):
+        blocks = parse(blocks)
+    parts = []
+    for block in blocks:
+        if block['type'] == 'heading':
+            parts.append(f"<h{block['level']}>{render_inline(block['spans'])}</h{block['level']}>")
+        elif block['type'] == 'list':
+            tag = 'ol' if block['ordered'] else 'ul'
+            start = f' start="{block["start"]}"' if block['ordered'] and block['start'] != 1 else ''
+            items = ''.join(f"<li>{render_inline(item)}</li>" for item in block['items'])
+            parts.append(f"<{tag}{start}>{items}</{tag}>")
+        else:
+            parts.append(f"<p>{'<br>'.join(render_inline(line) for line in block['lines'])}</p>")
+    return ''.join(parts)
+
+
+def to_reportlab(text):
+    """ReportLab paragraph markup for text, keeping its line breaks (no block structure)"""
+    return '<br/>'.join(render_inline(parse_inline(line), 'reportlab') for line in (text or '').split('\n'))
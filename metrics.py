@@ -0,0 +1,240 @@
+"""
+Conversation Metrics for Sales Coach
+Deterministic call metrics computed locally from parsed cues: talk time and share per
+speaker, longest monologue, questions asked, interruptions and dead air. Cue columns
+are kept in compact arrays and every metric comes from one vectorized NumPy pass over
+them, so results are instant and can be given to Claude as facts instead of estimates.
+"""
+
+from array import array
+import hashlib
+import math
+import re
+
+import numpy as np
+
+from result_cache import normalize_transcript
+from transcript_parser import TextParser, format_timestamp
+
+# A silence at least this long between cues counts as dead air
+DEAD_AIR_SECONDS = 3.0
+
+# A turn starting this much before the previous speaker's turn has ended is an interruption
+INTERRUPTION_OVERLAP = 0.25
+
+# Speaking rate used to estimate talk time when a transcript has no timestamps
+WORDS_PER_MINUTE = 150
+
+UNKNOWN_SPEAKER = 'Unknown speaker'
+
+# Words of a name, ignoring punctuation ("Doe, Jane", "Jane D.", "Jane (Acme)")
+NAME_WORD = re.compile(r'\w+')
+
+
+def transcript_fingerprint(transcript):
+    """Identifies the transcript a stored timeline belongs to, ignoring trivial edits"""
+    return hashlib.sha256(normalize_transcript(transcript).encode('utf-8')).hexdigest()
+
+
+def match_speaker(name, speakers):
+    """Find the speaker label for a rep name, ignoring case and punctuation: exact, then all
+    name words, then every name word as a prefix of a label word ("Jane D" -> "Jane Doe"), then
+    first name. The looser steps only match when a single speaker fits.
+    """
+    wanted = NAME_WORD.findall((name or '').casefold())
+    if not wanted:
+        return None
+    labels = [(speaker, NAME_WORD.findall(speaker.casefold())) for speaker in speakers if speaker]
+    for speaker, words in labels:
+        if words == wanted:
+            return speaker
+    for speaker, words in labels:
+        if all(word in words for word in wanted):
+            return speaker
+    matches = [speaker for speaker, words in labels if all(
+        any(label.startswith(word) or word.startswith(label) for label in words) for word in wanted)]
+    if len(matches) != 1:
+        matches = [speaker for speaker, words in labels if words and words[0] == wanted[0]]
+    return matches[0] if len(matches) == 1 else None
+
+
+class CueTimeline:
+    """Column arrays of cue start/end times, speaker index, word and question counts"""
+
+    def __init__(self):
+        self.start = array('d')
+        self.end = array('d')
+        self.speaker = array('i')
+        self.words = array('i')
+        self.questions = array('i')
+        self.speakers = []
+        self.speaker_index = {}
+
+    def __len__(self):
+        return len(self.start)
+
+    @property
+    def timed(self):
+        return len(self.start) > 0 and not np.isnan(np.frombuffer(self.start, dtype=np.float64)).any()
+
+    def add(self, cue):
+        index = self.speaker_index.get(cue.speaker)
+        if index is None:
+            index = self.speaker_index[cue.speaker] = len(self.speakers)
+            self.speakers.append(cue.speaker)
+        self.start.append(math.nan if cue.start is None else cue.start)
+        self.end.append(math.nan if cue.end is None else cue.end)
+        self.speaker.append(index)
+        self.words.append(len(cue.text.split()))
+        self.questions.append(cue.text.count('?'))
+
+    def track(self, cues):
+        """Record cues as they pass through a parsing pipeline"""
+        for cue in cues:
+            self.add(cue)
+            yield cue
+
+    @classmethod
+    def from_text(cls, transcript):
+        timeline = cls()
+        for cue in TextParser().parse([transcript]):
+            timeline.add(cue)
+        return timeline
+
+    def to_dict(self):
+        return {
+            'start': self.start.tolist(),
+            'end': self.end.tolist(),
+            'speaker': self.speaker.tolist(),
+            'words': self.words.tolist(),
+            'questions': self.questions.tolist(),
+            'speakers': self.speakers
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        timeline = cls()
+        timeline.start.extend(data['start'])
+        timeline.end.extend(data['end'])
+        timeline.speaker.extend(data['speaker'])
+        timeline.words.extend(data['words'])
+        timeline.questions.extend(data['questions'])
+        timeline.speakers = list(data['speakers'])
+        timeline.speaker_index = {speaker: index for index, speaker in enumerate(timeline.speakers)}
+        return timeline
+
+
+def compute_metrics(timeline, rep=None):
+    """Talk share, monologues, questions, interruptions and dead air for a timeline.
+
+    Without timestamps, talk time is estimated from word counts and interruptions and
+    dead air are not reported.
+    """
+    count = len(timeline)
+    names = [speaker or UNKNOWN_SPEAKER for speaker in timeline.speakers]
+    rep_label = match_speaker(rep, timeline.speakers)
+    if count == 0:
+        return {'timed': False, 'rep': rep_label, 'duration_seconds': 0.0, 'speakers': [],
+                'questions': 0, 'interruptions': None, 'dead_air': None}
+
+    timed = timeline.timed
+    speaker = np.frombuffer(timeline.speaker, dtype=np.int32)
+    words = np.frombuffer(timeline.words, dtype=np.int32).astype(np.float64)
+    questions = np.frombuffer(timeline.questions, dtype=np.int32)
+    if timed:
+        start = np.frombuffer(timeline.start, dtype=np.float64)
+        end = np.maximum(np.frombuffer(timeline.end, dtype=np.float64), start)
+    else:
+        # Lay cues end to end at a typical speaking rate
+        end = np.cumsum(words * 60.0 / WORDS_PER_MINUTE)
+        start = end - words * 60.0 / WORDS_PER_MINUTE
+    speakers = len(names)
+
+    # Per cue -> per speaker
+    talk = np.bincount(speaker, weights=end - start, minlength=speakers)
+    spoken = np.bincount(speaker, weights=words, minlength=speakers)
+    asked = np.bincount(speaker, weights=questions, minlength=speakers)
+
+    # Consecutive cues from one speaker form a turn
+    boundaries = np.flatnonzero(np.r_[True, speaker[1:] != speaker[:-1]])
+    turn_speaker = speaker[boundaries]
+    turn_start = start[boundaries]
+    turn_end = np.maximum.reduceat(end, boundaries)
+    turn_words = np.add.reduceat(words, boundaries)
+    turns = np.bincount(turn_speaker, minlength=speakers)
+    # Monologue length is time spent speaking, so pauses inside a turn don't inflate it
+    longest = np.zeros(speakers)
+    np.maximum.at(longest, turn_speaker, np.add.reduceat(end - start, boundaries))
+    longest_words = np.zeros(speakers)
+    np.maximum.at(longest_words, turn_speaker, turn_words)
+
+    # A new turn that starts before the previous one ended interrupts it
+    overlaps = (turn_end[:-1] - turn_start[1:]) > INTERRUPTION_OVERLAP
+    interruptions = np.bincount(turn_speaker[1:][overlaps], minlength=speakers)
+
+    # Silence between the end of everything said so far and the next cue
+    gaps = start[1:] - np.maximum.accumulate(end)[:-1]
+    silences = gaps[gaps >= DEAD_AIR_SECONDS]
+
+    duration = float(end.max() - start.min())
+    total_talk = float(talk.sum()) or 1.0
+    total_words = float(spoken.sum()) or 1.0
+    minutes = talk / 60.0
+
+    by_speaker = []
+    for index in np.argsort(-talk, kind='stable'):
+        by_speaker.append({
+            'name': names[index],
+            'is_rep': timeline.speakers[index] == rep_label and rep_label is not None,
+            'talk_seconds': round(float(talk[index]), 1),
+            'talk_share': round(float(talk[index]) / total_talk, 3),
+            'words': int(spoken[index]),
+            'word_share': round(float(spoken[index]) / total_words, 3),
+            'words_per_minute': round(float(spoken[index] / minutes[index]), 1) if timed and minutes[index] > 0 else None,
+            'turns': int(turns[index]),
+            'questions': int(asked[index]),
+            'longest_monologue_seconds': round(float(longest[index]), 1),
+            'longest_monologue_words': int(longest_words[index]),
+            'interruptions': int(interruptions[index]) if timed else None
+        })
+
+    return {
+        'timed': timed,
+        'rep': rep_label,
+        'duration_seconds': round(duration, 1),
+        'speakers': by_speaker,
+        'questions': int(asked.sum()),
+        'interruptions': int(interruptions.sum()) if timed else None,
+        'dead_air': {
+            'threshold_seconds': DEAD_AIR_SECONDS,
+            'count': int(silences.size),
+            'total_seconds': round(float(silences.sum()), 1),
+            'longest_seconds': round(float(silences.max()), 1) if silences.size else 0.0
+        } if timed else None
+    }
+
+
+def metrics_facts(metrics):
+    """Render metrics as short factual lines for the analysis prompt"""
+    if not metrics or not metrics['speakers']:
+        return ''
+
+    def who(speaker):
+        return f"{speaker['name']} (rep)" if speaker['is_rep'] else speaker['name']
+
+    speakers = metrics['speakers']
+    basis = "timestamps" if metrics['timed'] else f"word counts (no timestamps; about {WORDS_PER_MINUTE} words per minute)"
+    lines = [f"Call length: {format_timestamp(metrics['duration_seconds'])}" + ("" if metrics['timed'] else " (estimated)")]
+    lines.append("Talk share: " + ", ".join(
+        f"{who(speaker)} {speaker['talk_share']:.0%} ({format_timestamp(speaker['talk_seconds'])})" for speaker in speakers))
+    lines.append("Longest monologue: " + ", ".join(
+        f"{who(speaker)} {format_timestamp(speaker['longest_monologue_seconds'])} ({speaker['longest_monologue_words']} words)"
+        for speaker in speakers))
+    lines.append("Questions asked: " + ", ".join(f"{who(speaker)} {speaker['questions']}" for speaker in speakers))
+    if metrics['timed']:
+        lines.append("Interruptions (started talking over the other person): " + ", ".join(
+            f"{who(speaker)} {speaker['interruptions']}" for speaker in speakers))
+        dead_air = metrics['dead_air']
+        lines.append(f"Dead air: {dead_air['count']} silences of {dead_air['threshold_seconds']:.0f}s or more, "
+                     f"{dead_air['total_seconds']:.0f}s in total, longest {dead_air['longest_seconds']:.0f}s")
+    return f"Measured from {basis}:\n" + '\n'.join(f"- {line}" for line in lines)
@@ -9,14 +9,96 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+from reportlab.pdfbase.pdfdoc import PDFName, PDFStream
+from reportlab.pdfgen.canvas import Canvas
 from datetime import datetime
 import re
 import io
+import zlib
+
+import markup
+
+# Flowables materialized ahead of the one being laid out; enough for keep-with-next chains
+STORY_LOOKAHEAD = 16
+
+NON_EMPTY_LINE = re.compile(r'[^\n]*\S[^\n]*')
+
+# Coaching lines ([COACH: ...], **[COACH ...]**, COACHING NOTE: ..., or any line with a
+# coach insight or feedback), capturing the note without its markers
+COACHING_LINE = re.compile(
+    r'^(?:(?:\[COACH:|\*\*\[?COACH[^:\]]*:?(?:\*\*)?|COACHING NOTE:)\s*|(?=.*(?:COACH INSIGHT|FEEDBACK):))'
+    r'(?P<note>.*?)\s*\]?(?:\*\*)?$'
+)
+
+
+class LazyStory:
+    """List-like front of a flowable generator, for doc.build
+
+    ReportLab only takes flowables off the front of the story (and puts split remainders
+    back there), so the report is laid out while the generator is still producing it and
+    only a few flowables are ever in memory at once.
+    """
+
+    def __init__(self, flowables, lookahead=STORY_LOOKAHEAD):
+        self.source = iter(flowables)
+        self.lookahead = lookahead
+        self.buffer = []
+
+    def _fill(self, count):
+        while len(self.buffer) < count:
+            flowable = next(self.source, None)
+            if flowable is None:
+                break
+            self.buffer.append(flowable)
+
+    def __len__(self):
+        # Exact once the generator is exhausted; until then only the look-ahead window counts
+        self._fill(self.lookahead)
+        return len(self.buffer)
+
+    def __getitem__(self, index):
+        self._fill(index.stop or 0 if isinstance(index, slice) else index + 1)
+        return self.buffer[index]
+
+    def __setitem__(self, index, value):
+        self.buffer[index] = value
+
+    def __delitem__(self, index):
+        self._fill(index.stop or 0 if isinstance(index, slice) else index + 1)
+        del self.buffer[index]
+
+    def insert(self, index, flowable):
+        self.buffer.insert(index, flowable)
+
+
+class CompressedPageCanvas(Canvas):
+    """Canvas that compresses each page's content as soon as the page is finished
+
+    ReportLab holds every page until the document is saved and only compresses the page
+    streams then, so a long report would otherwise keep all of its pages uncompressed.
+    """
+
+    def showPage(self):
+        super().showPage()
+        page = self._doc.Pages.pages[-1]
+        if page.stream and page.compression:
+            stream = PDFStream(content=zlib.compress(page.stream.encode('utf-8')))
+            stream.dictionary['Filter'] = PDFName('FlateDecode')
+            stream.__Comment__ = "page stream"
+            page.Contents = stream
+            page.stream = None
+
 
 class SalesCoachPDFGenerator:
+    # Stylesheet shared by every generator in the process, built by the first one
+    shared_styles = None
+    
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.setup_custom_styles()
+        if SalesCoachPDFGenerator.shared_styles is None:
+            self.styles = getSampleStyleSheet()
+            self.setup_custom_styles()
+            SalesCoachPDFGenerator.shared_styles = self.styles
+        self.styles = SalesCoachPDFGenerator.shared_styles
     
     def setup_custom_styles(self):
         """Set up custom paragraph styles for the PDF"""
@@ -87,24 +169,32 @@ class SalesCoachPDFGenerator:
             borderColor=colors.HexColor('#bbf7d0'),
             borderPadding=6
         ))
+        
+        # Bulleted and numbered analysis items
+        self.styles.add(ParagraphStyle(
+            name='AnalysisListItem',
+            parent=self.styles['AnalysisContent'],
+            spaceAfter=4,
+            leftIndent=30,
+            bulletIndent=16
+        ))
     
     def clean_text_for_pdf(self, text):
-        """Clean and format text for PDF generation"""
-        if not text:
-            return ""
-        
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
-        
-        # Handle common markdown-style formatting
-        text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)  # Bold
-        text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', text)      # Italic
-        
-        # Handle line breaks
-        text = text.replace('\n\n', '<br/><br/>')
-        text = text.replace('\n', '<br/>')
-        
-        return text
+        """ReportLab markup for text: bold, italics and line breaks, with anything else escaped"""
+        return markup.to_reportlab(text)
+    
+    def markdown_flowables(self, text):
+        """Paragraphs for markdown text, from the same parse the web interface renders"""
+        for block in markup.parse(text):
+            if block['type'] == 'heading':
+                yield Paragraph(markup.render_inline(block['spans'], 'reportlab'), self.styles['SubSection'])
+            elif block['type'] == 'list':
+                for number, item in enumerate(block['items'], block['start']):
+                    yield Paragraph(markup.render_inline(item, 'reportlab'), self.styles['AnalysisListItem'],
+                                    bulletText=f"{number}." if block['ordered'] else '•')
+            else:
+                yield Paragraph('<br/>'.join(markup.render_inline(line, 'reportlab') for line in block['lines']),
+                                self.styles['AnalysisContent'])
     
     def parse_analysis_content(self, analysis_text):
         """Parse analysis content to exactly match app display"""
@@ -158,52 +248,62 @@ class SalesCoachPDFGenerator:
     
     def parse_annotated_transcript(self, annotated_text):
         """Parse annotated transcript to separate dialogue and coaching comments"""
-        parsed_content = []
-        
-        # Split by coaching comments (typically in brackets or marked)
-        lines = annotated_text.split('\n')
-        
-        for line in lines:
-            line = line.strip()
+        return list(self.iter_annotated_transcript(annotated_text))
+    
+    def iter_annotated_transcript(self, annotated_text):
+        """Dialogue/coaching items of an annotated transcript, one line at a time"""
+        # Structured annotations are already a list of dialogue/coaching items
+        if isinstance(annotated_text, list):
+            yield from annotated_text
+            return
+        
+        # Lines are matched one at a time so a long transcript is never split into one big list
+        for match in NON_EMPTY_LINE.finditer(annotated_text):
+            line = match.group().strip()
             if not line:
                 continue
             
             # Detect coaching comments (various patterns)
-            if (line.startswith('[COACH:') or line.startswith('**[COACH') or 
-                line.startswith('COACHING NOTE:') or line.startswith('**COACHING') or
-                'COACH INSIGHT:' in line or 'FEEDBACK:' in line):
-                
-                # This is a coaching comment
-                clean_comment = re.sub(r'\[COACH:?\s*', '', line)
-                clean_comment = re.sub(r'\*\*\[?COACH.*?:\s*', '', clean_comment)
-                clean_comment = re.sub(r'COACHING NOTE:\s*', '', clean_comment)
-                clean_comment = re.sub(r'\]$', '', clean_comment)
-                clean_comment = re.sub(r'\*\*$', '', clean_comment)
-                
-                parsed_content.append({
+            coaching = COACHING_LINE.match(line)
+            if coaching:
+                yield {
                     'type': 'coaching',
-                    'content': clean_comment.strip()
-                })
+                    'content': coaching.group('note')
+                }
             else:
                 # This is regular transcript content
-                parsed_content.append({
+                yield {
                     'type': 'dialogue',
                     'content': line
-                })
-        
-        return parsed_content
+                }
     
     def generate_pdf_report(self, analysis_content, annotated_transcript, transcript_original=""):
-        """Generate a complete PDF report"""
+        """Generate a complete PDF report and return its bytes
+
+        annotated_transcript may be [COACH: ...] text or a list of structured
+        dialogue/coaching items. Use write_pdf_report to write a long report
+        straight to a file instead.
+        """
         buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
+        self.write_pdf_report(buffer, analysis_content, annotated_transcript, transcript_original)
+        return buffer.getvalue()
+    
+    def write_pdf_report(self, output, analysis_content, annotated_transcript, transcript_original=""):
+        """Write a complete PDF report to a path or binary file object
+
+        Flowables are generated as the layout consumes them, so peak memory does
+        not grow with the number of transcript lines.
+        """
+        doc = SimpleDocTemplate(output, pagesize=letter, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
-        
-        story = []
-        
+        doc.build(LazyStory(self.report_flowables(analysis_content, annotated_transcript)),
+                  canvasmaker=CompressedPageCanvas)
+    
+    def report_flowables(self, analysis_content, annotated_transcript):
+        """Flowables of the report in order, generated lazily"""
         # Title page
-        story.append(Paragraph("Sales Call Analysis Report", self.styles['CustomTitle']))
-        story.append(Spacer(1, 20))
+        yield Paragraph("Sales Call Analysis Report", self.styles['CustomTitle'])
+        yield Spacer(1, 20)
         
         # Report info
         report_date = datetime.now().strftime("%B %d, %Y at %I:%M %p")
@@ -221,21 +321,21 @@ class SalesCoachPDFGenerator:
             ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
         ]))
         
-        story.append(info_table)
-        story.append(Spacer(1, 30))
+        yield info_table
+        yield Spacer(1, 30)
         
         # Executive Summary section
-        story.append(Paragraph("Executive Summary", self.styles['SectionHeader']))
-        story.append(Paragraph(
+        yield Paragraph("Executive Summary", self.styles['SectionHeader'])
+        yield Paragraph(
             "This report provides comprehensive analysis and coaching feedback for a sales call transcript. "
             "The analysis includes performance insights, improvement recommendations, and annotated feedback "
             "throughout the conversation.",
             self.styles['AnalysisContent']
-        ))
-        story.append(Spacer(1, 20))
+        )
+        yield Spacer(1, 20)
         
         # Analysis Results section
-        story.append(Paragraph("Detailed Analysis Results", self.styles['SectionHeader']))
+        yield Paragraph("Detailed Analysis Results", self.styles['SectionHeader'])
         
         # Parse and format analysis content
         print(f"📄 Raw analysis content length: {len(analysis_content)}")
@@ -248,53 +348,32 @@ class SalesCoachPDFGenerator:
             print(f"📄 Section {i+1}: '{section['title']}' - Content length: {len(section['content'])}")
             
             if section['title'] and section['title'] != 'Analysis Results':
-                story.append(Paragraph(section['title'], self.styles['SubSection']))
-            
-            clean_content = self.clean_text_for_pdf(section['content'])
+                yield Paragraph(section['title'], self.styles['SubSection'])
             
-            # If content is very long, split it into multiple paragraphs for better PDF handling
-            if len(clean_content) > 3000:
-                content_parts = clean_content.split('<br/><br/>')
-                for part in content_parts:
-                    if part.strip():
-                        story.append(Paragraph(part.strip(), self.styles['AnalysisContent']))
-                        story.append(Spacer(1, 6))
-            else:
-                story.append(Paragraph(clean_content, self.styles['AnalysisContent']))
+            yield from self.markdown_flowables(section['content'])
             
-            story.append(Spacer(1, 12))
+            yield Spacer(1, 12)
         
         # Page break before annotated transcript
-        story.append(PageBreak())
+        yield PageBreak()
         
         # Annotated Transcript section
-        story.append(Paragraph("Annotated Transcript with Coaching Feedback", self.styles['SectionHeader']))
-        story.append(Paragraph(
+        yield Paragraph("Annotated Transcript with Coaching Feedback", self.styles['SectionHeader'])
+        yield Paragraph(
             "The following section contains the original transcript with inline coaching comments and feedback.",
             self.styles['AnalysisContent']
-        ))
-        story.append(Spacer(1, 15))
+        )
+        yield Spacer(1, 15)
         
         # Parse and format annotated transcript
-        parsed_transcript = self.parse_annotated_transcript(annotated_transcript)
-        
-        for item in parsed_transcript:
+        for item in self.iter_annotated_transcript(annotated_transcript):
             if item['type'] == 'coaching':
                 # Coaching comment
                 clean_content = self.clean_text_for_pdf(item['content'])
-                story.append(Paragraph(f"💡 Coach: {clean_content}", self.styles['CoachComment']))
+                yield Paragraph(f"💡 Coach: {clean_content}", self.styles['CoachComment'])
             else:
                 # Regular dialogue
                 clean_content = self.clean_text_for_pdf(item['content'])
-                story.append(Paragraph(clean_content, self.styles['AnnotationText']))
+                yield Paragraph(clean_content, self.styles['AnnotationText'])
             
-            story.append(Spacer(1, 6))
-        
-        # Build PDF
-        doc.build(story)
-        
-        # Get PDF data
-        pdf_data = buffer.getvalue()
-        buffer.close()
-        
-        return pdf_data
\ No newline at end of file
+            yield Spacer(1, 6)
@@ -0,0 +1,293 @@
+"""
+Rate Limiter for Sales Coach
+Token-aware admission control around the shared Anthropic client: requests are queued
+by priority, then arrival order, against input/output tokens-per-minute buckets, and
+429/529 responses are retried with jittered exponential backoff.
+"""
+
+from bisect import insort
+import itertools
+import random
+import threading
+import time
+
+import anthropic
+
+# Rough characters-per-token ratio used to estimate prompt size before sending
+CHARS_PER_TOKEN = 4
+
+RETRYABLE_STATUS_CODES = (429, 529)
+
+# Remaining-token headers on a 429 that tell which limit was hit
+EXHAUSTED_HEADERS = {
+    'input': ('anthropic-ratelimit-input-tokens-remaining', 'anthropic-ratelimit-tokens-remaining'),
+    'output': ('anthropic-ratelimit-output-tokens-remaining', 'anthropic-ratelimit-tokens-remaining')
+}
+
+
+def estimate_input_tokens(system, messages):
+    """Estimate prompt tokens from the text in the system prompt and messages"""
+    chars = len(system or '')
+    for message in messages:
+        content = message['content']
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            chars += sum(len(block.get('text', '')) for block in content)
+    return chars // CHARS_PER_TOKEN + 1
+
+
+class TokenBucket:
+    """A bucket refilled continuously at capacity tokens per minute"""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount tokens are available (0 if they already are)"""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Refund (positive) or charge (negative) tokens once actual usage is known"""
+        self.level = min(self.capacity, self.level + delta)
+
+    def drain(self):
+        self.level = min(self.level, 0.0)
+
+
+class RateLimiter:
+    def __init__(self, input_tokens_per_minute, output_tokens_per_minute, output_estimate=4000,
+                 max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.input_bucket = TokenBucket(input_tokens_per_minute)
+        self.output_bucket = TokenBucket(output_tokens_per_minute)
+        self.output_estimate = output_estimate
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.condition = threading.Condition()
+        # (priority, sequence, ticket) sorted so the head is served first
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.in_flight = 0
+        self.counters = {
+            'admitted': 0,
+            'throttled': 0,
+            'retries': 0,
+            'failures': 0,
+            'total_wait_seconds': 0.0
+        }
+
+    def estimate(self, kwargs):
+        """Estimate (input, output) tokens for a messages.create/stream call"""
+        input_tokens = estimate_input_tokens(kwargs.get('system'), kwargs.get('messages', []))
+        output_tokens = min(kwargs.get('max_tokens', self.output_estimate), self.output_estimate)
+        return input_tokens, output_tokens
+
+    def acquire(self, input_tokens, output_tokens, priority=0):
+        """Block until both buckets can cover the estimate; lower priority values go first"""
+        ticket = (priority, next(self.sequence))
+        started = time.monotonic()
+        with self.condition:
+            insort(self.waiting, ticket)
+            try:
+                while True:
+                    if self.waiting[0] == ticket:
+                        now = time.monotonic()
+                        self.input_bucket.refill(now)
+                        self.output_bucket.refill(now)
+                        wait = max(self.input_bucket.wait_time(input_tokens),
+                                   self.output_bucket.wait_time(output_tokens))
+                        if wait <= 0:
+                            self.input_bucket.take(input_tokens)
+                            self.output_bucket.take(output_tokens)
+                            break
+                        self.condition.wait(timeout=wait)
+                    else:
+                        self.condition.wait()
+            finally:
+                self.waiting.remove(ticket)
+                self.condition.notify_all()
+
+            waited = time.monotonic() - started
+            self.counters['admitted'] += 1
+            self.counters['total_wait_seconds'] += waited
+            if waited > 0.01:
+                self.counters['throttled'] += 1
+            self.in_flight += 1
+
+    def release(self, estimate, usage=None):
+        """Reconcile the estimate against actual usage once a request finishes"""
+        with self.condition:
+            self.in_flight -= 1
+            if usage is not None:
+                # Cache reads do not count towards the input tokens-per-minute limit
+                actual_input = usage.input_tokens + (getattr(usage, 'cache_creation_input_tokens', None) or 0)
+                self.input_bucket.adjust(estimate[0] - actual_input)
+                self.output_bucket.adjust(estimate[1] - usage.output_tokens)
+            self.condition.notify_all()
+
+    def exhausted_buckets(self, error):
+        """Buckets a 429 says are used up, from its remaining-token headers (none for 529 overloads)"""
+        response = getattr(error, 'response', None)
+        if error.status_code != 429 or response is None:
+            return []
+        buckets = {'input': self.input_bucket, 'output': self.output_bucket}
+        exhausted = []
+        for name, headers in EXHAUSTED_HEADERS.items():
+            for header in headers:
+                remaining = response.headers.get(header)
+                if remaining is not None and remaining.strip() == '0':
+                    exhausted.append(buckets[name])
+                    break
+        return exhausted
+
+    def backoff(self, attempt, error):
+        """Sleep before retrying a throttled request, honouring retry-after when present"""
+        with self.condition:
+            self.counters['retries'] += 1
+            # Everyone queued behind us would hit the same token limit, so empty that bucket
+            for bucket in self.exhausted_buckets(error):
+                bucket.drain()
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        print(f"⏳ Claude API returned {error.status_code}; retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+        time.sleep(delay)
+
+    def record_failure(self):
+        with self.condition:
+            self.counters['failures'] += 1
+
+    def is_retryable(self, error):
+        return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+    def stats(self):
+        with self.condition:
+            now = time.monotonic()
+            self.input_bucket.refill(now)
+            self.output_bucket.refill(now)
+            admitted = self.counters['admitted']
+            return dict(
+                self.counters,
+                total_wait_seconds=round(self.counters['total_wait_seconds'], 3),
+                average_wait_seconds=round(self.counters['total_wait_seconds'] / admitted, 3) if admitted else 0.0,
+                queue_depth=len(self.waiting),
+                in_flight=self.in_flight,
+                input_tokens_available=int(self.input_bucket.level),
+                output_tokens_available=int(self.output_bucket.level)
+            )
+
+
+class _RateLimitedStream:
+    """Context manager mirroring client.messages.stream() with admission control and retries"""
+
+    def __init__(self, limiter, messages, kwargs, priority):
+        self.limiter = limiter
+        self.messages = messages
+        self.kwargs = kwargs
+        self.priority = priority
+        self.manager = None
+        self.stream = None
+        self.estimate = None
+
+    def __enter__(self):
+        self.estimate = self.limiter.estimate(self.kwargs)
+        self.limiter.acquire(*self.estimate, priority=self.priority)
+        attempt = 0
+        while True:
+            try:
+                # The HTTP request is made when the stream is entered
+                self.manager = self.messages.stream(**self.kwargs)
+                self.stream = self.manager.__enter__()
+                return self.stream
+            except anthropic.APIStatusError as e:
+                if not self.limiter.is_retryable(e) or attempt >= self.limiter.max_retries:
+                    self.limiter.record_failure()
+                    self.limiter.release(self.estimate)
+                    raise
+                self.limiter.backoff(attempt, e)
+                attempt += 1
+            except Exception:
+                self.limiter.release(self.estimate)
+                raise
+
+    def __exit__(self, exc_type, exc, tb):
+        usage = None
+        try:
+            usage = self.stream.current_message_snapshot.usage
+        except Exception:
+            pass
+        self.limiter.release(self.estimate, usage)
+        return self.manager.__exit__(exc_type, exc, tb)
+
+
+class _RateLimitedMessages:
+    def __init__(self, limiter, messages, priority=None):
+        self.limiter = limiter
+        self.messages = messages
+        self.priority = priority
+
+    def _priority(self):
+        return self.priority() if self.priority else 0
+
+    def create(self, **kwargs):
+        estimate = self.limiter.estimate(kwargs)
+        self.limiter.acquire(*estimate, priority=self._priority())
+        usage = None
+        attempt = 0
+        try:
+            while True:
+                try:
+                    message = self.messages.create(**kwargs)
+                    usage = message.usage
+                    return message
+                except anthropic.APIStatusError as e:
+                    if not self.limiter.is_retryable(e) or attempt >= self.limiter.max_retries:
+                        self.limiter.record_failure()
+                        raise
+                    self.limiter.backoff(attempt, e)
+                    attempt += 1
+        finally:
+            self.limiter.release(estimate, usage)
+
+    def stream(self, **kwargs):
+        return _RateLimitedStream(self.limiter, self.messages, kwargs, self._priority())
+
+    def __getattr__(self, name):
+        # batches, count_tokens, ... pass straight through
+        return getattr(self.messages, name)
+
+
+class RateLimitedClient:
+    """Drop-in wrapper for anthropic.Anthropic that routes messages through a RateLimiter
+
+    priority is an optional callable returning the calling request's priority.
+    """
+
+    def __init__(self, client, limiter, priority=None):
+        self.client = client
+        self.limiter = limiter
+        self.messages = _RateLimitedMessages(limiter, client.messages, priority)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -0,0 +1,188 @@
+"""
+Background Report Rendering for Sales Coach
+PDF reports are laid out by ReportLab in a process pool, so an export never holds a Flask
+thread (or the GIL) while pages are built. Finished PDFs are written to disk under a hash
+of the analysis and annotation they were made from, and served again until either changes.
+Every worker process shares the report directory, so lookups and eviction go by the files
+on disk (newest modification time last) rather than by one process' index.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, Future
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+
+# Bump when the PDF layout changes so cached reports are rebuilt
+REPORT_VERSION = "3"
+
+# One generator per pool process; its styles are built on first use
+_generator = None
+
+
+def render_pdf_file(path, analysis, annotated_transcript, transcript=''):
+    """Render a PDF report into path; returns its size (runs in a pool process)"""
+    global _generator
+    if _generator is None:
+        from pdf_generator import SalesCoachPDFGenerator
+        _generator = SalesCoachPDFGenerator()
+    # Written under a temporary name and renamed so a reader never sees a partial file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _generator.write_pdf_report(temp_path, analysis, annotated_transcript, transcript)
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+
+class ReportRenderer:
+    """Process pool for PDF rendering with an on-disk, size-capped LRU of finished reports.
+
+    Renders of the same content share one pool task, so repeated export clicks wait for
+    the render already running instead of starting another.
+    """
+
+    def __init__(self, directory='cache/reports', max_workers=2, max_disk_bytes=256 * 1024 * 1024, timeout=300):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.max_disk_bytes = max_disk_bytes
+        self.timeout = timeout
+        self.pool = None
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.counters = {'renders': 0, 'hits': 0, 'shared': 0, 'failures': 0, 'evictions': 0}
+
+        # key -> size on disk as this process last saw it; ordered from least to most recently used
+        self.files = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        self._index(self._scan())
+
+    @staticmethod
+    def report_key(analysis, annotated_transcript):
+        """Hash of everything that changes the rendered report"""
+        payload = json.dumps([REPORT_VERSION, analysis, annotated_transcript], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def cached(self, key):
+        """Path of a finished report, or None.
+
+        The file is checked even when this process has not indexed it, since the report
+        may have been rendered by another worker.
+        """
+        path = self.path(key)
+        try:
+            # Touch the file so other workers see it as recently used
+            os.utime(path)
+            size = os.path.getsize(path)
+        except OSError:
+            with self.lock:
+                self.files.pop(key, None)
+            return None
+        with self.lock:
+            self.files.pop(key, None)
+            self.files[key] = size
+        return path
+
+    def render(self, analysis, annotated_transcript, transcript=''):
+        """Render (or reuse) the report for this content; blocks until it exists.
+
+        Returns (key, path, cached). Call from a background thread, not a request thread.
+        """
+        key = self.report_key(analysis, annotated_transcript)
+        path = self.cached(key)
+        if path:
+            with self.lock:
+                self.counters['hits'] += 1
+            return key, path, True
+
+        with self.lock:
+            future = self.pending.get(key)
+            if future is None:
+                future = self._submit(self.path(key), analysis, annotated_transcript, transcript)
+                self.pending[key] = future
+                self.counters['renders'] += 1
+            else:
+                self.counters['shared'] += 1
+        try:
+            size = future.result(timeout=self.timeout)
+        except Exception:
+            with self.lock:
+                self.counters['failures'] += 1
+            raise
+        finally:
+            with self.lock:
+                if self.pending.get(key) is future:
+                    del self.pending[key]
+
+        with self.lock:
+            self.files.pop(key, None)
+            self.files[key] = size
+            self._evict(keep=key)
+        return key, self.path(key), False
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, rendering=len(self.pending), reports=len(self.files),
+                        bytes=sum(self.files.values()))
+
+    def shutdown(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+
+    def _submit(self, path, analysis, annotated_transcript, transcript):
+        if self.max_workers <= 0:
+            # Render in the calling thread (useful for debugging and tiny deployments)
+            future = Future()
+            try:
+                future.set_result(render_pdf_file(path, analysis, annotated_transcript, transcript))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if self.pool is None:
+            # Spawned rather than forked so workers never inherit the server's threads
+            self.pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.pool.submit(render_pdf_file, path, analysis, annotated_transcript, transcript)
+
+    def _scan(self):
+        """(mtime, key, size) of every report on disk, least recently used first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pdf'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                # Evicted by another worker meanwhile
+                continue
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        return sorted(entries)
+
+    def _index(self, entries):
+        self.files = OrderedDict((key, size) for _, key, size in entries)
+
+    def _evict(self, keep):
+        """Delete least recently used reports until the directory fits the size cap (caller holds the lock).
+
+        Other workers write to the same directory, so sizes and ages come from a scan of it.
+        """
+        entries = self._scan()
+        total = sum(size for _, _, size in entries)
+        kept = []
+        for entry in entries:
+            _, key, size = entry
+            if total > self.max_disk_bytes and key != keep:
+                try:
+                    os.remove(self.path(key))
+                except OSError:
+                    pass
+                total -= size
+                self.counters['evictions'] += 1
+            else:
+                kept.append(entry)
+        self._index(kept)
@@ -0,0 +1,202 @@
+"""
+Result Cache for Sales Coach
+Content-addressed cache for LLM outputs with an in-memory tier, an on-disk tier that
+survives restarts, size-based LRU eviction and hit/miss counters. The disk tier may be
+shared by several worker processes: files are looked up on disk by key, and eviction
+works from the directory itself (oldest access time first), not from one process' index.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unicodedata
+
+
+def normalize_transcript(transcript):
+    """Normalize a transcript so trivially different copies share a cache key"""
+    text = unicodedata.normalize('NFC', transcript or '')
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = [line.rstrip() for line in text.split('\n')]
+    return '\n'.join(lines).strip()
+
+
+class ResultCache:
+    def __init__(self, directory='cache/results', max_memory_bytes=64 * 1024 * 1024,
+                 max_disk_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.lock = threading.Lock()
+
+        # key -> (value, size); ordered from least to most recently used
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+
+        # key -> size on disk as this process last saw it, from least to most recently used
+        self.disk_index = OrderedDict()
+        self.disk_bytes = 0
+
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0
+        }
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(kind, transcript, prompt_version, model, temperature, *extra):
+        """Hash the normalized transcript together with everything that changes the output.
+
+        extra holds other prompt inputs (such as measured call metrics); empty ones are skipped.
+        """
+        digest = hashlib.sha256()
+        parts = (kind, prompt_version, model, repr(float(temperature)), normalize_transcript(transcript))
+        for part in parts + tuple(part for part in extra if part):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return entry[0]
+
+            # Another worker may have written the entry, so the file is checked even when unindexed
+            if self.directory:
+                value = self._read_disk(key)
+                if value is not None:
+                    self.counters['disk_hits'] += 1
+                    self._remember(key, value, self.disk_index[key])
+                    return value
+
+            self.counters['misses'] += 1
+            return None
+
+    def set(self, key, value):
+        """Store a JSON-serializable value in both tiers"""
+        payload = json.dumps(value).encode('utf-8')
+        with self.lock:
+            self.counters['writes'] += 1
+            self._remember(key, value, len(payload))
+            if self.directory:
+                self._write_disk(key, payload)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters['memory_hits'] + self.counters['disk_hits'] + self.counters['misses']
+            hits = lookups - self.counters['misses']
+            return dict(
+                self.counters,
+                hit_rate=round(hits / lookups, 3) if lookups else 0.0,
+                memory_entries=len(self.memory),
+                memory_bytes=self.memory_bytes,
+                disk_entries=len(self.disk_index),
+                disk_bytes=self.disk_bytes
+            )
+
+    def _remember(self, key, value, size):
+        """Insert into the memory tier, evicting least recently used entries over the cap"""
+        if size > self.max_memory_bytes:
+            return
+        previous = self.memory.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= previous[1]
+        self.memory[key] = (value, size)
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self.memory.popitem(last=False)
+            self.memory_bytes -= evicted_size
+            self.counters['memory_evictions'] += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _scan_disk(self):
+        """(mtime, key, size) of every entry on disk, least recently used first"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    # Removed by another process meanwhile
+                    continue
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        return sorted(entries)
+
+    def _index_disk(self, entries):
+        self.disk_index = OrderedDict((key, size) for _, key, size in entries)
+        self.disk_bytes = sum(self.disk_index.values())
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU order from file access times"""
+        entries = self._scan_disk()
+        self._index_disk(entries)
+        if entries:
+            print(f"🗄️ Result cache loaded {len(entries)} entries ({self.disk_bytes:,} bytes) from {self.directory}")
+
+    def _read_disk(self, key):
+        """Value of the entry on disk (indexing it as most recently used), or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            # Touch the file so LRU order survives a restart and is seen by other workers
+            os.utime(path)
+            size = os.path.getsize(path)
+        except (OSError, ValueError):
+            self.disk_bytes -= self.disk_index.pop(key, 0)
+            return None
+        self.disk_bytes += size - self.disk_index.pop(key, 0)
+        self.disk_index[key] = size
+        return value
+
+    def _write_disk(self, key, payload):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write atomically so a crash never leaves a half-written entry behind
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+        # Writes follow an LLM call, so a directory scan here costs little by comparison
+        self._prune_disk(keep=key)
+
+    def _prune_disk(self, keep):
+        """Remove the least recently used files until the directory fits max_disk_bytes.
+
+        Other workers write to the same directory, so sizes and ages come from a scan of it
+        rather than from this process' index.
+        """
+        entries = self._scan_disk()
+        total = sum(size for _, _, size in entries)
+        kept = []
+        for entry in entries:
+            _, key, size = entry
+            if total > self.max_disk_bytes and key != keep:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+                total -= size
+                self.memory_bytes -= self.memory.pop(key, (None, 0))[1]
+                self.counters['disk_evictions'] += 1
+            else:
+                kept.append(entry)
+        self._index_disk(kept)
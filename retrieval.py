@@ -0,0 +1,138 @@
+"""
+Chat Retrieval for Sales Coach
+A lexical BM25 index over a call's transcript, split into chunks of consecutive speaker
+turns, so each chat question is answered from the few passages it is about instead of
+the whole call. Indexes are built once per transcript and kept in a small in-process LRU.
+"""
+
+from collections import Counter, OrderedDict
+import hashlib
+import math
+import re
+import threading
+
+from annotation_pipeline import split_turns
+
+# Transcript chunks are consecutive turns up to about this many characters
+CHUNK_CHARS = 1200
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Hits scoring below this fraction of the best hit are left out (they only share common
+# words such as a speaker name that labels every chunk)
+MIN_RELATIVE_SCORE = 0.1
+
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again all am an and any are as at be because been before being
+between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its just me more
+most my no nor not now of off on once only or other our out over own same she should
+so some such than that the their them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with
+would you your yours call rep
+""".split())
+
+SUFFIXES = ('ations', 'ation', 'ingly', 'ings', 'ing', 'edly', 'ied', 'ies', 'ed', 'ly', 'es', 's')
+
+
+def stem(word):
+    """Strip a common English suffix so "objections" and "objection" match"""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents"""
+
+    def __init__(self, documents, k1=BM25_K1, b=BM25_B):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.lengths = []
+        for index, document in enumerate(documents):
+            terms = Counter(tokenize(document))
+            self.lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                self.postings.setdefault(term, []).append((index, count))
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def search(self, query, limit=5, min_relative=MIN_RELATIVE_SCORE):
+        """Best matching documents for a query as [(index, score)], highest score first"""
+        scores = Counter()
+        total = len(self.documents)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, count in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / (self.average_length or 1))
+                scores[index] += idf * count * (self.k1 + 1) / (count + norm)
+        hits = scores.most_common(limit)
+        return [(index, score) for index, score in hits if score >= hits[0][1] * min_relative]
+
+
+def chunk_turns(transcript, max_chars=CHUNK_CHARS):
+    """Group consecutive turns into chunks; returns [(first turn number, text)] with turns numbered [n]"""
+    chunks = []
+    lines, size, first = [], 0, 0
+    for number, turn in enumerate(split_turns(transcript)):
+        if lines and size + len(turn) > max_chars:
+            chunks.append((first, '\n'.join(lines)))
+            lines, size, first = [], 0, number
+        lines.append(f"[{number}] {turn}")
+        size += len(turn) + 1
+    if lines:
+        chunks.append((first, '\n'.join(lines)))
+    return chunks
+
+
+class ChatIndex:
+    """Transcript chunks of one call with a BM25 index over them"""
+
+    def __init__(self, transcript):
+        self.chunks = chunk_turns(transcript)
+        self.index = BM25Index([text for _, text in self.chunks])
+
+    def retrieve(self, question, chunks=4):
+        """Transcript excerpts for a question, in call order.
+
+        Questions without any indexed word (e.g. "why?") get the opening of the call.
+        """
+        hits = [index for index, _ in self.index.search(question, chunks)] or range(min(1, len(self.chunks)))
+        return [self.chunks[index][1] for index in sorted(hits)]
+
+
+class ChatIndexCache:
+    """Most recently used chat indexes, keyed by transcript content"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, transcript):
+        """The index for this transcript, built on first use"""
+        key = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+        with self.lock:
+            index = self.entries.get(key)
+            if index is not None:
+                self.entries.move_to_end(key)
+                return index
+        index = ChatIndex(transcript)
+        with self.lock:
+            self.entries[key] = index
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return index
@@ -0,0 +1,684 @@
+"""
+Sales Call Analyzer for Sales Coach
+The Claude-backed analyzer (coaching analysis, transcript annotation and chat, with their
+prompts) and factories for the pieces it runs with: result cache, rate limiter,
+scheduler, transcript compactor and document extractor. Importing this module starts
+nothing, so the web app and the batch CLI each build their own instances from it.
+"""
+
+import anthropic
+import os
+from dotenv import load_dotenv
+import json
+import contextlib
+from result_cache import ResultCache
+from rate_limiter import RateLimiter, RateLimitedClient
+from scheduler import PriorityScheduler
+from ingest import DocumentExtractor
+from compaction import TranscriptCompactor, parse_steps
+from retrieval import ChatIndexCache
+from chat_history import ChatHistory
+from metrics import metrics_facts
+from annotation_pipeline import (ChunkedAnnotator, merge_token_usage, split_turns, number_turns,
+                                 parse_turn_notes, merge_turn_notes, render_annotated, NOTE_OBJECT,
+                                 align_lines, missing_ranges, coverage_report, gap_chunks, splice_gaps)
+
+# Load environment variables
+load_dotenv()
+
+# Claude model settings shared by every analyzer call
+MODEL_NAME = "claude-sonnet-4-20250514"
+MAX_TOKENS = 20000
+TEMPERATURE = 0.7
+
+# Completions cut off at max_tokens are continued up to this many times
+MAX_CONTINUATIONS = int(os.getenv('MAX_CONTINUATIONS', '3'))
+
+# 'structured' returns compact {turn_index, note} entries merged locally;
+# 'inline' has Claude reproduce the transcript with [COACH: ...] notes
+ANNOTATION_MODE = os.getenv('ANNOTATION_MODE', 'structured')
+
+# Long transcripts are annotated in chunks of about this many characters, in parallel
+ANNOTATION_CHUNK_CHARS = int(os.getenv('ANNOTATION_CHUNK_CHARS', '12000'))
+ANNOTATION_WORKERS = int(os.getenv('ANNOTATION_WORKERS', '4'))
+
+# Organization-wide tokens-per-minute budget shared by every Claude call in this process
+ANTHROPIC_INPUT_TPM = int(os.getenv('ANTHROPIC_INPUT_TPM', '400000'))
+ANTHROPIC_OUTPUT_TPM = int(os.getenv('ANTHROPIC_OUTPUT_TPM', '80000'))
+# Expected output tokens reserved per request until actual usage is known
+ANTHROPIC_OUTPUT_ESTIMATE = int(os.getenv('ANTHROPIC_OUTPUT_ESTIMATE', '4000'))
+ANTHROPIC_MAX_RETRIES = int(os.getenv('ANTHROPIC_MAX_RETRIES', '5'))
+
+# Concurrent Claude requests overall and per priority class (chat > analysis > annotation > batch);
+# keeping annotation and batch below the total leaves headroom for interactive chat
+MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', '8'))
+CONCURRENCY_LIMITS = {
+    'chat': int(os.getenv('CHAT_CONCURRENCY', '8')),
+    'analysis': int(os.getenv('ANALYSIS_CONCURRENCY', '6')),
+    'annotation': int(os.getenv('ANNOTATION_CONCURRENCY', '4')),
+    'batch': int(os.getenv('BATCH_CONCURRENCY', '2'))
+}
+
+# Transcript compaction before prompting: comma-separated steps from speakers, timestamps,
+# tags, fillers, stutters, empty, or 'all' / 'off'. The default only unifies speaker labels
+# and drops empty lines; the other steps change what was written, so they are opt-in
+TRANSCRIPT_COMPACTION = os.getenv('TRANSCRIPT_COMPACTION', 'speakers,empty')
+
+# Chat answers come from the analysis plus the transcript chunks that best match the
+# question (BM25), so their cost does not grow with the length of the call
+CHAT_MAX_TOKENS = int(os.getenv('CHAT_MAX_TOKENS', '2048'))
+CHAT_CONTEXT_CHUNKS = int(os.getenv('CHAT_CONTEXT_CHUNKS', '4'))
+CHAT_SUMMARY_TOKENS = 600
+
+# Bump whenever a prompt template changes so cached results are not reused
+PROMPT_VERSION = "2025-05-30.6"
+
+def prompt_text(content):
+    """Flatten prompt content blocks into the plain text shown in the Prompts tab"""
+    return '\n\n'.join(block['text'] for block in content)
+
+def messages_text(messages):
+    """Flatten a multi-turn prompt into plain text, one [role] heading per message"""
+    return '\n\n'.join(
+        f"[{message['role']}]\n" + (message['content'] if isinstance(message['content'], str) else prompt_text(message['content']))
+        for message in messages
+    )
+
+class SalescoachAnalyzer:
+    # One system prompt for every call: it sits ahead of the transcript in the cached prefix
+    SYSTEM_PROMPT = "You are an expert sales coach with 20+ years of experience training top sales representatives."
+
+    def __init__(self, cache=None, limiter=None, scheduler=None, priority=None):
+        """priority, when given, is the scheduler class for every request (the batch CLI uses 'batch')"""
+        api_key = os.getenv('ANTHROPIC_API_KEY')
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY environment variable is required")
+        # Using Claude Sonnet 4 - the latest model
+        # Retries are handled by the shared rate limiter, not the SDK
+        client = anthropic.Anthropic(api_key=api_key, max_retries=0 if limiter else 2)
+        current_priority = scheduler.current_priority if scheduler else None
+        self.client = RateLimitedClient(client, limiter, priority=current_priority) if limiter else client
+        self.cache = cache
+        self.scheduler = scheduler
+        self.priority = priority
+        self.chunked_annotator = ChunkedAnnotator(
+            self._annotate_chunk,
+            max_workers=ANNOTATION_WORKERS,
+            max_chunk_chars=ANNOTATION_CHUNK_CHARS
+        )
+        self.chat_indexes = ChatIndexCache()
+    
+    def _cache_key(self, kind, transcript, *extra):
+        if not self.cache:
+            return None
+        return ResultCache.make_key(kind, transcript, PROMPT_VERSION, MODEL_NAME, TEMPERATURE, *extra)
+    
+    def _cached_result(self, cache_key, label):
+        """Look up a previous result for this transcript and prompt version"""
+        if not cache_key:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            print(f"⚡ {label} served from result cache")
+        return cached
+    
+    def _store_result(self, cache_key, content, token_usage, stop_reason, **extra):
+        # Truncated completions are not worth reusing
+        if cache_key and stop_reason != 'max_tokens':
+            self.cache.set(cache_key, dict(extra, content=content, token_usage=token_usage))
+    
+    def _transcript_block(self, transcript):
+        """Stable leading block shared by every prompt so Claude can reuse the cached prefix"""
+        return {
+            "type": "text",
+            "text": f"Here is the sales call transcript. Each speaker turn is numbered like [12]:\n\n<transcript>\n{number_turns(split_turns(transcript))}\n</transcript>",
+            "cache_control": {"type": "ephemeral"}
+        }
+    
+    def build_analysis_prompt(self, transcript, metrics=None):
+        """Build the coaching analysis prompt for a transcript, with measured call metrics as facts"""
+        blocks = [self._transcript_block(transcript)]
+        facts = metrics_facts(metrics)
+        if facts:
+            # After the cached transcript block, so the prefix stays shared with annotation
+            blocks.append({"type": "text", "text": (
+                "Conversation metrics for this call, measured exactly from the transcript. Treat them as facts "
+                "and quote them where relevant instead of estimating talk ratio, monologues, questions, "
+                f"interruptions or silences yourself.\n\n{facts}"
+            )})
+        return blocks + [
+            {"type": "text", "text": """
+        You are an expert sales coach analyzing the sales call transcript above. Please provide a comprehensive analysis with the following sections:
+
+        1. **Overall Performance Summary**: Brief overview of how the call went
+        2. **What the Representative Did Well**: Specific positive behaviors and techniques
+        3. **Areas for Improvement**: Specific areas where the rep could improve
+        4. **Key Coaching Points**: 3-5 actionable recommendations
+        5. **Call Outcome Assessment**: Likely success/next steps
+
+        Please provide detailed, actionable feedback that would help this sales representative improve their performance.
+
+        End with one line in exactly this form, where outcome is one of won, advancing, stalled or lost, and objections is the number of objections the prospect raised:
+        Scorecard: outcome=<outcome>, objections=<number>
+        """}
+        ]
+    
+    def build_annotation_prompt(self, transcript):
+        """Build the inline annotation prompt for a transcript"""
+        return [
+            self._transcript_block(transcript),
+            {"type": "text", "text": """
+        You are a sales coach providing inline feedback on the call transcript above. Reproduce the complete original transcript word-for-word (leave out the [n] turn numbers), inserting coaching feedback in [COACH: ...] format after key moments.
+        
+        Add coaching notes for:
+        - Opening techniques
+        - Rapport building
+        - Discovery questions
+        - Objection handling
+        - Closing attempts
+        - Missed opportunities
+        """}
+        ]
+    
+    def build_structured_annotation_prompt(self, transcript):
+        """Build the prompt asking for line-indexed coaching notes instead of a full rewrite"""
+        return [
+            self._transcript_block(transcript),
+            {"type": "text", "text": """
+        You are a sales coach providing inline feedback on the call transcript above. Do NOT reproduce the transcript.
+        
+        Return your coaching notes as a JSON array, one object per note:
+        [{"turn_index": <number of the turn the note follows>, "note": "<coaching feedback>"}]
+        
+        Add coaching notes for:
+        - Opening techniques
+        - Rapport building
+        - Discovery questions
+        - Objection handling
+        - Closing attempts
+        - Missed opportunities
+        
+        Cover the whole call from the first turn to the last, ordering notes by turn_index. Output only the JSON array.
+        """}
+        ]
+    
+    def build_chunk_annotation_prompt(self, chunk):
+        """Build the annotation prompt for one section of a long transcript"""
+        context = ""
+        if chunk['before']:
+            context += f"""
+        For context, these turns come immediately BEFORE the section. Do NOT reproduce or annotate them:
+        <previous_turns>
+{chunk['before']}
+        </previous_turns>
+        """
+        if chunk['after']:
+            context += f"""
+        For context, these turns come immediately AFTER the section. Do NOT reproduce or annotate them:
+        <following_turns>
+{chunk['after']}
+        </following_turns>
+        """
+        return [{"type": "text", "text": f"""
+        You are a sales coach providing inline feedback on one section (part {chunk['index'] + 1} of {chunk['total']}) of a longer sales call transcript.
+        {context}
+        Section to annotate:
+        <section>
+{chunk['text']}
+        </section>
+        
+        Reproduce the section above COMPLETELY and word-for-word, from its first line to its last, inserting coaching feedback in [COACH: ...] format after key moments.
+        
+        Add coaching notes for:
+        - Opening techniques
+        - Rapport building
+        - Discovery questions
+        - Objection handling
+        - Closing attempts
+        - Missed opportunities
+        
+        Output only the annotated section, without the context turns or any preamble.
+        """}]
+    
+    def index_for_chat(self, transcript):
+        """Build (or reuse) the retrieval index chat questions about this call are answered from"""
+        return self.chat_indexes.get(transcript)
+    
+    def _chat_context_block(self, analysis):
+        """Stable leading block of every chat turn about a call, cached across the conversation"""
+        return {
+            "type": "text",
+            "text": f"""Here is the coaching analysis of a sales call:
+
+<analysis>
+{analysis}
+</analysis>
+
+You are a sales coach discussing this call with the user. Each question comes with the excerpts of the call transcript that relate to it, with speaker turns numbered like [12]. If the excerpts and analysis do not cover what is asked, say so rather than guessing about the rest of the call. Keep answers helpful and concise.""",
+            "cache_control": {"type": "ephemeral"}
+        }
+    
+    def build_chat_prompt(self, question, transcript, previous_analysis, history=None):
+        """Build the messages for a chat turn.
+
+        The analysis block and earlier exchanges come first and only grow at the end, so
+        each turn reads them from Claude's prompt cache; the transcript excerpts relevant to
+        this question go in the new user message.
+        """
+        history = history or ChatHistory()
+        excerpts = self.index_for_chat(transcript).retrieve(question, chunks=CHAT_CONTEXT_CHUNKS)
+        print(f"🔎 Chat context: {len(excerpts)} transcript chunks, {len(history.exchanges)} earlier exchanges"
+              + (f", summary of {history.summarized} more" if history.summary else ""))
+        
+        prefix = [self._chat_context_block(previous_analysis)]
+        if history.summary:
+            prefix.append({"type": "text", "text": f"Summary of the earlier part of our conversation:\n{history.summary}"})
+        turn = [{"type": "text", "text": (
+            "Transcript excerpts for this question:\n\n<transcript_excerpts>\n" + '\n...\n'.join(excerpts)
+            + f"\n</transcript_excerpts>\n\nUser Question: {question}"
+        )}]
+        
+        messages = history.messages()
+        if not messages:
+            return [{"role": "user", "content": prefix + turn}]
+        messages[0] = {"role": "user", "content": prefix + [{"type": "text", "text": messages[0]['content']}]}
+        # Cache everything up to the last answer so the next turn only pays for its own question
+        messages[-1] = {"role": "assistant", "content": [
+            {"type": "text", "text": messages[-1]['content'], "cache_control": {"type": "ephemeral"}}
+        ]}
+        return messages + [{"role": "user", "content": turn}]
+    
+    def build_chat_summary_prompt(self, summary, exchanges):
+        """Build the prompt that folds older chat exchanges into the running summary"""
+        conversation = '\n\n'.join(f"User: {question}\nCoach: {answer}" for question, answer in exchanges)
+        return [{"type": "text", "text": f"""
+        Below is the summary so far of a coaching conversation about a sales call, followed by the next exchanges of that conversation. Write an updated summary that replaces both: keep the questions asked, the advice given, any specific numbers, names, turn references [n] and commitments, and anything the user said about themselves or their goals. Leave out pleasantries. Use at most 250 words.
+
+        <summary>
+        {summary or '(none yet)'}
+        </summary>
+
+        <exchanges>
+        {conversation}
+        </exchanges>
+        """}]
+    
+    def _token_usage(self, usage, max_tokens=MAX_TOKENS):
+        """Convert an Anthropic usage object into the token_usage dict returned to the UI"""
+        cache_write = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        cache_read = getattr(usage, 'cache_read_input_tokens', None) or 0
+        return {
+            'input_tokens': usage.input_tokens,
+            'output_tokens': usage.output_tokens,
+            'cache_creation_input_tokens': cache_write,
+            'cache_read_input_tokens': cache_read,
+            'total_tokens': usage.input_tokens + cache_write + cache_read + usage.output_tokens,
+            'max_tokens_limit': max_tokens
+        }
+    
+    def _log_usage(self, label, token_usage):
+        print(f"📊 {label} tokens - Input: {token_usage['input_tokens']:,}, Cache read: {token_usage['cache_read_input_tokens']:,}, Cache write: {token_usage['cache_creation_input_tokens']:,}, Output: {token_usage['output_tokens']:,}, Total: {token_usage['total_tokens']:,}")
+    
+    def _request_slot(self, priority):
+        """Scheduler slot for one API request in the given priority class"""
+        if not self.scheduler:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(self.priority or priority)
+    
+    def request_params(self, messages, max_tokens=MAX_TOKENS):
+        """Model settings and messages for one Messages API request (also used for batch requests)"""
+        return {
+            'model': MODEL_NAME,
+            'max_tokens': max_tokens,
+            'temperature': TEMPERATURE,
+            'system': self.SYSTEM_PROMPT,
+            'messages': messages
+        }
+    
+    def _client_params(self, messages, max_tokens=MAX_TOKENS):
+        """request_params for client.messages.create/stream; temperature is sent in the request
+        body because recent SDK releases no longer accept it as a keyword argument"""
+        params = self.request_params(messages, max_tokens)
+        params['extra_body'] = {'temperature': params.pop('temperature')}
+        return params
+    
+    def _stream_text(self, label, prompt, max_tokens=MAX_TOKENS, history=(), priority='batch'):
+        """Stream text deltas, continuing past max_tokens; returns (content, token_usage, stop_reason, continuations)
+
+        priority is the scheduler class the requests run in (chat, analysis, annotation or batch).
+        """
+        content = ''
+        usages = []
+        messages = [*history, {"role": "user", "content": prompt}]
+        for continuation in range(MAX_CONTINUATIONS + 1):
+            with self._request_slot(priority), self.client.messages.stream(**self._client_params(messages, max_tokens)) as stream:
+                for text in stream.text_stream:
+                    content += text
+                    yield text
+                message = stream.get_final_message()
+            usages.append(self._token_usage(message.usage, max_tokens))
+            if message.stop_reason != 'max_tokens' or continuation == MAX_CONTINUATIONS:
+                break
+            print(f"↪️ {label} stopped at max_tokens; requesting continuation {continuation + 1}/{MAX_CONTINUATIONS}")
+            # Prefill the partial answer so Claude picks up where it stopped (the API rejects trailing whitespace)
+            content = content.rstrip()
+            messages = [
+                *history,
+                {"role": "user", "content": prompt},
+                {"role": "assistant", "content": content}
+            ]
+        return content, merge_token_usage(usages), message.stop_reason, len(usages) - 1
+    
+    def _create_text(self, label, prompt, max_tokens=MAX_TOKENS, history=(), priority='batch'):
+        """Blocking counterpart of _stream_text"""
+        content = ''
+        usages = []
+        messages = [*history, {"role": "user", "content": prompt}]
+        for continuation in range(MAX_CONTINUATIONS + 1):
+            with self._request_slot(priority):
+                message = self.client.messages.create(**self._client_params(messages, max_tokens))
+            # Join every text block; a refusal or empty reply has none
+            content += ''.join(block.text for block in message.content if block.type == 'text')
+            usages.append(self._token_usage(message.usage, max_tokens))
+            if message.stop_reason != 'max_tokens' or continuation == MAX_CONTINUATIONS:
+                break
+            print(f"↪️ {label} stopped at max_tokens; requesting continuation {continuation + 1}/{MAX_CONTINUATIONS}")
+            content = content.rstrip()
+            messages = [
+                *history,
+                {"role": "user", "content": prompt},
+                {"role": "assistant", "content": content}
+            ]
+        token_usage = merge_token_usage(usages)
+        self._log_usage(label, token_usage)
+        return {
+            'content': content,
+            'token_usage': token_usage,
+            'stop_reason': message.stop_reason,
+            'continuations': len(usages) - 1
+        }
+    
+    def _stream_completion(self, label, prompt, cache_key=None, transcript=None, max_tokens=MAX_TOKENS, history=(),
+                           priority='batch'):
+        """Stream a completion, yielding text deltas and a final event with the full text and usage
+
+        When transcript is given the output is an inline annotation: its coverage of the
+        transcript is verified and any skipped ranges are annotated and spliced in.
+        """
+        cached = self._cached_result(cache_key, label)
+        if cached is not None:
+            yield {'type': 'text', 'text': cached['content']}
+            yield dict(cached, type='done', stop_reason='end_turn', cached=True)
+            return
+        
+        print(f"🔄 Streaming {label.lower()} with model: {MODEL_NAME}, max_tokens: {max_tokens}")
+        deltas = self._stream_text(label, prompt, max_tokens, history, priority)
+        while True:
+            try:
+                yield {'type': 'text', 'text': next(deltas)}
+            except StopIteration as finished:
+                content, token_usage, stop_reason, continuations = finished.value
+                break
+        
+        extra = {}
+        if transcript is not None:
+            content, extra['coverage'], gap_usages = self._complete_coverage(transcript, content)
+            token_usage = merge_token_usage([token_usage] + gap_usages)
+        
+        self._store_result(cache_key, content, token_usage, stop_reason, **extra)
+        self._log_usage(label, token_usage)
+        yield dict(
+            extra,
+            type='done',
+            content=content,
+            token_usage=token_usage,
+            stop_reason=stop_reason,
+            continuations=continuations,
+            cached=False
+        )
+    
+    def _complete_coverage(self, transcript, content):
+        """Annotate transcript lines missing from inline output and splice them in place.
+
+        Returns (content, coverage report, token usages of the gap-filling calls).
+        """
+        original_lines, output_lines, matches = align_lines(transcript, content)
+        ranges = missing_ranges(len(original_lines), matches)
+        usages = []
+        if ranges:
+            print(f"🧩 Annotation skipped {len(ranges)} transcript range(s): {ranges[:5]}; annotating the gaps")
+            chunks = gap_chunks(original_lines, ranges, max_chars=ANNOTATION_CHUNK_CHARS)
+            filled = []
+            for chunk, result in self.chunked_annotator.run(chunks):
+                filled.append((chunk, result['content']))
+                usages.append(result['token_usage'])
+            content = splice_gaps(output_lines, matches, filled)
+        
+        coverage = coverage_report(transcript, content)
+        if coverage['missing_ranges']:
+            print(f"⚠️ Annotation still missing transcript lines {coverage['missing_ranges'][:5]}")
+        print(f"📏 Annotation coverage: {coverage['covered_lines']}/{coverage['total_lines']} lines")
+        return content, coverage, usages
+    
+    def analyze_transcript(self, transcript, metrics=None):
+        """Analyze the sales call transcript and provide coaching feedback"""
+        prompt = self.build_analysis_prompt(transcript, metrics)
+        cache_key = self._cache_key('analysis', transcript, metrics_facts(metrics))
+        cached = self._cached_result(cache_key, "Analysis")
+        if cached is not None:
+            return dict(cached, cached=True), prompt_text(prompt)
+        
+        try:
+            model_name = MODEL_NAME
+            print(f"🤖 Using model: {model_name} with max_tokens: {MAX_TOKENS}")
+            
+            result = self._create_text("Analysis", prompt, priority='analysis')
+            print(f"📊 Output usage: {(result['token_usage']['output_tokens'] / MAX_TOKENS * 100):.1f}% of max tokens")
+            
+            self._store_result(cache_key, result['content'], result['token_usage'], result['stop_reason'])
+            return {
+                'content': result['content'],
+                'token_usage': result['token_usage']
+            }, prompt_text(prompt)
+        except Exception as e:
+            return f"Error analyzing transcript: {str(e)}", prompt_text(prompt)
+    
+    def stream_analysis(self, transcript, metrics=None):
+        """Streaming variant of analyze_transcript; returns (event generator, prompt)"""
+        prompt = self.build_analysis_prompt(transcript, metrics)
+        cache_key = self._cache_key('analysis', transcript, metrics_facts(metrics))
+        return self._stream_completion("Analysis", prompt, cache_key, priority='analysis'), prompt_text(prompt)
+    
+    def annotate_transcript(self, transcript):
+        """Add coaching annotations throughout the transcript"""
+        events, prompt = self.stream_annotation(transcript)
+        try:
+            for event in events:
+                if event['type'] == 'done':
+                    print(f"📝 Annotation result length: {len(event['content'])} characters")
+                    return event['content'], prompt
+            raise RuntimeError("the annotation stream ended without a result")
+        except Exception as e:
+            return f"Error annotating transcript: {str(e)}", prompt
+    
+    def stream_annotation(self, transcript):
+        """Streaming variant of annotate_transcript; returns (event generator, prompt)
+
+        In structured mode the done event also carries 'annotations', the merged list of
+        dialogue/coaching items.
+        """
+        if ANNOTATION_MODE == 'structured':
+            cache_key = self._cache_key('annotation-structured', transcript)
+            prompt = self.build_structured_annotation_prompt(transcript)
+            return self._stream_structured_annotation(transcript, prompt, cache_key), prompt_text(prompt)
+        
+        cache_key = self._cache_key('annotation', transcript)
+        chunks = self.chunked_annotator.plan(transcript)
+        if len(chunks) > 1:
+            return self._stream_chunked_annotation(transcript, chunks, cache_key), self._chunked_prompt_text(chunks)
+        prompt = self.build_annotation_prompt(transcript)
+        return (self._stream_completion("Annotation", prompt, cache_key, transcript=transcript, priority='annotation'),
+                prompt_text(prompt))
+    
+    def _stream_structured_annotation(self, transcript, prompt, cache_key=None):
+        """Stream line-indexed notes and merge them into the original turns locally.
+
+        Text events preview the merged transcript as notes arrive; the done event holds the
+        final merge, which also places any notes that arrived out of order.
+        """
+        turns = split_turns(transcript)
+        cached = self._cached_result(cache_key, "Annotation")
+        if cached is not None:
+            yield {'type': 'text', 'text': cached['content']}
+            yield dict(cached, type='done', stop_reason='end_turn', cached=True)
+            return
+        
+        print(f"🔄 Streaming structured annotation for {len(turns)} turns with model: {MODEL_NAME}")
+        raw = ''
+        scanned = 0
+        emitted = 0
+        
+        def preview(lines):
+            return {'type': 'text', 'text': ('\n' if emitted else '') + '\n'.join(lines)}
+        
+        deltas = self._stream_text("Annotation", prompt, priority='annotation')
+        while True:
+            try:
+                text = next(deltas)
+            except StopIteration as finished:
+                raw, token_usage, stop_reason, continuations = finished.value
+                break
+            raw += text
+            for match in NOTE_OBJECT.finditer(raw, scanned):
+                scanned = match.end()
+                turn_index = min(int(match.group(1)), len(turns) - 1)
+                note = json.loads(match.group(2)).strip()
+                lines = turns[emitted:turn_index + 1] + [f"[COACH: {note}]"]
+                yield preview(lines)
+                emitted = max(emitted, turn_index + 1)
+        
+        if emitted < len(turns):
+            yield preview(turns[emitted:])
+        
+        content, items, coverage = self.merge_structured_notes(transcript, raw)
+        self._store_result(cache_key, content, token_usage, stop_reason, annotations=items, coverage=coverage)
+        self._log_usage("Annotation", token_usage)
+        yield {
+            'type': 'done',
+            'content': content,
+            'annotations': items,
+            'coverage': coverage,
+            'token_usage': token_usage,
+            'stop_reason': stop_reason,
+            'continuations': continuations,
+            'cached': False
+        }
+    
+    def merge_structured_notes(self, transcript, raw):
+        """Merge raw {turn_index, note} output into the transcript; returns (content, items, coverage)"""
+        turns = split_turns(transcript)
+        notes = parse_turn_notes(raw)
+        items = merge_turn_notes(turns, notes)
+        content = render_annotated(items)
+        # Every original turn is merged back locally, so this confirms full coverage by construction
+        coverage = coverage_report(transcript, content)
+        print(f"📝 Structured annotation: {len(notes)} notes across {len(turns)} turns")
+        return content, items, coverage
+    
+    def _chunked_prompt_text(self, chunks):
+        return (f"[Transcript annotated in {len(chunks)} parallel chunks; the prompt for chunk 1 is shown]\n\n"
+                + prompt_text(self.build_chunk_annotation_prompt(chunks[0])))
+    
+    def _annotate_chunk(self, chunk):
+        """Annotate one transcript chunk (runs on the chunk worker pool)"""
+        return self._create_text(
+            f"Annotation chunk {chunk['index'] + 1}/{chunk['total']}",
+            self.build_chunk_annotation_prompt(chunk),
+            priority='annotation'
+        )
+    
+    def _stream_chunked_annotation(self, transcript, chunks, cache_key=None):
+        """Annotate chunks concurrently, yielding each chunk's text in transcript order"""
+        cached = self._cached_result(cache_key, "Annotation")
+        if cached is not None:
+            yield {'type': 'text', 'text': cached['content']}
+            yield dict(cached, type='done', stop_reason='end_turn', cached=True)
+            return
+        
+        print(f"🔄 Annotating transcript in {len(chunks)} chunks with {ANNOTATION_WORKERS} workers")
+        results = []
+        for chunk, result in self.chunked_annotator.run(chunks):
+            separator = '\n' if results else ''
+            results.append(result)
+            yield {'type': 'text', 'text': separator + result['content'].strip('\n')}
+        
+        content = ChunkedAnnotator.stitch(results)
+        content, coverage, gap_usages = self._complete_coverage(transcript, content)
+        token_usage = merge_token_usage([result['token_usage'] for result in results] + gap_usages)
+        stop_reason = 'max_tokens' if any(result['stop_reason'] == 'max_tokens' for result in results) else 'end_turn'
+        self._store_result(cache_key, content, token_usage, stop_reason, coverage=coverage)
+        self._log_usage("Annotation", token_usage)
+        yield {
+            'type': 'done',
+            'content': content,
+            'coverage': coverage,
+            'token_usage': token_usage,
+            'stop_reason': stop_reason,
+            'continuations': sum(result['continuations'] for result in results),
+            'cached': False
+        }
+    
+    def chat_about_analysis(self, question, transcript, previous_analysis, history=None):
+        """Handle conversational questions about the transcript or analysis; returns (answer, prompt, ok)"""
+        messages = self.build_chat_prompt(question, transcript, previous_analysis, history)
+        
+        try:
+            result = self._create_text("Chat", messages[-1]['content'], max_tokens=CHAT_MAX_TOKENS, history=messages[:-1],
+                                       priority='chat')
+            return result['content'], messages_text(messages), True
+        except Exception as e:
+            return f"Error processing question: {str(e)}", messages_text(messages), False
+    
+    def stream_chat(self, question, transcript, previous_analysis, history=None):
+        """Streaming variant of chat_about_analysis; returns (event generator, prompt)"""
+        messages = self.build_chat_prompt(question, transcript, previous_analysis, history)
+        return (self._stream_completion("Chat", messages[-1]['content'], max_tokens=CHAT_MAX_TOKENS, history=messages[:-1],
+                                        priority='chat'),
+                messages_text(messages))
+    
+    def summarize_chat(self, summary, exchanges):
+        """Fold chat exchanges into the running conversation summary"""
+        result = self._create_text("Chat summary", self.build_chat_summary_prompt(summary, exchanges),
+                                   max_tokens=CHAT_SUMMARY_TOKENS, priority='batch')
+        return result['content'].strip()
+
+
+def create_result_cache():
+    """Cache of analysis and annotation results by transcript content"""
+    return ResultCache(
+        directory=os.getenv('RESULT_CACHE_DIR', 'cache/results'),
+        max_memory_bytes=int(os.getenv('RESULT_CACHE_MEMORY_MB', '64')) * 1024 * 1024,
+        max_disk_bytes=int(os.getenv('RESULT_CACHE_DISK_MB', '512')) * 1024 * 1024
+    )
+
+
+def create_rate_limiter():
+    """One token budget for every analyzer call in this process"""
+    return RateLimiter(
+        input_tokens_per_minute=ANTHROPIC_INPUT_TPM,
+        output_tokens_per_minute=ANTHROPIC_OUTPUT_TPM,
+        output_estimate=ANTHROPIC_OUTPUT_ESTIMATE,
+        max_retries=ANTHROPIC_MAX_RETRIES
+    )
+
+
+def create_scheduler():
+    return PriorityScheduler(CONCURRENCY_LIMITS, MAX_CONCURRENT_REQUESTS)
+
+
+def create_compactor():
+    return TranscriptCompactor(parse_steps(TRANSCRIPT_COMPACTION))
+
+
+def create_document_extractor():
+    return DocumentExtractor(max_workers=int(os.getenv('EXTRACT_WORKERS', '2')))
@@ -0,0 +1,129 @@
+"""
+Request Scheduler for Sales Coach
+Admits Claude requests by priority class (interactive chat first, then analysis, then
+annotation and batch work) with per-class concurrency limits, so a quick coaching
+question never waits behind a colleague's long annotation.
+"""
+
+from bisect import insort
+from collections import deque
+from contextlib import contextmanager
+import itertools
+import threading
+import time
+
+# Lower number = served first
+PRIORITIES = {
+    'chat': 0,
+    'analysis': 1,
+    'annotation': 2,
+    'batch': 3
+}
+
+# Number of recent wait times kept per class for percentile metrics
+WAIT_SAMPLES = 200
+
+
+class PriorityClass:
+    def __init__(self, name, limit):
+        self.name = name
+        self.priority = PRIORITIES[name]
+        self.limit = limit
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=WAIT_SAMPLES)
+
+    def record_wait(self, waited):
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.recent_waits.append(waited)
+
+    def to_dict(self):
+        recent = sorted(self.recent_waits)
+
+        def percentile(fraction):
+            return round(recent[min(len(recent) - 1, int(len(recent) * fraction))], 3) if recent else 0.0
+
+        return {
+            'priority': self.priority,
+            'limit': self.limit,
+            'running': self.running,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'average_wait_seconds': round(self.total_wait / self.admitted, 3) if self.admitted else 0.0,
+            'p50_wait_seconds': percentile(0.5),
+            'p95_wait_seconds': percentile(0.95),
+            'max_wait_seconds': round(self.max_wait, 3)
+        }
+
+
+class PriorityScheduler:
+    def __init__(self, limits, max_concurrency):
+        """limits maps each priority class name to its own concurrency limit"""
+        self.classes = {name: PriorityClass(name, limits.get(name, max_concurrency)) for name in PRIORITIES}
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self.condition = threading.Condition()
+        # (priority, sequence, class name) for every blocked request, highest priority first
+        self.queue = []
+        self.sequence = itertools.count()
+        self.local = threading.local()
+
+    def current_priority(self):
+        """Priority of the request running on this thread (used to order the rate limiter queue)"""
+        priority = getattr(self.local, 'priority', None)
+        return PRIORITIES['batch'] if priority is None else priority
+
+    @contextmanager
+    def slot(self, name):
+        """Hold one concurrency slot of the given class for the duration of a request"""
+        cls = self.classes[name]
+        entry = (cls.priority, next(self.sequence), name)
+        started = time.monotonic()
+        with self.condition:
+            insort(self.queue, entry)
+            cls.waiting += 1
+            try:
+                self.condition.wait_for(lambda: self._next_admissible() == entry)
+            finally:
+                self.queue.remove(entry)
+                cls.waiting -= 1
+            cls.running += 1
+            self.running += 1
+            cls.record_wait(time.monotonic() - started)
+            # Others may still fit under the limits
+            self.condition.notify_all()
+
+        previous = getattr(self.local, 'priority', None)
+        self.local.priority = cls.priority
+        try:
+            yield
+        finally:
+            self.local.priority = previous
+            with self.condition:
+                cls.running -= 1
+                self.running -= 1
+                self.condition.notify_all()
+
+    def _next_admissible(self):
+        """The highest priority queued request whose class still has a free slot"""
+        if self.running >= self.max_concurrency:
+            return None
+        for entry in self.queue:
+            cls = self.classes[entry[2]]
+            if cls.running < cls.limit:
+                return entry
+        return None
+
+    def stats(self):
+        with self.condition:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'running': self.running,
+                'queue_depth': len(self.queue),
+                'classes': {name: cls.to_dict() for name, cls in self.classes.items()}
+            }
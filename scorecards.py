@@ -0,0 +1,291 @@
+"""
+Rep Scorecards for Sales Coach
+Per-call scores (talk ratio, question rate, monologues, interruptions, objections and
+outcome) kept in a columnar NumPy table, with per-rep and team percentiles,
+distributions and outcome mix over a rolling window of days. The table follows the call
+history incrementally: each sync folds in only the calls saved since the last one.
+"""
+
+from datetime import date
+import re
+import threading
+
+import numpy as np
+
+from metrics import match_speaker
+
+# Numeric per-call scores: key, label, unit and histogram bin edges for distributions
+METRICS = (
+    ('talk_ratio', 'Rep talk ratio', '%', np.linspace(0, 100, 11)),
+    ('question_rate', 'Questions per 10 min', '', np.array([0, 1, 2, 3, 4, 5, 6, 8, 10, 15, np.inf])),
+    ('longest_monologue', 'Longest monologue', 's', np.array([0, 30, 60, 90, 120, 180, 240, 300, 450, 600, np.inf])),
+    ('interruptions', 'Interruptions', '', np.array([0, 1, 2, 3, 4, 5, 7, 10, np.inf])),
+    ('objections', 'Objections', '', np.array([0, 1, 2, 3, 4, 5, 7, 10, np.inf]))
+)
+METRIC_KEYS = tuple(metric[0] for metric in METRICS)
+
+# Outcomes Claude reports on the analysis scorecard line, best first
+OUTCOMES = ('won', 'advancing', 'stalled', 'lost')
+
+PERCENTILES = (25, 50, 75, 90)
+
+# "Scorecard: outcome=advancing, objections=2" at the end of an analysis
+SCORECARD_LINE = re.compile(r'^[\s*_>-]*scorecard\b.*$', re.IGNORECASE | re.MULTILINE)
+OUTCOME_FIELD = re.compile(r'outcome\W*(' + '|'.join(OUTCOMES) + r')\b', re.IGNORECASE)
+OBJECTIONS_FIELD = re.compile(r'objections\W*(\d+)', re.IGNORECASE)
+
+UNASSIGNED_REP = 'Unassigned'
+
+
+def parse_scorecard(analysis):
+    """(outcome or None, objection count or None) from the scorecard line of an analysis"""
+    lines = SCORECARD_LINE.findall(analysis or '')
+    if not lines:
+        return None, None
+    line = lines[-1]
+    outcome = OUTCOME_FIELD.search(line)
+    objections = OBJECTIONS_FIELD.search(line)
+    return (outcome.group(1).lower() if outcome else None,
+            int(objections.group(1)) if objections else None)
+
+
+def split_scorecard(analysis):
+    """(analysis without its scorecard line, {'outcome', 'objections'} or None)
+
+    The scorecard line is for the scorecards only, so it is taken out before the analysis
+    is stored or shown.
+    """
+    outcome, objections = parse_scorecard(analysis)
+    if outcome is None and objections is None:
+        return analysis, None
+    line = list(SCORECARD_LINE.finditer(analysis))[-1]
+    parts = (analysis[:line.start()].rstrip(), analysis[line.end():].strip())
+    return '\n\n'.join(part for part in parts if part), {'outcome': outcome, 'objections': objections}
+
+
+def rep_speaker(metrics, rep=None):
+    """The rep's entry in the metrics speakers: the one marked when measured, else matched by name"""
+    speakers = metrics.get('speakers', [])
+    marked = next((speaker for speaker in speakers if speaker['is_rep']), None)
+    if marked or not rep:
+        return marked
+    label = match_speaker(rep, [speaker['name'] for speaker in speakers])
+    return next((speaker for speaker in speakers if speaker['name'] == label), None)
+
+
+def call_scores(metrics, analysis, scorecard=None, rep=None):
+    """Per-call scores from conversation metrics and the scorecard; NaN where unknown
+
+    Calls saved before scorecards were stored separately still have the line in their analysis.
+    """
+    scores = dict.fromkeys(METRIC_KEYS, np.nan)
+    metrics = metrics or {}
+    rep = rep_speaker(metrics, rep)
+    if rep:
+        minutes = metrics['duration_seconds'] / 60.0
+        scores['talk_ratio'] = rep['talk_share'] * 100
+        scores['question_rate'] = rep['questions'] / minutes * 10 if minutes > 0 else np.nan
+        scores['longest_monologue'] = rep['longest_monologue_seconds']
+        if rep['interruptions'] is not None:
+            scores['interruptions'] = rep['interruptions']
+    if scorecard:
+        outcome, objections = scorecard.get('outcome'), scorecard.get('objections')
+    else:
+        outcome, objections = parse_scorecard(analysis)
+    if objections is not None:
+        scores['objections'] = objections
+    return scores, outcome
+
+
+def grouped_percentiles(groups, values, count, percentiles=PERCENTILES):
+    """Percentiles of values per group in one sort: returns (count x len(percentiles) array, sizes).
+
+    Interpolates linearly between ranks like np.percentile; NaN values are left out and
+    groups without values get NaN.
+    """
+    keep = ~np.isnan(values)
+    groups, values = groups[keep], values[keep]
+    order = np.lexsort((values, groups))
+    values = values[order]
+    sizes = np.bincount(groups, minlength=count)
+    starts = np.cumsum(sizes) - sizes
+    result = np.full((count, len(percentiles)), np.nan)
+    present = sizes > 0
+    if present.any():
+        position = starts[present, None] + (sizes[present, None] - 1) * (np.asarray(percentiles) / 100.0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        result[present] = values[low] + (values[high] - values[low]) * (position - low)
+    return result, sizes
+
+
+class ScorecardTable:
+    """Columnar per-call scores; rows are updated in place when a call is saved again"""
+
+    def __init__(self, capacity=1024):
+        self.lock = threading.Lock()
+        self._reset(capacity)
+
+    def _reset(self, capacity):
+        self.size = 0
+        self.call_id = np.zeros(capacity, dtype=np.int64)
+        self.rep = np.zeros(capacity, dtype=np.int32)
+        self.day = np.zeros(capacity, dtype='datetime64[D]')
+        self.outcome = np.full(capacity, -1, dtype=np.int8)
+        self.scores = np.full((capacity, len(METRICS)), np.nan)
+        self.rows = {}
+        self.reps = []
+        self.rep_index = {}
+        self.synced_at = None
+        self.stale = False
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = len(self.call_id) * 2
+        for name in ('call_id', 'rep', 'day', 'outcome', 'scores'):
+            column = getattr(self, name)
+            grown = np.empty((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def _rep(self, name):
+        name = ' '.join((name or '').split()) or UNASSIGNED_REP
+        key = name.casefold()
+        index = self.rep_index.get(key)
+        if index is None:
+            index = self.rep_index[key] = len(self.reps)
+            self.reps.append(name)
+        return index
+
+    def fold(self, call):
+        """Add or update one call from the history (id, rep, call_date, metrics, analysis, scorecard)"""
+        metrics = call['metrics'] or {}
+        scores, outcome = call_scores(metrics, call['analysis'], call.get('scorecard'), call['rep'])
+        row = self.rows.get(call['id'])
+        if row is None:
+            if self.size == len(self.call_id):
+                self._grow()
+            row = self.rows[call['id']] = self.size
+            self.size += 1
+        self.call_id[row] = call['id']
+        self.rep[row] = self._rep(call['rep'] or metrics.get('rep'))
+        try:
+            self.day[row] = np.datetime64(call['call_date'][:10], 'D')
+        except ValueError:
+            self.day[row] = np.datetime64(call['updated_at'][:10], 'D')
+        self.outcome[row] = OUTCOMES.index(outcome) if outcome else -1
+        self.scores[row] = [scores[key] for key in METRIC_KEYS]
+
+    def sync(self, store):
+        """Fold in calls saved since the last sync; reload everything if calls were deleted"""
+        with self.lock:
+            if self.stale or (self.synced_at is not None and store.scored_count() < self.size):
+                self._reset(len(self.call_id))
+            folded = 0
+            for call in store.scored_calls(since=self.synced_at):
+                self.fold(call)
+                self.synced_at = call['updated_at']
+                folded += 1
+            return folded
+
+    def invalidate(self):
+        """Rebuild from the history on the next sync (after a call is deleted)"""
+        self.stale = True
+
+    def summary(self, days=90, today=None, rep=None):
+        """Team and per-rep percentiles, means, distributions and outcome mix for the last `days` days.
+
+        days=0 covers every call. Each rep also gets the medians of the window before, so
+        trends show as a change.
+        """
+        today = np.datetime64(today or date.today(), 'D')
+        with self.lock:
+            window = self._window(today, days)
+            previous = self._window(today - days, days) if days else None
+            reps = list(self.reps)
+            current = self._aggregate(window, len(reps))
+            before = self._aggregate(previous, len(reps)) if previous is not None else None
+
+        by_rep = []
+        for index in np.argsort([name.casefold() for name in reps], kind='stable'):
+            if current['reps']['calls'][index] == 0:
+                continue
+            if rep and reps[index].casefold() != rep.strip().casefold():
+                continue
+            entry = self._entry(current['reps'], index)
+            entry['rep'] = reps[index]
+            if before is not None:
+                entry['previous_median'] = {
+                    key: self._number(before['reps']['percentiles'][key][index][PERCENTILES.index(50)])
+                    for key in METRIC_KEYS
+                }
+            by_rep.append(entry)
+
+        return {
+            'window_days': days,
+            'from': str(today - days + 1) if days else None,
+            'to': str(today),
+            'metrics': [{'key': key, 'label': label, 'unit': unit} for key, label, unit, _ in METRICS],
+            'percentiles': list(PERCENTILES),
+            'outcomes': list(OUTCOMES),
+            'bins': {key: [self._number(edge) for edge in edges] for key, _, _, edges in METRICS},
+            'team': self._entry(current['team'], 0),
+            'reps': by_rep
+        }
+
+    def _window(self, today, days):
+        """Rows of calls in the `days` days ending today (all rows when days is 0)"""
+        day = self.day[:self.size]
+        if not days:
+            return np.arange(self.size)
+        return np.flatnonzero((day <= today) & (day > today - days))
+
+    def _aggregate(self, rows, rep_count):
+        """Per-rep and team statistics for the given rows, vectorized across reps and metrics"""
+        groups = {'reps': (self.rep[rows], rep_count), 'team': (np.zeros(len(rows), dtype=np.int32), 1)}
+        outcome = self.outcome[rows]
+        known = outcome >= 0
+        result = {}
+        for name, (group, count) in groups.items():
+            stats = {
+                'calls': np.bincount(group, minlength=count),
+                'outcomes': np.bincount(group[known] * len(OUTCOMES) + outcome[known],
+                                        minlength=count * len(OUTCOMES)).reshape(count, len(OUTCOMES)),
+                'percentiles': {}, 'means': {}, 'counts': {}, 'histograms': {}
+            }
+            for column, (key, _, _, edges) in enumerate(METRICS):
+                values = self.scores[rows, column]
+                stats['percentiles'][key], sizes = grouped_percentiles(group, values, count)
+                present = ~np.isnan(values)
+                totals = np.bincount(group[present], weights=values[present], minlength=count)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    stats['means'][key] = totals / sizes
+                stats['counts'][key] = sizes
+                bins = np.clip(np.searchsorted(edges, values[present], side='right') - 1, 0, len(edges) - 2)
+                stats['histograms'][key] = np.bincount(group[present] * (len(edges) - 1) + bins,
+                                                       minlength=count * (len(edges) - 1)).reshape(count, len(edges) - 1)
+            result[name] = stats
+        return result
+
+    def _entry(self, stats, index):
+        return {
+            'calls': int(stats['calls'][index]),
+            'outcomes': dict(zip(OUTCOMES, stats['outcomes'][index].tolist())),
+            'metrics': {
+                key: {
+                    'calls': int(stats['counts'][key][index]),
+                    'mean': self._number(stats['means'][key][index]),
+                    **{f"p{percentile}": self._number(value)
+                       for percentile, value in zip(PERCENTILES, stats['percentiles'][key][index])},
+                    'histogram': stats['histograms'][key][index].tolist()
+                }
+                for key in METRIC_KEYS
+            }
+        }
+
+    @staticmethod
+    def _number(value):
+        value = float(value)
+        return None if np.isnan(value) or np.isinf(value) else round(value, 2)
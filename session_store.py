@@ -0,0 +1,637 @@
+"""
+Session Store for Sales Coach
+Server-side storage for per-visitor data (transcript, analysis, prompts) behind one
+get/set/delete interface, plus claim/release for work that must run once per session at a
+time, with three backends:
+
+- memory: bounded in-process store with byte accounting, idle expiry and LRU eviction.
+  Text is kept line by line and every long line is stored once, so the transcript, its
+  numbered copy inside each prompt, the annotated transcript and the annotation items
+  share one copy of each turn. Single process only.
+- sqlite: a WAL-mode database file shared by every worker process on one machine.
+- redis: any server speaking the Redis protocol, shared across machines.
+
+The shared backends store values as zlib-compressed JSON.
+"""
+
+from collections import OrderedDict
+from urllib.parse import urlparse
+import json
+import os
+import re
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+# Lines at least this long are stored once as shared blobs; shorter ones stay inline
+BLOB_MIN_CHARS = 48
+
+# Turn numbers prompts put in front of transcript lines ("[12] "); split off so the rest of
+# the line is shared with the plain transcript
+TURN_NUMBER = re.compile(r'\[\d+\] ')
+
+# Part kinds in StoredText: inline text (one or more lines), shared blob, turn-number prefix
+INLINE, BLOB, PREFIX = 0, 1, 2
+
+# Expired sessions are swept at most this often (seconds)
+SWEEP_INTERVAL = 30
+
+# Shared backends refresh a session's last-used time at most this often on reads (seconds)
+TOUCH_INTERVAL = 60
+
+# Encoded values at least this long are compressed
+COMPRESS_MIN_BYTES = 256
+
+
+def value_size(value):
+    """Approximate bytes held by a stored value"""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+def encode_value(value):
+    """Serialize a value for a shared backend: b'z' + zlib data, or b'j' + plain JSON when small"""
+    payload = json.dumps(value).encode('utf-8')
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        return b'z' + zlib.compress(payload, 6)
+    return b'j' + payload
+
+
+def decode_value(data):
+    data = bytes(data)
+    payload = zlib.decompress(data[1:]) if data[:1] == b'z' else data[1:]
+    return json.loads(payload.decode('utf-8'))
+
+
+class StoredText:
+    """Multi-line text kept as inline runs of short lines, shared blob lines and turn-number prefixes"""
+    __slots__ = ('parts', 'kinds')
+
+    def __init__(self, parts, kinds):
+        self.parts = parts
+        self.kinds = kinds
+
+
+class SessionStore:
+    def __init__(self, max_bytes=256 * 1024 * 1024, idle_ttl=4 * 60 * 60, blob_min_chars=BLOB_MIN_CHARS):
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.blob_min_chars = blob_min_chars
+        self.lock = threading.Lock()
+
+        # session_id -> {'data': {key: (stored, size)}, 'bytes': own bytes, 'touched': monotonic time};
+        # ordered from least to most recently used
+        self.sessions = OrderedDict()
+        self.session_bytes = 0
+
+        # text -> [text, size, reference count]; the stored text is the one copy every reference points to
+        self.blobs = {}
+        self.blob_bytes = 0
+
+        # (session_id, key) -> monotonic time a claim was taken
+        self.claims = {}
+
+        self.last_sweep = time.monotonic()
+        self.counters = {
+            'evictions': 0,
+            'expirations': 0,
+            'blob_hits': 0,
+            'blob_writes': 0
+        }
+
+    def get(self, session_id, key, default=None):
+        with self.lock:
+            entry = self._touch(session_id)
+            if entry is None or key not in entry['data']:
+                return default
+            return self._load(entry['data'][key][0])
+
+    def set(self, session_id, key, value):
+        with self.lock:
+            entry = self._touch(session_id)
+            if entry is None:
+                entry = {'data': {}, 'bytes': 0, 'touched': time.monotonic()}
+                self.sessions[session_id] = entry
+            if key in entry['data']:
+                self._release(entry, *entry['data'].pop(key))
+            stored, size = self._store(value)
+            entry['data'][key] = (stored, size)
+            entry['bytes'] += size
+            self.session_bytes += size
+            self._sweep()
+            self._evict()
+
+    def claim(self, session_id, key, ttl):
+        """Atomically take a named claim unless a live one exists; claims older than ttl seconds lapse"""
+        with self.lock:
+            now = time.monotonic()
+            claimed = self.claims.get((session_id, key))
+            if claimed is not None and now - claimed < ttl:
+                return False
+            self.claims[(session_id, key)] = now
+            return True
+
+    def release(self, session_id, key):
+        with self.lock:
+            self.claims.pop((session_id, key), None)
+
+    def delete(self, session_id):
+        with self.lock:
+            entry = self.sessions.pop(session_id, None)
+            if entry is not None:
+                self._drop(entry)
+            for claim in [claim for claim in self.claims if claim[0] == session_id]:
+                del self.claims[claim]
+
+    def stats(self):
+        with self.lock:
+            # What the blobs would cost if every reference held its own copy
+            logical = sum(size * references for _, size, references in self.blobs.values())
+            return dict(
+                self.counters,
+                backend='memory',
+                sessions=len(self.sessions),
+                bytes=self.session_bytes + self.blob_bytes,
+                max_bytes=self.max_bytes,
+                session_bytes=self.session_bytes,
+                blobs=len(self.blobs),
+                blob_bytes=self.blob_bytes,
+                dedup_saved_bytes=logical - self.blob_bytes
+            )
+
+    def _touch(self, session_id):
+        """Return a live session entry and mark it most recently used"""
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if now - entry['touched'] > self.idle_ttl:
+            self._drop(self.sessions.pop(session_id))
+            self.counters['expirations'] += 1
+            return None
+        entry['touched'] = now
+        self.sessions.move_to_end(session_id)
+        return entry
+
+    def _store(self, value):
+        """Return (stored form, bytes owned by the session).
+
+        Strings at least blob_min_chars long, on their own or inside lists and dicts, become
+        references to shared blobs; multi-line ones are stored line by line.
+        """
+        if isinstance(value, str):
+            if len(value) < self.blob_min_chars:
+                return value, sys.getsizeof(value)
+            if '\n' not in value:
+                # The reference itself is counted by whatever holds it
+                return self._share(value), 0
+            return self._store_text(value)
+        if isinstance(value, dict):
+            stored, size = {}, sys.getsizeof(value)
+            for key, item in value.items():
+                stored[key], item_size = self._store(item)
+                size += item_size
+            return stored, size
+        if isinstance(value, (list, tuple)):
+            items = [self._store(item) for item in value]
+            stored = [item for item, _ in items]
+            return (stored if isinstance(value, list) else tuple(stored)), sys.getsizeof(value) + sum(size for _, size in items)
+        return value, value_size(value)
+
+    def _store_text(self, text):
+        parts, kinds, inline = [], bytearray(), []
+        size = 0
+        for line in text.split('\n'):
+            number = TURN_NUMBER.match(line)
+            body = line[number.end():] if number else line
+            if len(body) < self.blob_min_chars:
+                inline.append(line)
+                continue
+            if inline:
+                parts.append('\n'.join(inline))
+                kinds.append(INLINE)
+                size += sys.getsizeof(parts[-1])
+                inline = []
+            if number:
+                # Interned, so every prompt shares the same "[n] " strings
+                parts.append(sys.intern(number.group()))
+                kinds.append(PREFIX)
+            parts.append(self._share(body))
+            kinds.append(BLOB)
+        if inline:
+            parts.append('\n'.join(inline))
+            kinds.append(INLINE)
+            size += sys.getsizeof(parts[-1])
+        kinds = bytes(kinds)
+        return StoredText(parts, kinds), size + sys.getsizeof(parts) + sys.getsizeof(kinds)
+
+    def _share(self, text):
+        """The stored copy of text, adding a reference"""
+        blob = self.blobs.get(text)
+        if blob is None:
+            blob = self.blobs[text] = [text, sys.getsizeof(text), 0]
+            self.blob_bytes += blob[1]
+            self.counters['blob_writes'] += 1
+        else:
+            self.counters['blob_hits'] += 1
+        blob[2] += 1
+        return blob[0]
+
+    def _unshare(self, text):
+        blob = self.blobs[text]
+        blob[2] -= 1
+        if blob[2] == 0:
+            self.blob_bytes -= blob[1]
+            del self.blobs[text]
+
+    def _load(self, stored):
+        """Rebuild a stored value; lists and dicts are new objects, so callers never modify the store"""
+        if isinstance(stored, StoredText):
+            lines, prefix = [], ''
+            for part, kind in zip(stored.parts, stored.kinds):
+                if kind == PREFIX:
+                    prefix = part
+                else:
+                    lines.append(prefix + part)
+                    prefix = ''
+            return '\n'.join(lines)
+        if isinstance(stored, dict):
+            return {key: self._load(item) for key, item in stored.items()}
+        if isinstance(stored, list):
+            return [self._load(item) for item in stored]
+        if isinstance(stored, tuple):
+            return tuple(self._load(item) for item in stored)
+        return stored
+
+    def _unshare_all(self, stored):
+        """Drop the blob references held by a stored value"""
+        if isinstance(stored, str):
+            if len(stored) >= self.blob_min_chars:
+                self._unshare(stored)
+        elif isinstance(stored, StoredText):
+            for part, kind in zip(stored.parts, stored.kinds):
+                if kind == BLOB:
+                    self._unshare(part)
+        elif isinstance(stored, dict):
+            for item in stored.values():
+                self._unshare_all(item)
+        elif isinstance(stored, (list, tuple)):
+            for item in stored:
+                self._unshare_all(item)
+
+    def _release(self, entry, stored, size):
+        """Give back the bytes of one stored value and drop blobs nobody references any more"""
+        self._unshare_all(stored)
+        entry['bytes'] -= size
+        self.session_bytes -= size
+
+    def _drop(self, entry):
+        for stored, size in list(entry['data'].values()):
+            self._release(entry, stored, size)
+        entry['data'].clear()
+
+    def _sweep(self):
+        """Expire idle sessions; the least recently used are at the front"""
+        now = time.monotonic()
+        if now - self.last_sweep < SWEEP_INTERVAL:
+            return
+        self.last_sweep = now
+        while self.sessions:
+            session_id, entry = next(iter(self.sessions.items()))
+            if now - entry['touched'] <= self.idle_ttl:
+                break
+            self._drop(self.sessions.pop(session_id))
+            self.counters['expirations'] += 1
+
+    def _evict(self):
+        """Evict least recently used sessions until the store fits under max_bytes"""
+        # The most recently used session (the one just written) is always kept
+        while self.session_bytes + self.blob_bytes > self.max_bytes and len(self.sessions) > 1:
+            session_id = next(iter(self.sessions))
+            self._drop(self.sessions.pop(session_id))
+            self.counters['evictions'] += 1
+            print(f"🧹 Session store over {self.max_bytes:,} bytes; evicted least recently used session")
+
+
+class SQLiteSessionStore:
+    """Sessions in a WAL-mode SQLite file so several worker processes can share them"""
+
+    def __init__(self, path='cache/sessions.sqlite3', idle_ttl=4 * 60 * 60):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.last_sweep = 0.0
+        self.counters = {
+            'reads': 0,
+            'writes': 0,
+            'bytes_written': 0,
+            'raw_bytes_written': 0,
+            'expirations': 0
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                touched REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched);
+            CREATE TABLE IF NOT EXISTS session_data (
+                session_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                PRIMARY KEY (session_id, key)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS session_claims (
+                session_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                claimed REAL NOT NULL,
+                PRIMARY KEY (session_id, key)
+            ) WITHOUT ROWID;
+        """)
+
+    def _connection(self):
+        """One connection per thread; autocommit so each statement is its own transaction"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def get(self, session_id, key, default=None):
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT d.value, s.touched FROM session_data d JOIN sessions s USING (session_id) "
+            "WHERE d.session_id = ? AND d.key = ?",
+            (session_id, key)
+        ).fetchone()
+        self._count('reads')
+        if row is None:
+            return default
+        value, touched = row
+        now = time.time()
+        if now - touched > self.idle_ttl:
+            self.delete(session_id)
+            self._count('expirations')
+            return default
+        if now - touched > TOUCH_INTERVAL:
+            connection.execute("UPDATE sessions SET touched = ? WHERE session_id = ?", (now, session_id))
+        return decode_value(value)
+
+    def set(self, session_id, key, value):
+        data = encode_value(value)
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO sessions (session_id, touched) VALUES (?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET touched = excluded.touched",
+                (session_id, now)
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO session_data (session_id, key, value) VALUES (?, ?, ?)",
+                (session_id, key, data)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        with self.lock:
+            self.counters['writes'] += 1
+            self.counters['bytes_written'] += len(data)
+            self.counters['raw_bytes_written'] += len(json.dumps(value))
+        self._sweep(now)
+
+    def claim(self, session_id, key, ttl):
+        """Atomically take a named claim unless a live one exists; claims older than ttl seconds lapse"""
+        now = time.time()
+        # One statement, so two workers can never both see the claim as free
+        claimed = self._connection().execute(
+            "INSERT INTO session_claims (session_id, key, claimed) VALUES (?, ?, ?) "
+            "ON CONFLICT (session_id, key) DO UPDATE SET claimed = excluded.claimed "
+            "WHERE session_claims.claimed < ?",
+            (session_id, key, now, now - ttl)
+        ).rowcount
+        return claimed == 1
+
+    def release(self, session_id, key):
+        self._connection().execute(
+            "DELETE FROM session_claims WHERE session_id = ? AND key = ?", (session_id, key)
+        )
+
+    def delete(self, session_id):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("DELETE FROM session_data WHERE session_id = ?", (session_id,))
+        connection.execute("DELETE FROM session_claims WHERE session_id = ?", (session_id,))
+        connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        connection.execute("COMMIT")
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _sweep(self, now):
+        """Delete every expired session; runs at most once per SWEEP_INTERVAL per process"""
+        with self.lock:
+            if now - self.last_sweep < SWEEP_INTERVAL:
+                return
+            self.last_sweep = now
+        cutoff = now - self.idle_ttl
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute(
+            "DELETE FROM session_data WHERE session_id IN (SELECT session_id FROM sessions WHERE touched < ?)",
+            (cutoff,)
+        )
+        connection.execute(
+            "DELETE FROM session_claims WHERE session_id IN (SELECT session_id FROM sessions WHERE touched < ?)",
+            (cutoff,)
+        )
+        expired = connection.execute("DELETE FROM sessions WHERE touched < ?", (cutoff,)).rowcount
+        connection.execute("COMMIT")
+        if expired:
+            with self.lock:
+                self.counters['expirations'] += expired
+
+    def stats(self):
+        connection = self._connection()
+        sessions, = connection.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        stored, = connection.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM session_data").fetchone()
+        with self.lock:
+            return dict(
+                self.counters,
+                backend='sqlite',
+                path=self.path,
+                sessions=sessions,
+                bytes=stored
+            )
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RespClient:
+    """Minimal Redis protocol (RESP) client with one connection per thread"""
+
+    def __init__(self, url='redis://localhost:6379/0', timeout=5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.local.sock = sock
+        self.local.reader = sock.makefile('rb')
+        if self.password:
+            self._call([('AUTH', self.password)])
+        if self.db:
+            self._call([('SELECT', self.db)])
+
+    def execute(self, *commands):
+        """Send one or more commands in a single round trip and return their replies"""
+        for attempt in range(2):
+            if getattr(self.local, 'sock', None) is None:
+                self._connect()
+            try:
+                return self._call(commands)
+            except (OSError, ConnectionError):
+                # Stale connection (server restart, idle timeout): reconnect once
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        sock = getattr(self.local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self.local.sock = None
+
+    def _call(self, commands):
+        payload = bytearray()
+        for command in commands:
+            payload += b'*%d\r\n' % len(command)
+            for arg in command:
+                if not isinstance(arg, bytes):
+                    arg = str(arg).encode('utf-8')
+                payload += b'$%d\r\n%s\r\n' % (len(arg), arg)
+        self.local.sock.sendall(payload)
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def _read(self):
+        line = self.local.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by session server")
+        prefix, rest = line[:1], line[1:-2]
+        if prefix == b'+':
+            return rest.decode('utf-8')
+        if prefix == b'-':
+            return RespError(rest.decode('utf-8'))
+        if prefix == b':':
+            return int(rest)
+        if prefix == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.local.reader.read(length + 2)
+            return data[:-2]
+        if prefix == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from session server: {line[:40]!r}")
+
+
+class RedisSessionStore:
+    """Sessions as Redis hashes with a sliding expiry, shared across processes and machines"""
+
+    def __init__(self, url='redis://localhost:6379/0', idle_ttl=4 * 60 * 60, prefix='salescoach:session:'):
+        self.client = RespClient(url)
+        self.url = url
+        self.idle_ttl = idle_ttl
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {
+            'reads': 0,
+            'writes': 0,
+            'bytes_written': 0,
+            'raw_bytes_written': 0
+        }
+
+    def get(self, session_id, key, default=None):
+        name = self.prefix + session_id
+        value, _ = self.client.execute(('HGET', name, key), ('EXPIRE', name, self.idle_ttl))
+        with self.lock:
+            self.counters['reads'] += 1
+        return default if value is None else decode_value(value)
+
+    def set(self, session_id, key, value):
+        name = self.prefix + session_id
+        data = encode_value(value)
+        self.client.execute(('HSET', name, key, data), ('EXPIRE', name, self.idle_ttl))
+        with self.lock:
+            self.counters['writes'] += 1
+            self.counters['bytes_written'] += len(data)
+            self.counters['raw_bytes_written'] += len(json.dumps(value))
+
+    def claim(self, session_id, key, ttl):
+        """Atomically take a named claim unless a live one exists; claims lapse after ttl seconds"""
+        reply, = self.client.execute(('SET', self._claim_name(session_id, key), time.time(), 'NX', 'EX', int(ttl)))
+        return reply == 'OK'
+
+    def release(self, session_id, key):
+        self.client.execute(('DEL', self._claim_name(session_id, key)))
+
+    def _claim_name(self, session_id, key):
+        return f"{self.prefix}{session_id}:claim:{key}"
+
+    def delete(self, session_id):
+        self.client.execute(('DEL', self.prefix + session_id))
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, backend='redis', url=self.url.split('@')[-1])
+        try:
+            stats['server_keys'] = self.client.execute(('DBSIZE',))[0]
+        except (OSError, ConnectionError, RespError) as e:
+            stats['error'] = str(e)
+        return stats
+
+
+def create_session_store(backend='memory', max_bytes=256 * 1024 * 1024, idle_ttl=4 * 60 * 60,
+                         sqlite_path='cache/sessions.sqlite3', redis_url='redis://localhost:6379/0'):
+    """Build the configured session backend"""
+    if backend == 'sqlite':
+        print(f"🗃️ Session store: SQLite at {sqlite_path}")
+        return SQLiteSessionStore(sqlite_path, idle_ttl=idle_ttl)
+    if backend == 'redis':
+        print(f"🗃️ Session store: Redis at {redis_url.split('@')[-1]}")
+        return RedisSessionStore(redis_url, idle_ttl=idle_ttl)
+    if backend != 'memory':
+        raise ValueError(f"Unknown SESSION_BACKEND '{backend}' (expected memory, sqlite or redis)")
+    return SessionStore(max_bytes=max_bytes, idle_ttl=idle_ttl)
@@ -0,0 +1,194 @@
+"""
+Fake Anthropic API for Sales Coach
+A small local stand-in for the Messages API (plain and streamed) and the Batches API
+(create, retrieve, results) so batch_analyze.py can be run end to end in either mode
+without an API key or spend:
+
+    python tests/fake_anthropic.py --port 8080
+    python batch_analyze.py recordings/ --base-url http://localhost:8080 --poll-interval 1
+    python batch_analyze.py recordings/ --base-url http://localhost:8080 --mode pool
+
+Each batch reports in_progress for a few polls before it ends; requests whose custom_id
+is listed in --fail come back errored so the retry path runs. Structured annotation
+requests get one coaching note on the first turn; everything else gets a short analysis.
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import itertools
+import json
+import threading
+
+ANALYSIS = """## Overall Performance Summary
+The rep kept the call moving and confirmed next steps.
+
+## Key Coaching Points
+1. Ask about budget earlier
+
+Scorecard: outcome=advancing, objections=1"""
+
+NOTES = '[{"turn_index": 0, "note": "Good opening."}]'
+
+
+def stream_events(message):
+    """Server-sent events of a streamed Messages API response for a finished message"""
+    text = message['content'][0]['text']
+    events = [
+        ('message_start', {'type': 'message_start', 'message': dict(
+            message, content=[], stop_reason=None, usage=dict(message['usage'], output_tokens=0))}),
+        ('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                 'content_block': {'type': 'text', 'text': ''}})
+    ]
+    for start in range(0, len(text), 40):
+        events.append(('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                               'delta': {'type': 'text_delta', 'text': text[start:start + 40]}}))
+    events += [
+        ('content_block_stop', {'type': 'content_block_stop', 'index': 0}),
+        ('message_delta', {'type': 'message_delta', 'delta': {'stop_reason': message['stop_reason'], 'stop_sequence': None},
+                           'usage': {'output_tokens': message['usage']['output_tokens']}}),
+        ('message_stop', {'type': 'message_stop'})
+    ]
+    return ''.join(f"event: {event}\ndata: {json.dumps(data)}\n\n" for event, data in events)
+
+
+def reply(params):
+    """Canned Messages API response for one request's params"""
+    prompt = json.dumps(params.get('messages', []))
+    text = NOTES if 'JSON array' in prompt else ANALYSIS
+    return {
+        'id': 'msg_fake',
+        'type': 'message',
+        'role': 'assistant',
+        'model': params.get('model', 'fake'),
+        'content': [{'type': 'text', 'text': text}],
+        'stop_reason': 'end_turn',
+        'stop_sequence': None,
+        'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': len(text) // 4}
+    }
+
+
+class FakeBatches:
+    """Batches kept in memory; polls is how many retrieves report in_progress before the batch ends,
+    and requests whose custom_id is in fail come back errored. Regular requests are counted in messages.
+    """
+
+    def __init__(self, polls=2, fail=()):
+        self.polls = polls
+        self.fail = set(fail)
+        self.batches = {}
+        self.retrieved = 0
+        self.messages = 0
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def create(self, requests):
+        with self.lock:
+            batch_id = f"msgbatch_fake{next(self.ids)}"
+            self.batches[batch_id] = {'requests': requests, 'polls_left': self.polls}
+            return batch_id
+
+    def retrieve(self, batch_id, base_url):
+        with self.lock:
+            self.retrieved += 1
+            self.batches[batch_id]['polls_left'] -= 1
+        return self.status(batch_id, base_url)
+
+    def status(self, batch_id, base_url):
+        with self.lock:
+            batch = self.batches[batch_id]
+            ended = batch['polls_left'] < 0
+            count = len(batch['requests'])
+            return {
+                'id': batch_id,
+                'type': 'message_batch',
+                'processing_status': 'ended' if ended else 'in_progress',
+                'request_counts': {'processing': 0 if ended else count, 'succeeded': count if ended else 0,
+                                   'errored': 0, 'canceled': 0, 'expired': 0},
+                'created_at': '2025-01-01T00:00:00Z',
+                'expires_at': '2025-01-02T00:00:00Z',
+                'ended_at': '2025-01-01T00:01:00Z' if ended else None,
+                'archived_at': None,
+                'cancel_initiated_at': None,
+                'results_url': f"{base_url}/v1/messages/batches/{batch_id}/results" if ended else None
+            }
+
+    def results(self, batch_id):
+        with self.lock:
+            requests = self.batches[batch_id]['requests']
+        return ''.join(json.dumps({
+            'custom_id': request['custom_id'],
+            'result': self.result(request)
+        }) + '\n' for request in requests)
+
+    def result(self, request):
+        if request['custom_id'] in self.fail:
+            return {'type': 'errored', 'error': {'type': 'error', 'error': {
+                'type': 'api_error', 'message': 'Internal server error'}}}
+        return {'type': 'succeeded', 'message': reply(request['params'])}
+
+    def message(self, params):
+        with self.lock:
+            self.messages += 1
+        return reply(params)
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        path = self.path.split('?')[0].rstrip('/')
+        if path == '/v1/messages/batches':
+            batch_id = self.server.fake.create(body['requests'])
+            self.send_json(self.server.fake.status(batch_id, self.base_url()))
+        elif path == '/v1/messages':
+            message = self.server.fake.message(body)
+            if body.get('stream'):
+                self.send_body(stream_events(message).encode('utf-8'), 'text/event-stream')
+            else:
+                self.send_json(message)
+        else:
+            self.send_json({'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}}, 404)
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts[:3] != ['v1', 'messages', 'batches'] or len(parts) < 4 or parts[3] not in self.server.fake.batches:
+            self.send_json({'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}}, 404)
+        elif len(parts) == 5 and parts[4] == 'results':
+            self.send_body(self.server.fake.results(parts[3]).encode('utf-8'), 'application/x-jsonl')
+        else:
+            self.send_json(self.server.fake.retrieve(parts[3], self.base_url()))
+
+    def base_url(self):
+        return f"http://{self.headers.get('Host')}"
+
+    def send_json(self, data, status=200):
+        self.send_body(json.dumps(data).encode('utf-8'), 'application/json', status)
+
+    def send_body(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(polls=2, port=0, fail=()):
+    """Serve a FakeBatches on a background thread; returns the server (its .fake holds the state)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.fake = FakeBatches(polls, fail)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages and Batches API")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--polls', type=int, default=2, help="in_progress polls before a batch ends (default: 2)")
+    parser.add_argument('--fail', nargs='*', default=(), help="batch custom_ids to return as errored")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+    server.fake = FakeBatches(args.polls, args.fail)
+    print(f"🧪 Fake Anthropic API on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,134 @@
+"""
+Batch analyzer run against the fake Anthropic API: submit, poll, collect, resuming a batch
+that an interrupted run left in the checkpoint, retrying errored batch results with regular
+requests, and pool mode.
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import batch_analyze
+from fake_anthropic import start_server
+
+CALLS = {
+    'call_a.txt': "Jane: Thanks for making time today.\nBob: Sure, we have about twenty minutes.\n",
+    'call_b.txt': "Jane: How is the rollout going?\nBob: Slower than we hoped, mostly training.\n"
+}
+
+
+class BatchAnalyzeTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.input = os.path.join(self.root, 'calls')
+        self.output = os.path.join(self.root, 'reports')
+        os.makedirs(self.input)
+        for name, text in CALLS.items():
+            with open(os.path.join(self.input, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+        self.server = None
+        self.start_server()
+        environ = mock.patch.dict(os.environ, {
+            'ANTHROPIC_API_KEY': 'test',
+            'RESULT_CACHE_DIR': os.path.join(self.root, 'results')
+        })
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def tearDown(self):
+        self.stop_server()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def start_server(self, fail=()):
+        self.stop_server()
+        self.server = start_server(polls=2, fail=fail)
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def run_batch(self, *options):
+        return batch_analyze.main([
+            self.input, '--output', self.output, '--pattern', '*.txt', '--no-pdf', '--poll-interval', '0',
+            '--base-url', f"http://127.0.0.1:{self.server.server_port}", *options
+        ])
+
+    def checkpoint(self):
+        with open(os.path.join(self.output, batch_analyze.CHECKPOINT_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def assert_reports_written(self):
+        for name in CALLS:
+            directory = os.path.join(self.output, os.path.splitext(name)[0])
+            with open(os.path.join(directory, 'analysis.md'), 'r', encoding='utf-8') as f:
+                self.assertIn('Overall Performance Summary', f.read())
+            with open(os.path.join(directory, 'annotation.json'), 'r', encoding='utf-8') as f:
+                annotations = json.load(f)['annotations']
+            self.assertIn({'type': 'coaching', 'content': 'Good opening.', 'turn_index': 0}, annotations)
+
+    def test_submit_poll_collect(self):
+        self.assertEqual(self.run_batch(), 0)
+
+        fake = self.server.fake
+        self.assertEqual(len(fake.batches), 1)
+        # Both parts of both calls in one batch, polled until it ended
+        self.assertEqual(len(next(iter(fake.batches.values()))['requests']), 4)
+        self.assertGreater(fake.retrieved, fake.polls)
+        self.assert_reports_written()
+        checkpoint = self.checkpoint()
+        self.assertEqual(checkpoint['batches'], {})
+        for name in CALLS:
+            self.assertEqual(checkpoint['files'][name]['parts'], {'analysis': 'completed', 'annotation': 'completed'})
+
+    def test_resume_collects_submitted_batch(self):
+        # The first run is stopped right after submitting, before any results are collected
+        with mock.patch.object(batch_analyze.BatchRunner, 'collect_batch', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_batch()
+        self.assertEqual(len(self.checkpoint()['batches']), 1)
+
+        # The next run collects that batch instead of submitting the work again
+        self.assertEqual(self.run_batch(), 0)
+        self.assertEqual(len(self.server.fake.batches), 1)
+        self.assert_reports_written()
+        self.assertEqual(self.checkpoint()['batches'], {})
+
+        # And a run after that finds nothing left to do
+        with mock.patch('builtins.print') as printed:
+            self.assertEqual(self.run_batch(), 0)
+        self.assertEqual(len(self.server.fake.batches), 1)
+        self.assertIn('2 already done', ' '.join(str(call.args[0]) for call in printed.call_args_list))
+
+    def test_errored_results_are_retried(self):
+        self.start_server(fail={batch_analyze.custom_id('call_a.txt', 'analysis')})
+        self.assertEqual(self.run_batch(), 0)
+
+        # The errored analysis was redone with one regular request; everything else came from the batch
+        self.assertEqual(len(self.server.fake.batches), 1)
+        self.assertEqual(self.server.fake.messages, 1)
+        self.assert_reports_written()
+        self.assertEqual(self.checkpoint()['batches'], {})
+
+    def test_pool_mode(self):
+        self.assertEqual(self.run_batch('--mode', 'pool', '--workers', '2'), 0)
+
+        # Analysis and (streamed) annotation per call, with no batches
+        self.assertEqual(self.server.fake.batches, {})
+        self.assertEqual(self.server.fake.messages, 4)
+        self.assert_reports_written()
+        for name in CALLS:
+            self.assertEqual(self.checkpoint()['files'][name]['parts'], {'analysis': 'completed', 'annotation': 'completed'})
+
+
+if __name__ == '__main__':
+    unittest.main()
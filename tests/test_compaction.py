@@ -0,0 +1,58 @@
+"""
+Transcript compaction: the default steps leave what people said alone, and timestamps
+or inline tags are only removed when their step is switched on.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compaction import TranscriptCompactor, parse_steps
+
+PLAIN = (
+    "Jane: a < b > c for <Acme Corp>\n"
+    "Bob: 10:30 works\n"
+    "10:30 works for me too\n"
+    "[00:01:02] Jane: see <https://example.com> for the pricing"
+)
+
+
+class CompactionTest(unittest.TestCase):
+    def test_plain_text_turns_are_unchanged(self):
+        compacted, stats = TranscriptCompactor().compact(PLAIN)
+        self.assertEqual(compacted, PLAIN)
+        self.assertEqual(stats['chars_after'], stats['chars_before'])
+
+    def test_speaker_labels_are_normalized(self):
+        transcript = "Jane Doe (Guest): Hi there\nJANE DOE: <b>not</b> a tag step\nJane Doe: Bye"
+        compacted, stats = TranscriptCompactor().compact(transcript)
+        self.assertEqual(compacted, "Jane Doe: Hi there\nJane Doe: <b>not</b> a tag step\nJane Doe: Bye")
+        self.assertEqual(stats['speakers_merged'], 2)
+
+    def test_empty_lines_are_dropped_and_turns_merged(self):
+        transcript = "Jane: So the plan\nBob: ...\nBob:  \nJane: is fine\n\nBob: ok"
+        compacted, stats = TranscriptCompactor().compact(transcript)
+        self.assertEqual(compacted, "Jane: So the plan is fine\nBob: ok")
+        self.assertEqual(stats['cues_dropped'], 2)
+        transcript = "Jane: So the plan\n\nJane: is fine"
+        compacted, stats = TranscriptCompactor().compact(transcript)
+        self.assertEqual(compacted, "Jane: So the plan\nJane: is fine")
+        self.assertEqual(stats['cues_dropped'], 0)
+
+    def test_timestamps_and_tags_only_when_asked(self):
+        compacted, stats = TranscriptCompactor(parse_steps('timestamps,tags')).compact(PLAIN)
+        self.assertEqual(compacted, "Jane: A c for\nBob: 10:30 works\nworks for me too\nJane: See for the pricing")
+        self.assertEqual(stats['timestamps_removed'], 2)
+        self.assertEqual(stats['tags_removed'], 3)
+
+    def test_no_steps(self):
+        transcript = "JANE (Guest): um th- the plan\n\n"
+        self.assertEqual(TranscriptCompactor(parse_steps('off')).compact(transcript)[0], transcript)
+
+
+if __name__ == '__main__':
+    unittest.main()
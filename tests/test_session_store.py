@@ -0,0 +1,57 @@
+"""
+Session store claims: of several threads racing for the same claim exactly one wins,
+and a claim is free again once released or older than its ttl.
+
+    python -m pytest tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import SessionStore, SQLiteSessionStore
+
+
+class ClaimTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def check_claims(self, store):
+        barrier = threading.Barrier(8)
+        results = []
+
+        def claim():
+            barrier.wait()
+            results.append(store.claim('session', 'chat_summary', 300))
+
+        threads = [threading.Thread(target=claim) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+
+        self.assertFalse(store.claim('session', 'chat_summary', 300))
+        self.assertTrue(store.claim('other', 'chat_summary', 300))
+        # A claim older than the ttl is taken as lost
+        self.assertTrue(store.claim('session', 'chat_summary', 0))
+        store.release('session', 'chat_summary')
+        self.assertTrue(store.claim('session', 'chat_summary', 300))
+
+    def test_memory(self):
+        self.check_claims(SessionStore())
+
+    def test_sqlite(self):
+        self.check_claims(SQLiteSessionStore(os.path.join(self.directory, 'sessions.sqlite3')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,314 @@
+"""
+Transcript Parser for Sales Coach
+Parses WebVTT/SRT captions, Zoom and Teams JSON transcripts and plain "Speaker: text"
+documents into compact cue records with start/end times and speaker, merges consecutive
+cues from the same speaker into turns and renders a token-lean "Speaker: text"
+transcript from them.
+"""
+
+import json
+import re
+
+# "00:00:54.520 --> 00:00:55.473 align:start" (hours optional, comma decimals from SRT-style tools)
+TIMING_LINE = re.compile(
+    r'^\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})'
+)
+
+# Teams-style voice spans: "<v Brian Olson>text</v>"
+VOICE_TAG = re.compile(r'^<v(?:\.[^\s>]*)?\s+([^>]+)>')
+
+# Zoom-style speaker prefix: "Brian Olson: text"
+SPEAKER_PREFIX = re.compile(r'^([^:\n\[\]<>]{1,60}):\s+')
+
+# Any remaining inline markup (<c>, <i>, timestamps inside karaoke-style cues)
+INLINE_TAG = re.compile(r'<[^>]*>')
+
+# Header blocks that carry no transcript text
+METADATA_BLOCKS = ('NOTE', 'STYLE', 'REGION')
+
+# Plain text: "[00:01:02] Brian Olson: ..." timestamp prefixes, and Otter/Teams style
+# "Brian Olson  0:05" header lines followed by what they said
+TEXT_TIMESTAMP = re.compile(r'^\[?(\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d+)?)\]?\s+')
+SPEAKER_HEADER = re.compile(r'^([^:\n\[\]<>]{1,60}?)\s{2,}\(?(\d{1,2}:\d{2}(?::\d{2})?)\)?$')
+
+# Where JSON transcript exports keep their entries and fields, in order of preference:
+# Teams (entries / speakerDisplayName / startOffset), Zoom (timeline / users / ts) and
+# generic speech-to-text output (segments / speaker / start)
+JSON_ENTRY_KEYS = ('entries', 'timeline', 'segments', 'transcript', 'utterances', 'results')
+JSON_SPEAKER_KEYS = ('speakerDisplayName', 'speaker_name', 'speakerName', 'speaker', 'username', 'name')
+JSON_TEXT_KEYS = ('text', 'content', 'transcript', 'words')
+JSON_START_KEYS = ('startOffset', 'start_time', 'startTime', 'start', 'ts', 'offset')
+JSON_END_KEYS = ('endOffset', 'end_time', 'endTime', 'end')
+
+
+class Cue:
+    """One caption cue; times are seconds from the start of the recording"""
+    __slots__ = ('start', 'end', 'speaker', 'text')
+
+    def __init__(self, start, end, speaker, text):
+        self.start = start
+        self.end = end
+        self.speaker = speaker
+        self.text = text
+
+    def __repr__(self):
+        return f"Cue({self.start}, {self.end}, {self.speaker!r}, {self.text!r})"
+
+
+class Turn:
+    """Consecutive cues from one speaker, merged into a single utterance"""
+    __slots__ = ('start', 'end', 'speaker', 'text', 'cues')
+
+    def __init__(self, start, end, speaker, text, cues=1):
+        self.start = start
+        self.end = end
+        self.speaker = speaker
+        self.text = text
+        self.cues = cues
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return 0.0
+        return max(0.0, self.end - self.start)
+
+    def to_dict(self):
+        return {
+            'start': None if self.start is None else round(self.start, 3),
+            'end': None if self.end is None else round(self.end, 3),
+            'speaker': self.speaker,
+            'text': self.text
+        }
+
+    def __repr__(self):
+        return f"Turn({self.start}, {self.end}, {self.speaker!r}, {len(self.text)} chars, {self.cues} cues)"
+
+
+def parse_timestamp(value):
+    """'01:02:03.456', '02:03.456' or '00:00:01,000' -> seconds"""
+    seconds = 0.0
+    for part in value.replace(',', '.').split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_timestamp(seconds):
+    """Seconds -> 'm:ss' or 'h:mm:ss' for display"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def split_speaker(text):
+    """Separate a speaker label from cue text; returns (speaker or None, text)"""
+    match = VOICE_TAG.match(text)
+    if match:
+        return match.group(1).strip(), INLINE_TAG.sub('', text[match.end():]).strip()
+    text = INLINE_TAG.sub('', text).strip()
+    match = SPEAKER_PREFIX.match(text)
+    if match:
+        return match.group(1).strip(), text[match.end():].strip()
+    return None, text
+
+
+class LineParser:
+    """Base for incremental parsers: feed text as it arrives and get cues back as lines complete"""
+
+    def __init__(self):
+        self.pending = ''
+        self.speaker = None
+
+    def feed(self, text):
+        lines = (self.pending + text).split('\n')
+        self.pending = lines.pop()
+        for line in lines:
+            yield from self._line(line.rstrip('\r'))
+
+    def close(self):
+        if self.pending:
+            yield from self._line(self.pending.rstrip('\r'))
+            self.pending = ''
+        yield from self._end()
+
+    def parse(self, texts):
+        """Cues from an iterable of text chunks"""
+        for text in texts:
+            yield from self.feed(text)
+        yield from self.close()
+
+    def _line(self, line):
+        raise NotImplementedError
+
+    def _end(self):
+        return iter(())
+
+
+class VttParser(LineParser):
+    """Incremental WebVTT/SRT parser; a cue is produced as each caption block ends.
+
+    Cue identifiers, NOTE/STYLE/REGION blocks and inline markup are dropped. A cue
+    without a speaker label keeps the speaker of the cue before it, which is how Zoom
+    writes the continuation of a long sentence. Only the current line and cue block
+    are held in memory.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.block = []
+
+    def _line(self, line):
+        if line.strip():
+            self.block.append(line.lstrip('\ufeff'))
+        else:
+            yield from self._end()
+
+    def _end(self):
+        lines, self.block = self.block, []
+        if not lines or lines[0].startswith('WEBVTT') or lines[0].startswith(METADATA_BLOCKS):
+            return
+
+        # The timing line is the first or, after a cue identifier, the second line
+        for index, line in enumerate(lines[:2]):
+            timing = TIMING_LINE.match(line)
+            if timing:
+                break
+        else:
+            return
+
+        text = ' '.join(line.strip() for line in lines[index + 1:])
+        label, text = split_speaker(text)
+        if not text:
+            return
+        if label:
+            self.speaker = label
+        yield Cue(parse_timestamp(timing.group(1)), parse_timestamp(timing.group(2)), self.speaker, text)
+
+
+class TextParser(LineParser):
+    """Incremental parser for plain transcripts (pasted text, DOCX and PDF exports).
+
+    A "Speaker: text" line starts a new cue; so does a "Speaker  0:05" header line,
+    whose text follows on the next lines. Other lines continue the current speaker,
+    or stand alone before any speaker is known.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.start = None
+
+    def _line(self, line):
+        line = line.strip().lstrip('\ufeff')
+        if not line:
+            return
+        header = SPEAKER_HEADER.match(line)
+        if header:
+            self.speaker, self.start = header.group(1).strip(), parse_timestamp(header.group(2))
+            return
+
+        start, self.start = self.start, None
+        stamp = TEXT_TIMESTAMP.match(line)
+        if stamp:
+            start = parse_timestamp(stamp.group(1))
+            line = line[stamp.end():]
+        label, text = split_speaker(line)
+        if label:
+            self.speaker = label
+        if text:
+            yield Cue(start, start, self.speaker, text)
+
+
+def parse_vtt(content):
+    """Parse WebVTT content into a list of Cue records"""
+    return list(VttParser().parse([content]))
+
+
+def parse_offset(value):
+    """JSON time value -> seconds: "00:01:02.5" strings, or numbers in seconds"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return parse_timestamp(str(value))
+    except ValueError:
+        return None
+
+
+def _first(entry, keys):
+    for key in keys:
+        value = entry.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def parse_json_transcript(content):
+    """Cues from a Zoom, Teams or speech-to-text JSON transcript"""
+    data = json.loads(content)
+    entries = data
+    while isinstance(entries, dict):
+        entries = _first(entries, JSON_ENTRY_KEYS)
+    if not isinstance(entries, list):
+        raise ValueError("JSON file does not contain a list of transcript entries")
+
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        text = _first(entry, JSON_TEXT_KEYS)
+        if isinstance(text, list):
+            text = ' '.join(str(word.get('text', word) if isinstance(word, dict) else word) for word in text)
+        if not text:
+            continue
+        speaker = _first(entry, JSON_SPEAKER_KEYS)
+        users = entry.get('users')
+        if speaker is None and isinstance(users, list) and users and isinstance(users[0], dict):
+            speaker = users[0].get('username')
+        start = parse_offset(_first(entry, JSON_START_KEYS))
+        end = parse_offset(_first(entry, JSON_END_KEYS))
+        yield Cue(start, start if end is None else end, str(speaker) if speaker else None, ' '.join(str(text).split()))
+
+
+def iter_turns(cues):
+    """Merge consecutive cues from the same speaker, yielding each turn once it is complete.
+
+    Cues without any speaker are kept as separate lines rather than run together.
+    """
+    turn = None
+    for cue in cues:
+        if turn is not None and cue.speaker is not None and turn.speaker == cue.speaker:
+            if cue.end is not None:
+                turn.end = cue.end if turn.end is None else max(turn.end, cue.end)
+            turn.text += ' ' + cue.text
+            turn.cues += 1
+            continue
+        if turn is not None:
+            yield turn
+        turn = Turn(cue.start, cue.end, cue.speaker, cue.text)
+    if turn is not None:
+        yield turn
+
+
+def merge_turns(cues):
+    """Merge consecutive cues from the same speaker into turns"""
+    return list(iter_turns(cues))
+
+
+def render_turn(turn, timestamps=False):
+    """One turn as "Speaker: text", optionally prefixed with [m:ss]"""
+    line = f"{turn.speaker}: {turn.text}" if turn.speaker else turn.text
+    if timestamps and turn.start is not None:
+        line = f"[{format_timestamp(turn.start)}] {line}"
+    return line
+
+
+def render_transcript(turns, timestamps=False):
+    """Render turns one per line"""
+    return '\n'.join(render_turn(turn, timestamps) for turn in turns)
+
+
+def parse_vtt_turns(content):
+    """Parse VTT content straight into speaker turns"""
+    return merge_turns(parse_vtt(content))